@@ -1,8 +1,25 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Header
 import uvicorn
+
+from config import Config
+
+# До импорта database.db: у API свой файл отложенного журнала, иначе он
+# дозаписывал бы строки бота, а бот - строки API
+Config.REQUEST_JOURNAL_SPILL_PATH = f"{Config.REQUEST_JOURNAL_SPILL_PATH}.api"
+
 from database.db import database
 
-app = FastAPI(title="Telegram Bot API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Счетчики и журнал запросов копятся в памяти (write-behind) - сбрасываем при остановке
+    await database.close()
+
+
+app = FastAPI(title="Telegram Bot API", lifespan=lifespan)
 
 
 @app.get("/")
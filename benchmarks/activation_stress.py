@@ -0,0 +1,154 @@
+"""
+Нагрузочная проверка активации ключей: несколько процессов одновременно
+активируют одни и те же ключи разными пользователями. Каждый ключ должен
+достаться ровно одному пользователю, без двойных записей в истории.
+
+Запуск: python -m benchmarks.activation_stress --processes 4 --attempts 1000 --keys 3
+"""
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+from database.db import Database
+from database.keys import key_digest
+
+
+def seed(db_path: str, users: int, keys: int):
+    """Пользователи без подписки и свободные ключи"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
+        ((user_id, f"user{user_id}", f"User {user_id}") for user_id in range(1, users + 1))
+    )
+    conn.executemany(
+        "INSERT INTO activation_keys (key_digest, plan_id, key_code) VALUES (?, 2, ?)",
+        ((key_digest(f"STRESS-KEY-{i}"), f"STRESS-KEY-{i}") for i in range(keys))
+    )
+    conn.commit()
+    conn.close()
+
+
+async def attack(db_path: str, user_ids: range, keys: int) -> Counter:
+    """Все пользователи процесса разом пытаются активировать ключи"""
+    db = Database(db_path)
+    try:
+        results = await asyncio.gather(*(
+            db.activate_key(user_id, f"STRESS-KEY-{user_id % keys}") for user_id in user_ids
+        ), return_exceptions=True)
+    finally:
+        await db.close()
+
+    outcome = Counter()
+    for result in results:
+        if isinstance(result, Exception):
+            outcome[f"исключение: {type(result).__name__}: {result}"] += 1
+        elif result['success']:
+            outcome['успех'] += 1
+        else:
+            outcome[result['error']] += 1
+    return outcome
+
+
+def worker(db_path: str, user_ids: range, keys: int, barrier, results):
+    barrier.wait()
+    results.put(asyncio.run(attack(db_path, user_ids, keys)))
+
+
+def verify(db_path: str, keys: int) -> list:
+    """Расхождения в БД после прогона (пустой список - все в порядке)"""
+    conn = sqlite3.connect(db_path)
+    problems = []
+
+    used = conn.execute("SELECT COUNT(*) FROM activation_keys WHERE is_used = 1").fetchone()[0]
+    if used != keys:
+        problems.append(f"занято ключей: {used} из {keys}")
+
+    owners = conn.execute('''
+        SELECT k.id, COUNT(u.user_id) FROM activation_keys k
+        LEFT JOIN users u ON u.activation_key_id = k.id
+        GROUP BY k.id HAVING COUNT(u.user_id) != 1
+    ''').fetchall()
+    problems += [f"ключ {key_id}: владельцев {count}" for key_id, count in owners]
+
+    mismatched = conn.execute('''
+        SELECT COUNT(*) FROM activation_keys k
+        JOIN users u ON u.activation_key_id = k.id
+        WHERE k.used_by_user_id != u.user_id
+    ''').fetchone()[0]
+    if mismatched:
+        problems.append(f"used_by_user_id не совпадает с владельцем: {mismatched}")
+
+    history = conn.execute('''
+        SELECT activation_key_id, COUNT(*) FROM subscription_history
+        GROUP BY activation_key_id HAVING COUNT(*) != 1
+    ''').fetchall()
+    problems += [f"ключ {key_id}: записей в истории {count}" for key_id, count in history]
+
+    conn.close()
+    return problems
+
+
+def main(processes: int, attempts: int, keys: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "stress.db")
+        setup_db = Database(db_path)
+        asyncio.run(setup_db.create_tables())
+        asyncio.run(setup_db.close())
+
+        users = processes * attempts
+        seed(db_path, users, keys)
+
+        print(f"\n🔑 Активация {keys} ключ(ей): {processes} процесс(ов) x {attempts} попыток")
+        print("-" * 60)
+
+        ctx = multiprocessing.get_context("spawn")
+        barrier = ctx.Barrier(processes)
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(
+                target=worker,
+                args=(db_path, range(i * attempts + 1, (i + 1) * attempts + 1), keys, barrier, results)
+            )
+            for i in range(processes)
+        ]
+
+        started = time.perf_counter()
+        for process in workers:
+            process.start()
+        outcome = Counter()
+        for _ in workers:
+            outcome.update(results.get())
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        for result, count in outcome.most_common():
+            print(f"{count:>8}  {result}")
+        print(f"\n⏱ {users} попыток за {elapsed:.2f} сек. ({users / elapsed:.0f}/сек.)")
+
+        problems = verify(db_path, keys)
+        if outcome['успех'] != keys:
+            problems.insert(0, f"успешных активаций: {outcome['успех']}, ожидалось {keys}")
+
+        if problems:
+            print("❌ Нарушена целостность:")
+            for problem in problems:
+                print(f"   {problem}")
+            raise SystemExit(1)
+        print("✅ Каждый ключ активирован ровно одним пользователем")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Параллельная активация одних и тех же ключей")
+    parser.add_argument("--processes", type=int, default=4, help="Количество процессов")
+    parser.add_argument("--attempts", type=int, default=1000, help="Попыток активации на процесс")
+    parser.add_argument("--keys", type=int, default=1, help="Количество разыгрываемых ключей")
+
+    args = parser.parse_args()
+    main(args.processes, args.attempts, args.keys)
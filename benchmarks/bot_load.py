@@ -0,0 +1,243 @@
+"""
+Сквозной нагрузочный тест обработчиков бота без Telegram.
+
+Тысячи смоделированных пользователей проходят реальные сценарии: /start,
+/activate с ключом, добавление ссылок через FSM, /my_links с переходом
+на следующую страницу inline-кнопкой, поиск и экспорт. Апдейты подаются
+в диспетчер с заданной общей частотой, ответы бота принимает заглушка Bot API
+(benchmarks.fake_bot_api). Задержка шага считается от запланированного
+момента отправки до конца обработки, поэтому очередь при перегрузке тоже видна.
+
+Запуск: python -m benchmarks.bot_load --users 1000 --rate 300 [--api-latency 0.05]
+"""
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from benchmarks.seed import CATEGORIES, WORDS
+from config import Config
+
+FIRST_USER_ID = 2_000_000
+
+
+class Pacer:
+    """Общий темп отправки апдейтов: не больше rate в секунду (0 - без ограничения)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next: Optional[float] = None
+
+    async def wait(self) -> float:
+        """Дождаться своего слота; возвращает запланированное время отправки"""
+        now = time.perf_counter()
+        if not self.interval:
+            return now
+        if self._next is None:
+            self._next = now
+        slot = self._next
+        self._next += self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return slot
+
+
+class LoadRun:
+    """Общее состояние прогона: диспетчер, бот, темп и задержки по шагам"""
+
+    def __init__(self, dp, bot, fake_api: FakeBotAPI, pacer: Pacer):
+        self.dp = dp
+        self.bot = bot
+        self.fake_api = fake_api
+        self.pacer = pacer
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._update_ids = itertools.count(1)
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": "Load", "last_name": str(user_id)}
+
+    def message_update(self, user_id: int, text: str) -> Dict[str, Any]:
+        update_id = next(self._update_ids)
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": update_id, "message": message}
+
+    def callback_update(self, user_id: int, data: str) -> Dict[str, Any]:
+        update_id = next(self._update_ids)
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "message": self.fake_api.last_messages[user_id],
+                "data": data,
+            },
+        }
+
+    async def send(self, step: str, update: Dict[str, Any]):
+        """Отправка апдейта в свой слот темпа и замер до конца обработки"""
+        scheduled = await self.pacer.wait()
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception:
+            self.errors[step] += 1
+        self.latencies[step].append(time.perf_counter() - scheduled)
+
+    def inline_button(self, user_id: int, prefix: str) -> Optional[str]:
+        """callback_data кнопки из последнего сообщения бота пользователю"""
+        message = self.fake_api.last_messages.get(user_id) or {}
+        for row in message.get("reply_markup", {}).get("inline_keyboard", []):
+            for button in row:
+                if button.get("callback_data", "").startswith(prefix):
+                    return button["callback_data"]
+        return None
+
+
+async def user_scenario(run: LoadRun, user_id: int, key_code: str, links: int, rnd: random.Random,
+                        export_share: float):
+    """Путь одного пользователя от /start до экспорта"""
+    await run.send("/start", run.message_update(user_id, "/start"))
+
+    await run.send("/activate", run.message_update(user_id, "/activate"))
+    await run.send("activate: ключ", run.message_update(user_id, key_code))
+
+    for _ in range(links):
+        await run.send("ссылка: начало", run.message_update(user_id, "📥 Добавить ссылку"))
+        await run.send("ссылка: url", run.message_update(
+            user_id, f"example.com/{rnd.choice(WORDS)}/{rnd.randint(0, 10 ** 6)}"))
+        await run.send("ссылка: заголовок", run.message_update(
+            user_id, " ".join(rnd.sample(WORDS, 3)) if rnd.random() < 0.7 else "/skip"))
+        await run.send("ссылка: описание", run.message_update(
+            user_id, " ".join(rnd.sample(WORDS, 6)) if rnd.random() < 0.5 else "/skip"))
+        await run.send("ссылка: категория", run.message_update(user_id, rnd.choice(CATEGORIES)))
+
+    await run.send("/my_links", run.message_update(user_id, "/my_links"))
+    next_page = run.inline_button(user_id, "links_page:>")
+    if next_page:
+        await run.send("links_page", run.callback_update(user_id, next_page))
+
+    await run.send("поиск: начало", run.message_update(user_id, "🔍 Поиск ссылок"))
+    await run.send("поиск: запрос", run.message_update(user_id, rnd.choice(WORDS)))
+
+    if rnd.random() < export_share:
+        await run.send("/export", run.message_update(user_id, f"/export {rnd.choice(['txt', 'csv', 'json'])}"))
+
+
+async def prepare_users(database, users: int, preload_links: int, rnd: random.Random) -> List[str]:
+    """Ключи для активации и "старые" ссылки, чтобы /my_links листался"""
+    key_codes = await database.generate_activation_keys("PRO", users)
+    for user_id in range(FIRST_USER_ID, FIRST_USER_ID + users):
+        await database.add_user(user_id, None, f"Load {user_id}")
+        for _ in range(preload_links):
+            await database.add_user_link(
+                user_id, f"https://example.com/old/{rnd.randint(0, 10 ** 9)}",
+                " ".join(rnd.sample(WORDS, 2)), category=rnd.choice(CATEGORIES)
+            )
+    return key_codes
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(q * len(values))) - 1)] if values else 0.0
+
+
+def print_report(run: LoadRun, elapsed: float, rate: float):
+    from utils.metrics import metrics
+
+    total = sum(len(values) for values in run.latencies.values())
+    target = f"цель {rate:.0f}/сек." if rate else "без ограничения темпа"
+    print(f"\n⏱ {total} апдейтов за {elapsed:.1f} сек.: {total / elapsed:.0f} апд./сек. ({target})")
+
+    print(f"\n{'шаг сценария':<22} {'кол-во':>7} {'p50 мс':>8} {'p99 мс':>8} {'ошибок':>7}")
+    print("-" * 56)
+    for step, values in run.latencies.items():
+        print(f"{step:<22} {len(values):>7} {percentile(values, 0.5) * 1000:>8.1f} "
+              f"{percentile(values, 0.99) * 1000:>8.1f} {run.errors[step]:>7}")
+
+    rows = metrics.summaries("bot_update_seconds")
+    if rows:
+        print(f"\n{'обработчик':<40} {'кол-во':>7} {'p50 мс':>8} {'p99 мс':>8}")
+        print("-" * 66)
+        for row in rows:
+            name = f"{row['router'].rsplit('.', 1)[-1]}.{row['handler']}"
+            print(f"{name:<40} {row['count']:>7} {row['p50'] * 1000:>8.1f} {row['p99'] * 1000:>8.1f}")
+
+    calls = ", ".join(f"{method}: {count}" for method, count in run.fake_api.calls.most_common())
+    print(f"\n📨 Bot API: {calls}; документов {run.fake_api.document_bytes / 1024:.0f} КБ")
+
+
+async def main(users: int, rate: float, links: int, preload_links: int, export_share: float,
+               api_latency: float, seed: int):
+    from database.db import database
+    from main import create_dispatcher
+
+    # Обработчики работают с общим экземпляром database.db: если модуль был
+    # импортирован до подмены Config.DB_PATH, нагрузка ушла бы в рабочую БД
+    if os.path.abspath(database.db_path) != os.path.abspath(Config.DB_PATH):
+        raise RuntimeError(f"database.db открыт на {database.db_path}, а не на временной БД {Config.DB_PATH}")
+
+    rnd = random.Random(seed)
+    fake_api = FakeBotAPI(latency=api_latency)
+    bot = fake_api.create_bot(await fake_api.start())
+    dp = create_dispatcher()
+
+    try:
+        await database.create_tables()
+        await database.build_key_filter()
+
+        started = time.perf_counter()
+        key_codes = await prepare_users(database, users, preload_links, rnd)
+        print(f"✅ Подготовлено {users} польз. и ключей за {time.perf_counter() - started:.1f} сек.")
+
+        run = LoadRun(dp, bot, fake_api, Pacer(rate))
+        print(f"\n🤖 Сценарии: {users} польз., {links} ссылок на каждого, темп {rate or '∞'} апд./сек., "
+              f"задержка Bot API {api_latency * 1000:.0f} мс")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            user_scenario(run, FIRST_USER_ID + i, key_codes[i], links, random.Random(seed + i), export_share)
+            for i in range(users)
+        ))
+        print_report(run, time.perf_counter() - started, rate)
+    finally:
+        await dp.storage.close()
+        await bot.session.close()
+        await fake_api.stop()
+        await database.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сквозной нагрузочный тест обработчиков бота")
+    parser.add_argument("--users", type=int, default=1000, help="Количество пользователей")
+    parser.add_argument("--rate", type=float, default=300, help="Апдейтов в секунду всего (0 - без ограничения)")
+    parser.add_argument("--links", type=int, default=2, help="Ссылок, добавляемых каждым пользователем")
+    parser.add_argument("--preload-links", type=int, default=15, help="Ссылок у пользователя до начала")
+    parser.add_argument("--export-share", type=float, default=0.2, help="Доля пользователей, делающих экспорт")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Задержка ответа Bot API, сек.")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Временная БД: пути подменяются до первого импорта database.db
+        Config.DB_PATH = os.path.join(tmp, "bot_load.db")
+        Config.FSM_STORAGE = "memory"
+        Config.REQUEST_JOURNAL_SPILL_PATH = os.path.join(tmp, "journal.spill")
+        asyncio.run(main(args.users, args.rate, args.links, args.preload_links, args.export_share,
+                         args.api_latency, args.seed))
@@ -0,0 +1,289 @@
+"""
+Бенчмарк всех публичных методов Database на синтетической БД (benchmarks.seed).
+
+Для каждого метода и каждого уровня параллелизма (число корутин) считаются
+операции в секунду и p50/p99 задержки. Каждый метод работает на своей копии БД,
+чтобы записи одного метода не влияли на другие. Результаты сохраняются в JSON
+и сравниваются с прошлым прогоном (например, с другого коммита).
+
+Запуск:
+    python -m benchmarks.db_suite --users 5000 --keys 20000 --links 50000 --output before.json
+    python -m benchmarks.db_suite ... --output after.json --compare before.json
+"""
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.seed import WORDS, CATEGORIES, seed_database
+from database.db import Database
+
+# Методы, которые не имеет смысла гонять в цикле
+SKIPPED_METHODS = {"close"}
+
+
+class Fixture:
+    """Идентификаторы из засеянной БД, из которых собираются аргументы вызовов"""
+
+    def __init__(self, db_path: str):
+        conn = sqlite3.connect(db_path)
+        self.users = [row[0] for row in conn.execute("SELECT user_id FROM users")]
+        self.keyed_users = [row[0] for row in conn.execute(
+            "SELECT user_id FROM users WHERE activation_key_id IS NOT NULL")]
+        self.free_users = [row[0] for row in conn.execute(
+            "SELECT user_id FROM users WHERE activation_key_id IS NULL")] or self.users
+        self.unused_keys = [row[0] for row in conn.execute(
+            "SELECT key_code FROM activation_keys WHERE is_used = 0 LIMIT 50000")]
+        self.used_keys = [row[0] for row in conn.execute(
+            "SELECT key_code FROM activation_keys WHERE is_used = 1 LIMIT 50000")]
+        # Случайная выборка ссылок: владельцы с большим числом ссылок попадают чаще
+        self.links = conn.execute(
+            "SELECT id, user_id FROM user_links ORDER BY random() LIMIT 20000").fetchall()
+        self.links_by_user: Dict[int, List[int]] = {}
+        for link_id, user_id in self.links:
+            self.links_by_user.setdefault(user_id, []).append(link_id)
+        conn.close()
+
+        self.new_user_ids = itertools.count(max(self.users, default=0) + 1)
+
+    def link(self, rnd: random.Random):
+        return rnd.choice(self.links)
+
+    def link_owner(self, rnd: random.Random) -> int:
+        return rnd.choice(self.links)[1]
+
+    def any_key(self, rnd: random.Random) -> str:
+        # Каждый десятый ключ - несуществующий
+        if rnd.random() < 0.1:
+            return f"NOPE-{rnd.randint(0, 10 ** 8):08d}"
+        return rnd.choice(self.unused_keys + self.used_keys if rnd.random() < 0.5 else self.used_keys)
+
+
+async def consume_links(db: Database, user_id: int):
+    async for _ in db.iter_user_links(user_id):
+        pass
+
+
+Workload = Callable[[Database, random.Random, Fixture], Awaitable[Any]]
+
+WORKLOADS: Dict[str, Workload] = {
+    "create_tables": lambda db, rnd, fx: db.create_tables(),
+    "run_online_builds": lambda db, rnd, fx: db.run_online_builds(),
+    "build_key_filter": lambda db, rnd, fx: db.build_key_filter(),
+    "generate_activation_keys": lambda db, rnd, fx: db.generate_activation_keys("BASIC", 1),
+    # Свободных пар ключ/пользователь мало: большая часть попыток - отказ, как в жизни
+    "activate_key": lambda db, rnd, fx: db.activate_key(rnd.choice(fx.free_users), rnd.choice(fx.unused_keys)),
+    "validate_key": lambda db, rnd, fx: db.validate_key(fx.any_key(rnd)),
+    "deactivate_user_key": lambda db, rnd, fx: db.deactivate_user_key(rnd.choice(fx.keyed_users)),
+    "get_user_active_key": lambda db, rnd, fx: db.get_user_active_key(rnd.choice(fx.keyed_users)),
+    "get_all_keys": lambda db, rnd, fx: db.get_all_keys(limit=100),
+    "is_key_linked_to_user": lambda db, rnd, fx: db.is_key_linked_to_user(rnd.choice(fx.users), fx.any_key(rnd)),
+    "add_user": lambda db, rnd, fx: db.add_user(next(fx.new_user_ids), "bench", "Bench User"),
+    "get_user": lambda db, rnd, fx: db.get_user(user_id=rnd.choice(fx.users)),
+    "get_all_users": lambda db, rnd, fx: db.get_all_users(limit=100),
+    "set_user_admin": lambda db, rnd, fx: db.set_user_admin(rnd.choice(fx.users), is_admin=False),
+    "get_admins": lambda db, rnd, fx: db.get_admins(),
+    "get_users_count": lambda db, rnd, fx: db.get_users_count(),
+    "check_user_access": lambda db, rnd, fx: db.check_user_access(rnd.choice(fx.users)),
+    "increment_user_requests": lambda db, rnd, fx: db.increment_user_requests(rnd.choice(fx.users)),
+    "add_user_request": lambda db, rnd, fx: db.add_user_request(rnd.choice(fx.users), "bench", "data", "ok"),
+    "get_user_stats": lambda db, rnd, fx: db.get_user_stats(rnd.choice(fx.users)),
+    # Журнал в seed - за 90 дней: первый вызов сворачивает треть записей, остальные - пустой проход
+    "compact_requests": lambda db, rnd, fx: db.compact_requests(retention_days=60),
+    "get_request_log_stats": lambda db, rnd, fx: db.get_request_log_stats(),
+    "get_all_subscription_plans": lambda db, rnd, fx: db.get_all_subscription_plans(),
+    "reload_subscription_plans": lambda db, rnd, fx: db.reload_subscription_plans(),
+    "update_subscription_plan": lambda db, rnd, fx: db.update_subscription_plan("BASIC", price=10),
+    "add_user_link": lambda db, rnd, fx: db.add_user_link(
+        rnd.choice(fx.users), f"https://example.com/{rnd.randint(0, 10 ** 9)}", rnd.choice(WORDS),
+        category=rnd.choice(CATEGORIES)),
+    "get_user_links": lambda db, rnd, fx: db.get_user_links(fx.link_owner(rnd), limit=10),
+    "iter_user_links": lambda db, rnd, fx: consume_links(db, fx.link_owner(rnd)),
+    "get_user_link": lambda db, rnd, fx: db.get_user_link(*fx.link(rnd)),
+    "get_user_link_count": lambda db, rnd, fx: db.get_user_link_count(fx.link_owner(rnd)),
+    "get_link_categories": lambda db, rnd, fx: db.get_link_categories(fx.link_owner(rnd)),
+    "get_user_link_stats": lambda db, rnd, fx: db.get_user_link_stats(fx.link_owner(rnd)),
+    "search_user_links": lambda db, rnd, fx: db.search_user_links(fx.link_owner(rnd), rnd.choice(WORDS)),
+    "delete_user_link": lambda db, rnd, fx: db.delete_user_link(*fx.link(rnd)),
+}
+
+
+def public_methods() -> List[str]:
+    """Публичные async-методы Database (корутины и асинхронные генераторы)"""
+    return sorted(
+        name for name, func in vars(Database).items()
+        if not name.startswith("_") and name not in SKIPPED_METHODS
+        and (inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func))
+    )
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[max(0, int(round(q * len(values))) - 1)]
+
+
+async def measure(db: Database, workload: Workload, fixture: Fixture, concurrency: int,
+                  duration: float, rnd: random.Random) -> Dict[str, Any]:
+    """ops/sec и задержки метода при заданном числе корутин"""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                await workload(db, rnd, fixture)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'ops': len(latencies),
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'errors': errors,
+    }
+
+
+def copy_database(source: str, target: str):
+    """Копия БД через backup API (с учетом WAL)"""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    src.backup(dst)
+    dst.close()
+    src.close()
+
+
+async def run_method(template: str, work_dir: str, name: str, fixture: Fixture, levels: List[int],
+                     duration: float, backend: str) -> Dict[str, Any]:
+    db_path = os.path.join(work_dir, f"{name}.db")
+    copy_database(template, db_path)
+
+    db = Database(db_path, backend=backend)
+    rnd = random.Random(name)
+    results = {}
+    try:
+        for concurrency in levels:
+            results[str(concurrency)] = await measure(db, WORKLOADS[name], fixture, concurrency, duration, rnd)
+    finally:
+        await db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(current: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\n📈 Сравнение с {baseline['meta'].get('commit') or 'прошлым прогоном'} (ops/sec)")
+    print("-" * 72)
+    for name, levels in current['results'].items():
+        old_levels = baseline['results'].get(name)
+        if not old_levels:
+            continue
+        cells = []
+        for level, result in levels.items():
+            old = old_levels.get(level)
+            if not old or not old['ops_per_sec']:
+                continue
+            delta = (result['ops_per_sec'] / old['ops_per_sec'] - 1) * 100
+            cells.append(f"x{level}: {delta:+.0f}%")
+        print(f"{name:<28} {'  '.join(cells)}")
+
+
+def main(args):
+    levels = [int(level) for level in args.concurrency.split(",")]
+    methods = args.methods.split(",") if args.methods else public_methods()
+
+    missing = [name for name in public_methods() if name not in WORKLOADS]
+    if missing:
+        print(f"⚠️ Нет нагрузки для методов: {', '.join(missing)}")
+    methods = [name for name in methods if name in WORKLOADS]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "template.db")
+        started = time.perf_counter()
+        volumes = seed_database(template, args.users, args.keys, args.links, args.requests, args.seed)
+        print(f"✅ БД заполнена за {time.perf_counter() - started:.1f} сек.: {volumes}")
+        fixture = Fixture(template)
+
+        print(f"\n📊 {len(methods)} методов, параллелизм {levels}, {args.duration} сек. на замер")
+        print("-" * 72)
+        print(f"{'метод':<28} " + "  ".join(f"{'x' + str(level):>6} ops/s p99 мс" for level in levels))
+
+        results = {}
+        for name in methods:
+            results[name] = asyncio.run(
+                run_method(template, tmp, name, fixture, levels, args.duration, args.backend)
+            )
+            print(f"{name:<28} " + "  ".join(
+                f"{r['ops_per_sec']:>12.0f} {r['p99_ms']:>6.2f}" for r in results[name].values()
+            ))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'backend': args.backend,
+            'volumes': volumes,
+            'concurrency': levels,
+            'duration': args.duration,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Бенчмарк методов Database")
+    parser.add_argument("--users", type=int, default=5000, help="Количество пользователей")
+    parser.add_argument("--keys", type=int, default=20000, help="Количество ключей")
+    parser.add_argument("--links", type=int, default=50000, help="Количество ссылок")
+    parser.add_argument("--requests", type=int, default=100000, help="Записей журнала запросов")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора данных")
+    parser.add_argument("--concurrency", default="1,4,16", help="Уровни параллелизма через запятую")
+    parser.add_argument("--duration", type=float, default=1.0, help="Длительность замера, сек.")
+    parser.add_argument("--methods", help="Только эти методы (через запятую)")
+    parser.add_argument("--backend", choices=["threads", "dedicated"], default="threads",
+                        help="Где выполнять запросы к БД")
+    parser.add_argument("--output", help="Файл для результатов в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+
+    main(parser.parse_args())
@@ -0,0 +1,137 @@
+"""
+Локальная заглушка Telegram Bot API для нагрузочных тестов.
+
+Bot направляется на нее через AiohttpSession(api=TelegramAPIServer.from_base(url)).
+Методы отвечают так же, как Telegram (send*/edit* - объектом Message), последнее
+сообщение каждого чата запоминается вместе с клавиатурой, чтобы сценарий мог
+"нажать" inline-кнопку. Задержка ответа (--api-latency) имитирует сеть до Telegram.
+
+Запуск отдельно: python -m benchmarks.fake_bot_api --port 8081
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+BOT_USER = {"id": 100000, "is_bot": True, "first_name": "Fake Bot", "username": "fake_bot"}
+
+
+class FakeBotAPI:
+    """Заглушка Bot API: любой метод успешен, send*/edit* возвращают сообщение"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.document_bytes = 0
+        # Последнее сообщение бота в каждом чате
+        self.last_messages: Dict[int, Dict[str, Any]] = {}
+
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запуск сервера; возвращает базовый адрес"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def create_bot(self, url: str) -> Bot:
+        """Bot, который ходит в заглушку вместо api.telegram.org"""
+        return Bot(token="123456:FAKE-TOKEN", session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+
+    async def _read_params(self, request: web.Request) -> Tuple[Dict[str, Any], int]:
+        """Параметры метода и размер переданных файлов"""
+        params: Dict[str, Any] = {}
+        uploaded = 0
+        if request.content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.filename:
+                    while chunk := await part.read_chunk():
+                        uploaded += len(chunk)
+                else:
+                    params[part.name] = await part.text()
+        elif request.can_read_body:
+            params.update(await request.post())
+        return params, uploaded
+
+    def _message(self, params: Dict[str, Any], method: str) -> Dict[str, Any]:
+        chat_id = int(params.get("chat_id", 0))
+        message = {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if method == "senddocument":
+            message["document"] = {"file_id": "fake", "file_unique_id": "fake"}
+        if params.get("reply_markup"):
+            markup = json.loads(params["reply_markup"])
+            if "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+        self.last_messages[chat_id] = message
+        return message
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        self.calls[method] += 1
+        params, uploaded = await self._read_params(request)
+        self.document_bytes += uploaded
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getme":
+            result: Any = BOT_USER
+        elif method.startswith(("send", "edit")) and "chat_id" in params:
+            result = self._message(params, method)
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Заглушка Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес сервера")
+    parser.add_argument("--port", type=int, default=8081, help="Порт сервера")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Задержка ответа, сек.")
+
+    args = parser.parse_args()
+
+    async def serve():
+        fake_api = FakeBotAPI(latency=args.api_latency)
+        url = await fake_api.start(args.host, args.port)
+        print(f"🌐 Заглушка Bot API: {url} (Ctrl+C - остановка)")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await fake_api.stop()
+            print(f"📊 Вызовы: {dict(fake_api.calls)}")
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,144 @@
+"""
+Бенчмарк поиска по ссылкам: LIKE по четырем колонкам против индекса FTS5
+при десятках тысяч ссылок у одного пользователя. Оба варианта вызываются через
+Database.search_user_links (для LIKE индекс отключен), поэтому накладные
+расходы пула и потоков у них одинаковые. Запросы делятся на узкие и широкие
+по числу совпадений: LIKE останавливается на первых 20 совпадениях по дате,
+а FTS5 ранжирует bm25 все совпадения, поэтому широкие короткие префиксы
+(сотни совпадений) он обрабатывает медленнее, а узкие - быстрее.
+
+Запуск: python -m benchmarks.link_search --links 20000 --queries 200
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from benchmarks.seed import CATEGORIES, WORDS
+from database.db import Database
+
+SYLLABLES = ["ka", "ro", "mi", "ta", "lu", "ne", "so", "vi", "da", "pe", "zu", "go"]
+
+
+def make_vocabulary(size: int) -> list:
+    """Словарь: частые слова плюс синтетические редкие"""
+    vocabulary = set(WORDS)
+    while len(vocabulary) < size:
+        vocabulary.add("".join(random.choices(SYLLABLES, k=random.randint(2, 4))))
+    return sorted(vocabulary)
+
+
+def seed(db_path: str, user_id: int, links: int, other_users: int, vocabulary: list):
+    """Ссылки целевого пользователя плюс фон из ссылок других пользователей"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
+        ((uid, f"user{uid}", f"User {uid}") for uid in range(user_id, user_id + other_users + 1))
+    )
+
+    def rows():
+        for i in range(links * (other_users + 1)):
+            owner = user_id + i % (other_users + 1)
+            title = " ".join(random.sample(vocabulary, 3))
+            description = " ".join(random.sample(vocabulary, 6))
+            yield (owner, f"https://{random.choice(vocabulary)}.example.com/{i}", title,
+                   description, random.choice(CATEGORIES))
+
+    conn.executemany(
+        "INSERT INTO user_links (user_id, url, title, description, category) VALUES (?, ?, ?, ?, ?)",
+        rows()
+    )
+    conn.commit()
+    conn.close()
+
+
+# С этого числа совпадений у пользователя запрос считается широким
+BROAD_QUERY_MATCHES = 200
+
+
+def count_matches(conn: sqlite3.Connection, user_id: int, query: str) -> int:
+    pattern = f"%{query}%"
+    return conn.execute('''
+        SELECT COUNT(*) FROM user_links
+        WHERE user_id = ? AND (url LIKE ? OR title LIKE ? OR description LIKE ? OR category LIKE ?)
+    ''', (user_id, pattern, pattern, pattern, pattern)).fetchone()[0]
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"{p50 * 1000:>8.2f} | {p99 * 1000:>8.2f}"
+
+
+async def main(links: int, other_users: int, queries: int, vocabulary_size: int):
+    user_id = 1
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db = Database(db_path)
+        await db.create_tables()
+        started = time.perf_counter()
+        vocabulary = make_vocabulary(vocabulary_size)
+        seed(db_path, user_id, links, other_users, vocabulary)
+        # Пока онлайн-построение индекса не завершено, Database ищет через LIKE
+        await db.run_online_builds()
+        print(f"🌱 Наполнение: {time.perf_counter() - started:.1f} сек. "
+              f"(индекс FTS5 обновляется триггерами)")
+
+        terms = [random.choice(vocabulary) for _ in range(queries)]
+        # Префиксы из 3-4 символов - типичный ввод пользователя
+        terms = [term[:random.randint(3, len(term))] for term in terms]
+
+        # Прежний вариант поиска: полный перебор ссылок пользователя через LIKE
+        like_db = Database(db_path)
+        like_db._fts_enabled = False
+
+        count_conn = sqlite3.connect(db_path)
+        # Группа запроса -> времена LIKE и FTS5
+        groups = {"все": ([], []), "узкие": ([], []), "широкие": ([], [])}
+        for term in terms:
+            t = time.perf_counter()
+            await like_db.search_user_links(user_id, term)
+            like_time = time.perf_counter() - t
+
+            t = time.perf_counter()
+            await db.search_user_links(user_id, term)
+            fts_time = time.perf_counter() - t
+
+            broad = count_matches(count_conn, user_id, term) >= BROAD_QUERY_MATCHES
+            for group in ("все", "широкие" if broad else "узкие"):
+                groups[group][0].append(like_time)
+                groups[group][1].append(fts_time)
+        count_conn.close()
+
+        if not db._fts_enabled:
+            print("⚠️ Индекс FTS5 недоступен: оба столбца измеряют LIKE")
+
+        await like_db.close()
+        await db.close()
+
+    print(f"\n📊 Поиск по {links} ссылкам пользователя ({other_users} фоновых польз., {queries} запросов; "
+          f"широкие - от {BROAD_QUERY_MATCHES} совпадений)")
+    print("-" * 52)
+    print(f"{'запросы':>8} | {'кол-во':>6} | {'метод':>5} | {'p50, мс':>8} | {'p99, мс':>8}")
+    for group, (like_times, fts_times) in groups.items():
+        if not like_times:
+            continue
+        print(f"{group:>8} | {len(like_times):>6} | {'LIKE':>5} | {percentiles(like_times)}")
+        print(f"{'':>8} | {'':>6} | {'FTS5':>5} | {percentiles(fts_times)}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска по ссылкам пользователя")
+    parser.add_argument("--links", type=int, default=10000, help="Ссылок у каждого пользователя")
+    parser.add_argument("--other-users", type=int, default=1, help="Пользователей с такими же объемами ссылок")
+    parser.add_argument("--vocabulary", type=int, default=2000, help="Размер словаря заголовков и описаний")
+    parser.add_argument("--queries", type=int, default=200, help="Количество поисковых запросов")
+
+    args = parser.parse_args()
+    asyncio.run(main(args.links, args.other_users, args.queries, args.vocabulary))
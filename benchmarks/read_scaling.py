@@ -0,0 +1,152 @@
+"""
+Бенчмарк пула читателей: Database с одним соединением для чтения (как до пула)
+против пула из нескольких соединений.
+
+Два замера для каждого размера пула:
+  • пропускная способность check_user_access и get_all_keys при параллелизме
+    2 x размер пула; кэш доступа отключен (ACCESS_CACHE_SIZE=0), иначе
+    check_user_access измерял бы кэш, а не БД;
+  • задержка точечных чтений check_user_access, пока фоном идут тяжелые
+    чтения get_all_keys (полный просмотр ключей с сортировкой, как список
+    ключей у администратора). С одним соединением точечное чтение ждет
+    тяжелое целиком, с пулом идет параллельно.
+
+Прирост пропускной способности ограничен числом ядер: SQLite отпускает GIL
+только на время выполнения запроса, разбор строк в Python идет под GIL.
+На одном ядре пул выигрывает только вторым замером.
+
+Запуск: python -m benchmarks.read_scaling --users 2000 --keys 100000 [--backend dedicated]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from config import Config
+from database.keys import key_digest
+
+
+def seed(db_path: str, users: int, keys: int):
+    """Наполнение БД синтетическими пользователями и ключами"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name, subscription_plan_id, "
+        "requests_limit, subscription_start, subscription_end) "
+        "VALUES (?, ?, ?, 1, 50, date('now'), date('now', '+30 days'))",
+        ((user_id, f"user{user_id}", f"User {user_id}") for user_id in range(1, users + 1))
+    )
+    conn.executemany(
+        "INSERT INTO activation_keys (key_digest, plan_id, key_code) VALUES (?, ?, ?)",
+        ((key_digest(f"KEY{i}"), random.randint(1, 5), f"KEY{i}") for i in range(keys))
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run_workload(db, operation, concurrency: int, duration: float) -> float:
+    """Сколько операций в секунду выдерживает Database при заданном параллелизме"""
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            await operation()
+            completed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return completed / (time.perf_counter() - started)
+
+
+async def point_reads_beside_heavy(db, users: int, heavy_readers: int, duration: float) -> Dict[str, float]:
+    """Задержка check_user_access, пока heavy_readers задач без перерыва читают get_all_keys"""
+    deadline = time.perf_counter() + duration
+    heavy_done = 0
+
+    async def heavy():
+        nonlocal heavy_done
+        while time.perf_counter() < deadline:
+            await db.get_all_keys(limit=20)
+            heavy_done += 1
+
+    heavy_tasks = [asyncio.create_task(heavy()) for _ in range(heavy_readers)]
+    latencies: List[float] = []
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        await db.check_user_access(random.randint(1, users))
+        latencies.append(time.perf_counter() - started)
+    await asyncio.gather(*heavy_tasks)
+
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'rate': len(latencies) / duration,
+        'heavy_rate': heavy_done / duration,
+    }
+
+
+async def main(users: int, keys: int, pool_sizes: list, duration: float, backend: str, heavy_readers: int):
+    # До импорта database.db: кэш доступа не должен отвечать вместо БД
+    Config.ACCESS_CACHE_SIZE = 0
+    from database.db import Database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        Config.REQUEST_JOURNAL_SPILL_PATH = os.path.join(tmp, "journal.spill")
+        setup_db = Database(db_path)
+        await setup_db.create_tables()
+        await setup_db.close()
+        seed(db_path, users, keys)
+
+        loop = asyncio.get_running_loop()
+        results = []
+        for pool_size in pool_sizes:
+            # Потоков хватает и на тяжелые чтения, и на точечные
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=pool_size * 2 + heavy_readers))
+            db = Database(db_path, read_pool_size=pool_size, backend=backend)
+
+            access_rate = await run_workload(
+                db, lambda: db.check_user_access(random.randint(1, users)), pool_size * 2, duration
+            )
+            keys_rate = await run_workload(
+                db, lambda: db.get_all_keys(limit=20), pool_size * 2, duration
+            )
+            mixed = await point_reads_beside_heavy(db, users, heavy_readers, duration)
+
+            await db.close()
+            results.append((pool_size, access_rate, keys_rate, mixed))
+
+    print(f"\n📊 Пул читателей: {users} польз., {keys} ключей, {duration} сек. на замер, "
+          f"backend={backend}, ядер: {os.cpu_count()}")
+    print("Пул 1 - одно соединение для всех чтений, как до пула; кэш доступа отключен")
+    print("-" * 96)
+    print(f"{'пул':>4} | {'check_user_access/с':>19} | {'get_all_keys/с':>14} | "
+          f"{'точечное рядом с тяжелым: p50 мс':>32} | {'p99 мс':>7} | {'тяжелых/с':>9}")
+    for pool_size, access_rate, keys_rate, mixed in results:
+        print(f"{pool_size:>4} | {access_rate:>19.0f} | {keys_rate:>14.1f} | {mixed['p50'] * 1000:>32.2f} | "
+              f"{mixed['p99'] * 1000:>7.2f} | {mixed['heavy_rate']:>9.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Бенчмарк параллельных чтений Database")
+    parser.add_argument("--users", type=int, default=2000, help="Количество пользователей")
+    parser.add_argument("--keys", type=int, default=100000, help="Количество ключей")
+    parser.add_argument("--threads", default="1,2,4,8", help="Размеры пула читателей через запятую")
+    parser.add_argument("--heavy-readers", type=int, default=1,
+                        help="Сколько тяжелых чтений идет параллельно с точечными")
+    parser.add_argument("--duration", type=float, default=3.0, help="Длительность каждого прогона, сек.")
+    parser.add_argument("--backend", choices=["threads", "dedicated"], default="threads",
+                        help="Где выполнять запросы к БД")
+
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.keys, [int(t) for t in args.threads.split(",")], args.duration,
+                     args.backend, args.heavy_readers))
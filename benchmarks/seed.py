@@ -0,0 +1,157 @@
+"""
+Генератор синтетической БД для бенчмарков: пользователи, ключи, ссылки
+и журнал запросов в заданных объемах. Схема создается Database.create_tables,
+данные вставляются напрямую пачками.
+
+Запуск: python -m benchmarks.seed data/bench.db --users 10000 --keys 50000 --links 100000 --requests 200000
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from database.keys import generate_key_codes, key_digest
+
+CHUNK_SIZE = 10000
+
+CATEGORIES = ["general", "work", "study", "fun", "news", "dev"]
+WORDS = [
+    "python", "asyncio", "sqlite", "telegram", "бот", "рецепт", "новости", "музыка",
+    "кино", "спорт", "работа", "учеба", "дизайн", "docker", "linux", "статья",
+    "видео", "книга", "курс", "путешествия", "финансы", "здоровье", "игры", "наука",
+]
+REQUEST_TYPES = ["api_info", "bot_send", "search", "export"]
+
+# Пользователи с id от FIRST_USER_ID, чтобы не пересекаться с настоящими
+FIRST_USER_ID = 1_000_000
+
+
+def _chunks(rows, size: int = CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _timestamp(rnd: random.Random, days: int = 180) -> str:
+    moment = datetime.utcnow() - timedelta(seconds=rnd.randint(0, days * 86400))
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def seed_database(db_path: str, users: int = 1000, keys: int = 5000, links: int = 10000,
+                  requests: int = 20000, seed: int = 42) -> Dict[str, int]:
+    """Наполнение новой БД; каждый третий ключ активирован пользователем"""
+    if os.path.exists(db_path):
+        raise FileExistsError(f"БД уже существует: {db_path}")
+    rnd = random.Random(seed)
+
+    # database.db при импорте создает общий экземпляр на Config.DB_PATH,
+    # поэтому импорт отложен: словари модуля нужны и без БД
+    from database.db import Database
+
+    async def create_schema():
+        db = Database(db_path)
+        await db.create_tables()
+        await db.close()
+
+    asyncio.run(create_schema())
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    plan_ids = [row[0] for row in conn.execute("SELECT id FROM subscription_plans ORDER BY id")]
+    user_ids = list(range(FIRST_USER_ID, FIRST_USER_ID + users))
+
+    for chunk in _chunks(
+            (user_id, f"user{user_id}", f"User {user_id}", _timestamp(rnd)) for user_id in user_ids):
+        conn.executemany(
+            "INSERT INTO users (user_id, username, full_name, created_at) VALUES (?, ?, ?, ?)", chunk
+        )
+
+    key_codes = generate_key_codes(keys)
+    key_rows = ((key_digest(code), rnd.choice(plan_ids[1:]), code) for code in key_codes)
+    for chunk in _chunks(key_rows):
+        conn.executemany(
+            "INSERT INTO activation_keys (key_digest, plan_id, key_code) VALUES (?, ?, ?)", chunk
+        )
+
+    # Каждый третий ключ активирован своим пользователем (пока пользователи не кончатся)
+    activated = min(keys // 3, users)
+    today = datetime.utcnow().date()
+    conn.executemany('''
+        UPDATE activation_keys SET is_used = 1, used_by_user_id = ?, used_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', ((user_ids[i], i * 3 + 1) for i in range(activated)))
+    conn.executemany('''
+        UPDATE users SET activation_key_id = ?,
+               subscription_plan_id = (SELECT plan_id FROM activation_keys WHERE id = ?),
+               requests_limit = 1000, requests_used = ?,
+               subscription_start = ?, subscription_end = ?
+        WHERE user_id = ?
+    ''', ((i * 3 + 1, i * 3 + 1, rnd.randint(0, 500), today, today + timedelta(days=30), user_ids[i])
+          for i in range(activated)))
+    conn.executemany('''
+        INSERT INTO subscription_history (user_id, plan_id, activation_key_id, start_date, end_date)
+        SELECT used_by_user_id, plan_id, id, ?, ? FROM activation_keys WHERE id = ?
+    ''', ((today, today + timedelta(days=30), i * 3 + 1) for i in range(activated)))
+
+    # Ссылки распределены неравномерно: у части пользователей их сотни
+    weights = [rnd.paretovariate(1.5) for _ in user_ids]
+    link_owners = rnd.choices(user_ids, weights=weights, k=links)
+    link_rows = (
+        (
+            owner,
+            f"https://example.com/{rnd.choice(WORDS)}/{n}",
+            " ".join(rnd.sample(WORDS, 3)).capitalize(),
+            " ".join(rnd.sample(WORDS, 6)) if rnd.random() < 0.6 else None,
+            rnd.choice(CATEGORIES),
+            _timestamp(rnd),
+        )
+        for n, owner in enumerate(link_owners)
+    )
+    for chunk in _chunks(link_rows):
+        conn.executemany('''
+            INSERT INTO user_links (user_id, url, title, description, category, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', chunk)
+
+    request_rows = (
+        (rnd.choice(user_ids), rnd.choice(REQUEST_TYPES), "GET /user/info", "ok",
+         rnd.randint(0, 500), _timestamp(rnd, days=90))
+        for _ in range(requests)
+    )
+    for chunk in _chunks(request_rows):
+        conn.executemany('''
+            INSERT INTO user_requests (user_id, request_type, request_data, response_data, tokens_used, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', chunk)
+
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    return {'users': users, 'keys': keys, 'activated_keys': activated, 'links': links, 'requests': requests}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Синтетическая БД для бенчмарков")
+    parser.add_argument("db_path", help="Путь к создаваемой БД")
+    parser.add_argument("--users", type=int, default=1000, help="Количество пользователей")
+    parser.add_argument("--keys", type=int, default=5000, help="Количество ключей")
+    parser.add_argument("--links", type=int, default=10000, help="Количество ссылок")
+    parser.add_argument("--requests", type=int, default=20000, help="Записей журнала запросов")
+    parser.add_argument("--seed", type=int, default=42, help="Зерно генератора")
+
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed_database(args.db_path, args.users, args.keys, args.links, args.requests, args.seed)
+    print(f"✅ БД заполнена за {time.perf_counter() - started:.1f} сек.: {counts}")
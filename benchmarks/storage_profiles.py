@@ -0,0 +1,126 @@
+"""
+Сравнение профилей хранения SQLite (database/storage.py) на пути записи эхо-сообщения.
+
+Для каждого профиля создается новая БД и измеряются два режима:
+  • фиксация на сообщение - запись в user_requests и счетчик пользователя
+    одной транзакцией, как без отложенной записи (здесь видна цена fsync);
+  • журнал - add_user_request + increment_user_requests через Database,
+    запись пачками; время включает сброс буферов при закрытии.
+
+БД создается в --dir (по умолчанию data/): во временной папке в памяти (tmpfs)
+fsync ничего не стоит и разница между профилями не видна.
+
+Запуск: python -m benchmarks.storage_profiles --messages 2000 [--profiles sqlite_default,tuned]
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from database.storage import STORAGE_PROFILES, StorageProfile, connect
+
+USERS = 100
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(q * len(values))) - 1)] if values else 0.0
+
+
+async def create_schema(db_path: str, profile: StorageProfile):
+    from database.db import Database
+
+    db = Database(db_path, storage_profile=profile)
+    await db.create_tables()
+    for user_id in range(1, USERS + 1):
+        await db.add_user(user_id, f"user{user_id}", f"User {user_id}")
+    await db.close()
+
+
+def per_message_commits(db_path: str, profile: StorageProfile, messages: int) -> Dict[str, float]:
+    """Эхо без отложенной записи: транзакция на каждое сообщение"""
+    conn = connect(db_path, profile, isolation_level="IMMEDIATE")
+    latencies = []
+    started = time.perf_counter()
+    for n in range(messages):
+        user_id = n % USERS + 1
+        text = f"сообщение {n}"
+        commit_started = time.perf_counter()
+        conn.execute('''
+            INSERT INTO user_requests (user_id, request_type, request_data, response_data, tokens_used)
+            VALUES (?, 'echo_message', ?, ?, 0)
+        ''', (user_id, text, f"Echo: {text}"))
+        conn.execute("UPDATE users SET requests_used = requests_used + 1 WHERE user_id = ?", (user_id,))
+        conn.commit()
+        latencies.append(time.perf_counter() - commit_started)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return {
+        'rate': messages / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+async def journal_writes(db_path: str, profile: StorageProfile, messages: int) -> Dict[str, float]:
+    """Эхо через Database: журнал и счетчики пишутся пачками"""
+    from database.db import Database
+
+    db = Database(db_path, storage_profile=profile)
+    started = time.perf_counter()
+    for n in range(messages):
+        user_id = n % USERS + 1
+        text = f"сообщение {n}"
+        await db.add_user_request(user_id, "echo_message", text, f"Echo: {text}")
+        await db.increment_user_requests(user_id)
+    # close() дописывает оставшиеся пачки
+    await db.close()
+    return {'rate': messages / (time.perf_counter() - started)}
+
+
+async def run_profile(directory: str, name: str, profile: StorageProfile, messages: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        db_path = os.path.join(tmp, "profile.db")
+        await create_schema(db_path, profile)
+
+        result = await asyncio.to_thread(per_message_commits, db_path, profile, messages)
+        result['journal_rate'] = (await journal_writes(db_path, profile, messages))['rate']
+        return result
+
+
+async def main(directory: str, names: List[str], messages: int):
+    from config import Config
+
+    os.makedirs(directory, exist_ok=True)
+    results = {}
+    for name in names:
+        profile = STORAGE_PROFILES.get(name) or StorageProfile.from_config()
+        # Файл переполнения журнала - рядом с временными БД
+        Config.REQUEST_JOURNAL_SPILL_PATH = os.path.join(directory, f"{name}.spill")
+        results[name] = (profile, await run_profile(directory, name, profile, messages))
+
+    print(f"\n💾 Профили хранения: {messages} эхо-сообщений, БД в {os.path.abspath(directory)}")
+    print(f"{'профиль':<16} {'фиксаций/с':>11} {'p50 мс':>8} {'p99 мс':>8} {'журнал, сообщ./с':>17}")
+    print("-" * 64)
+    for name, (profile, result) in results.items():
+        print(f"{name:<16} {result['rate']:>11.0f} {result['p50'] * 1000:>8.2f} {result['p99'] * 1000:>8.2f} "
+              f"{result['journal_rate']:>17.0f}")
+
+    print("\nПараметры профилей:")
+    for name, (profile, _) in results.items():
+        print(f"  {name}: journal_mode={profile.journal_mode}, synchronous={profile.synchronous}, "
+              f"cache_size={profile.cache_size}, mmap_size={profile.mmap_size}, temp_store={profile.temp_store}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сравнение профилей хранения SQLite на записи эхо-сообщений")
+    parser.add_argument("--messages", type=int, default=2000, help="Сообщений на профиль")
+    parser.add_argument("--profiles", default=",".join(list(STORAGE_PROFILES) + ["config"]),
+                        help="Профили через запятую (config - профиль из настроек)")
+    parser.add_argument("--dir", default="data", help="Папка для временных БД (лучше на реальном диске)")
+
+    args = parser.parse_args()
+    asyncio.run(main(args.dir, args.profiles.split(","), args.messages))
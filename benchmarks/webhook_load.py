@@ -0,0 +1,127 @@
+"""
+Нагрузочный тест вебхука: синтетические апдейты POST-запросами на WebhookServer.
+
+Бот работает с заглушкой Bot API на localhost (ответы без сети), БД - временная.
+Считается, сколько апдейтов в секунду сервер принимает и сколько успевает обработать.
+
+Запуск: python -m benchmarks.webhook_load --updates 5000 --users 500 --concurrency 50
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Tuple
+
+from aiohttp import ClientSession, TCPConnector, web
+
+from benchmarks.fake_bot_api import FakeBotAPI
+from config import Config
+
+SECRET = "benchmark-secret"
+COMMANDS = "/start,/help,/profile,/my_links,/subscription"
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+            if text.startswith("/") else [],
+        },
+    }
+
+
+async def start_site(app: web.Application) -> Tuple[web.AppRunner, str]:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+async def main(updates: int, users: int, concurrency: int, max_concurrency: int, commands: list):
+    from database.db import database
+    from main import create_dispatcher
+    from webhook import SECRET_HEADER, WebhookServer
+
+    fake_api = FakeBotAPI()
+    bot = fake_api.create_bot(await fake_api.start())
+    dp = create_dispatcher()
+    server = WebhookServer(bot, dp, path="/webhook", secret=SECRET, max_concurrency=max_concurrency)
+    server_runner, server_url = await start_site(server.create_app())
+
+    await database.create_tables()
+
+    # Сначала каждый пользователь регистрируется, дальше - случайные команды
+    payloads = [make_update(i + 1, i + 1, "/start") for i in range(min(users, updates))]
+    payloads += [
+        make_update(i + 1, random.randint(1, users), random.choice(commands))
+        for i in range(len(payloads), updates)
+    ]
+
+    print(f"\n🌐 Вебхук: {updates} апдейтов от {users} польз., {concurrency} соединений, "
+          f"обработка до {max_concurrency} одновременно")
+    print("-" * 60)
+
+    latencies = []
+    queue = iter(payloads)
+
+    async def client(session: ClientSession):
+        for payload in queue:
+            started = time.perf_counter()
+            async with session.post(f"{server_url}/webhook", json=payload,
+                                    headers={SECRET_HEADER: SECRET}) as response:
+                if response.status != 200:
+                    raise RuntimeError(f"Вебхук ответил {response.status}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    accepted_in = time.perf_counter() - started
+
+    await server.drain(timeout=300)
+    processed_in = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Прием:     {updates / accepted_in:>8.0f} апд./сек. "
+          f"(ответ p50 {statistics.median(latencies) * 1000:.1f} мс, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} мс)")
+    print(f"Обработка: {updates / processed_in:>8.0f} апд./сек. ({processed_in:.2f} сек.)")
+    print(f"Вызовов Bot API: {sum(fake_api.calls.values())}")
+    print(f"📊 {server.stats()}")
+
+    await server_runner.cleanup()
+    await bot.session.close()
+    await fake_api.stop()
+    await database.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Нагрузочный тест вебхука")
+    parser.add_argument("--updates", type=int, default=5000, help="Количество апдейтов")
+    parser.add_argument("--users", type=int, default=500, help="Количество пользователей")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременных HTTP-соединений")
+    parser.add_argument("--max-concurrency", type=int, default=Config.WEBHOOK_MAX_CONCURRENCY,
+                        help="Ограничение одновременной обработки на сервере")
+    parser.add_argument("--commands", default=COMMANDS, help="Команды апдейтов через запятую")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Временная БД: путь подменяется до первого импорта database.db
+        Config.DB_PATH = os.path.join(tmp, "webhook.db")
+        Config.FSM_STORAGE = "memory"
+        Config.REQUEST_JOURNAL_SPILL_PATH = os.path.join(tmp, "journal.spill")
+        asyncio.run(main(args.updates, args.users, args.concurrency, args.max_concurrency,
+                         args.commands.split(",")))
@@ -8,7 +8,146 @@ ADMIN_ID = os.getenv("ADMIN_ID")
 
 DB_PATH = "data/database.db"
 
+# Пул соединений-читателей БД (писатель всегда один)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30))
+
+# Где выполняются запросы к БД: threads (asyncio.to_thread) или dedicated (свои потоки)
+DB_BACKEND = os.getenv("DB_BACKEND", "threads")
+
+# Сколько секунд соединение ждет блокировку записи, занятую другим процессом
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", 30))
+
+# Профиль хранения SQLite (database/storage.py) для бота, API и скриптов.
+# WAL + synchronous=NORMAL: fsync только при checkpoint, а не на каждую фиксацию;
+# при сбое питания теряются лишь последние фиксации, целостность БД сохраняется.
+# DB_CACHE_SIZE - кэш страниц на соединение (отрицательное значение - КиБ),
+# DB_MMAP_SIZE - сколько байт файла читается через отображение в память
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", -16384))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_TEMP_STORE = os.getenv("DB_TEMP_STORE", "MEMORY")
+# INCREMENTAL - место после очистки журнала запросов возвращается по частям
+DB_AUTO_VACUUM = os.getenv("DB_AUTO_VACUUM", "INCREMENTAL")
+
+# Онлайн-построение индексов после миграции схемы: строк в одной транзакции
+# и пауза между пачками, мс (в паузах блокировку записи получает бот)
+SCHEMA_ONLINE_BUILD_BATCH_SIZE = int(os.getenv("SCHEMA_ONLINE_BUILD_BATCH_SIZE", 5000))
+SCHEMA_ONLINE_BUILD_PAUSE_MS = int(os.getenv("SCHEMA_ONLINE_BUILD_PAUSE_MS", 50))
+
+# Хранилище состояний FSM: memory (в процессе) или sqlite (общее для всех процессов)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+FSM_DB_PATH = "data/fsm.db"
+
+# Сколько процессов-обработчиков запускает launcher.py (апдейты делятся по user_id)
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", 2))
+
+# Вебхук (webhook.py): публичный адрес бота, секрет заголовка X-Telegram-Bot-Api-Secret-Token,
+# адрес локального сервера и сколько апдейтов обрабатывается одновременно
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", 100))
+# Сколько секунд при остановке дорабатываются принятые апдейты
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 30))
+
+# Отложенная запись счетчиков запросов: сброс раз в N мс или после M событий
+REQUESTS_FLUSH_INTERVAL_MS = int(os.getenv("REQUESTS_FLUSH_INTERVAL_MS", 500))
+REQUESTS_FLUSH_MAX_EVENTS = int(os.getenv("REQUESTS_FLUSH_MAX_EVENTS", 100))
+
+# Кэш проверок доступа (check_user_access): размер и время жизни записи, сек.
+ACCESS_CACHE_SIZE = int(os.getenv("ACCESS_CACHE_SIZE", 10000))
+ACCESS_CACHE_TTL = float(os.getenv("ACCESS_CACHE_TTL", 60))
+
+# Кэш количества ссылок пользователя для пагинации /my_links
+LINK_COUNT_CACHE_SIZE = int(os.getenv("LINK_COUNT_CACHE_SIZE", 10000))
+LINK_COUNT_CACHE_TTL = float(os.getenv("LINK_COUNT_CACHE_TTL", 300))
+
+# Журнал запросов (user_requests): буфер в памяти и пакетная запись.
+# При переполнении буфера: drop - отбросить, block - ждать, spill - дописать в файл
+REQUEST_JOURNAL_CAPACITY = int(os.getenv("REQUEST_JOURNAL_CAPACITY", 10000))
+REQUEST_JOURNAL_BATCH_SIZE = int(os.getenv("REQUEST_JOURNAL_BATCH_SIZE", 500))
+REQUEST_JOURNAL_INTERVAL_MS = int(os.getenv("REQUEST_JOURNAL_INTERVAL_MS", 1000))
+REQUEST_JOURNAL_OVERFLOW = os.getenv("REQUEST_JOURNAL_OVERFLOW", "drop")
+REQUEST_JOURNAL_SPILL_PATH = "data/request_journal.spill"
+
+# Хранение журнала запросов: записи старше RETENTION_DAYS сворачиваются в дневные
+# итоги (user_requests_daily) и удаляются, в режиме archive - переносятся в ARCHIVE_PATH.
+# Фоновая свертка раз в COMPACTION_INTERVAL сек. (0 - отключена), пачками по BATCH_SIZE
+# строк с паузой PAUSE_MS; затем incremental_vacuum по VACUUM_PAGES страниц за шаг
+REQUEST_RETENTION_DAYS = float(os.getenv("REQUEST_RETENTION_DAYS", 30))
+REQUEST_RETENTION_MODE = os.getenv("REQUEST_RETENTION_MODE", "delete")
+REQUEST_ARCHIVE_PATH = "data/requests_archive.db"
+REQUEST_COMPACTION_INTERVAL = float(os.getenv("REQUEST_COMPACTION_INTERVAL", 3600))
+REQUEST_COMPACTION_BATCH_SIZE = int(os.getenv("REQUEST_COMPACTION_BATCH_SIZE", 2000))
+REQUEST_COMPACTION_PAUSE_MS = int(os.getenv("REQUEST_COMPACTION_PAUSE_MS", 50))
+REQUEST_VACUUM_PAGES = int(os.getenv("REQUEST_VACUUM_PAGES", 1000))
+
+# Фильтр Блума выданных ключей: несуществующие ключи отсекаются без запроса к БД.
+# При промахе сверяется MAX(id) ключей: новые ключи других процессов дочитываются в фильтр.
+KEY_FILTER_ENABLED = os.getenv("KEY_FILTER_ENABLED", "1") == "1"
+KEY_FILTER_ERROR_RATE = float(os.getenv("KEY_FILTER_ERROR_RATE", 0.001))
+
+# Метрики времени обработчиков и запросов к БД; перцентили считаются
+# по последним METRICS_RESERVOIR_SIZE наблюдениям каждой серии
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_RESERVOIR_SIZE = int(os.getenv("METRICS_RESERVOIR_SIZE", 1024))
+# /metrics отдается отдельным HTTP-сервером, не на публичном адресе вебхука (0 - не запускать)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+
 class Config:
     BOT_TOKEN = BOT_TOKEN
     ADMIN_ID = int(ADMIN_ID) if ADMIN_ID else None
-    DB_PATH = DB_PATH
\ No newline at end of file
+    DB_PATH = DB_PATH
+    DB_POOL_SIZE = DB_POOL_SIZE
+    DB_POOL_TIMEOUT = DB_POOL_TIMEOUT
+    DB_POOL_HEALTH_CHECK_INTERVAL = DB_POOL_HEALTH_CHECK_INTERVAL
+    DB_BACKEND = DB_BACKEND
+    DB_BUSY_TIMEOUT = DB_BUSY_TIMEOUT
+    DB_JOURNAL_MODE = DB_JOURNAL_MODE
+    DB_SYNCHRONOUS = DB_SYNCHRONOUS
+    DB_CACHE_SIZE = DB_CACHE_SIZE
+    DB_MMAP_SIZE = DB_MMAP_SIZE
+    DB_TEMP_STORE = DB_TEMP_STORE
+    DB_AUTO_VACUUM = DB_AUTO_VACUUM
+    SCHEMA_ONLINE_BUILD_BATCH_SIZE = SCHEMA_ONLINE_BUILD_BATCH_SIZE
+    SCHEMA_ONLINE_BUILD_PAUSE_MS = SCHEMA_ONLINE_BUILD_PAUSE_MS
+    FSM_STORAGE = FSM_STORAGE
+    FSM_DB_PATH = FSM_DB_PATH
+    BOT_WORKERS = BOT_WORKERS
+    WEBHOOK_BASE_URL = WEBHOOK_BASE_URL
+    WEBHOOK_PATH = WEBHOOK_PATH
+    WEBHOOK_SECRET = WEBHOOK_SECRET
+    WEBHOOK_HOST = WEBHOOK_HOST
+    WEBHOOK_PORT = WEBHOOK_PORT
+    WEBHOOK_MAX_CONCURRENCY = WEBHOOK_MAX_CONCURRENCY
+    WEBHOOK_DRAIN_TIMEOUT = WEBHOOK_DRAIN_TIMEOUT
+    REQUESTS_FLUSH_INTERVAL_MS = REQUESTS_FLUSH_INTERVAL_MS
+    REQUESTS_FLUSH_MAX_EVENTS = REQUESTS_FLUSH_MAX_EVENTS
+    ACCESS_CACHE_SIZE = ACCESS_CACHE_SIZE
+    ACCESS_CACHE_TTL = ACCESS_CACHE_TTL
+    LINK_COUNT_CACHE_SIZE = LINK_COUNT_CACHE_SIZE
+    LINK_COUNT_CACHE_TTL = LINK_COUNT_CACHE_TTL
+    REQUEST_JOURNAL_CAPACITY = REQUEST_JOURNAL_CAPACITY
+    REQUEST_JOURNAL_BATCH_SIZE = REQUEST_JOURNAL_BATCH_SIZE
+    REQUEST_JOURNAL_INTERVAL_MS = REQUEST_JOURNAL_INTERVAL_MS
+    REQUEST_JOURNAL_OVERFLOW = REQUEST_JOURNAL_OVERFLOW
+    REQUEST_JOURNAL_SPILL_PATH = REQUEST_JOURNAL_SPILL_PATH
+    REQUEST_RETENTION_DAYS = REQUEST_RETENTION_DAYS
+    REQUEST_RETENTION_MODE = REQUEST_RETENTION_MODE
+    REQUEST_ARCHIVE_PATH = REQUEST_ARCHIVE_PATH
+    REQUEST_COMPACTION_INTERVAL = REQUEST_COMPACTION_INTERVAL
+    REQUEST_COMPACTION_BATCH_SIZE = REQUEST_COMPACTION_BATCH_SIZE
+    REQUEST_COMPACTION_PAUSE_MS = REQUEST_COMPACTION_PAUSE_MS
+    REQUEST_VACUUM_PAGES = REQUEST_VACUUM_PAGES
+    KEY_FILTER_ENABLED = KEY_FILTER_ENABLED
+    KEY_FILTER_ERROR_RATE = KEY_FILTER_ERROR_RATE
+    METRICS_ENABLED = METRICS_ENABLED
+    METRICS_RESERVOIR_SIZE = METRICS_RESERVOIR_SIZE
+    METRICS_HOST = METRICS_HOST
+    METRICS_PORT = METRICS_PORT
\ No newline at end of file
@@ -0,0 +1,67 @@
+import math
+from threading import Lock
+from typing import Any, Dict, Iterable
+
+
+class BloomFilter:
+    """Фильтр Блума по SHA-256 дайджестам ключей.
+
+    Отвечает "точно нет" или "возможно есть": ключ, которого нет в фильтре,
+    гарантированно не выдавался, и БД можно не спрашивать. Позиции битов
+    берутся из самого дайджеста (двойное хеширование), он уже равномерный.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity < 1:
+            raise ValueError("Емкость фильтра должна быть не меньше 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("Доля ложных срабатываний должна быть в интервале (0, 1)")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Оптимальные размер и число хеш-функций для capacity элементов
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+
+        self._array = bytearray((self.bits + 7) // 8)
+        # Запись - под блокировкой (|= не атомарно), чтение - без нее
+        self._mutex = Lock()
+
+    def _positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, digest: bytes):
+        """Добавить дайджест"""
+        self.update((digest,))
+
+    def update(self, digests: Iterable[bytes]):
+        """Добавить несколько дайджестов"""
+        array = self._array
+        with self._mutex:
+            for digest in digests:
+                for position in self._positions(digest):
+                    array[position >> 3] |= 1 << (position & 7)
+                self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def false_positive_rate(self) -> float:
+        """Ожидаемая доля ложных срабатываний при текущем заполнении"""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def stats(self) -> Dict[str, Any]:
+        """Параметры фильтра"""
+        return {
+            'capacity': self.capacity,
+            'keys': self.count,
+            'size_bytes': len(self._array),
+            'hashes': self.hashes,
+            'target_error_rate': self.error_rate,
+            'estimated_error_rate': round(self.false_positive_rate(), 6),
+        }
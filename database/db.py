@@ -1,189 +1,419 @@
 import sqlite3
 import asyncio
-import secrets
-import string
-import hashlib
+import re
+import time
 from threading import Lock
 from pathlib import Path
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, AsyncIterator, Callable
 from config import Config
-
-
+from database.bloom import BloomFilter
+from database.cache import TTLCache
+from database.executor import DedicatedExecutor
+from database.instrumentation import current_call, instrument, record_execution, record_lock_wait
+from database.journal import RequestJournal, JournalRow
+from database.keys import generate_key_codes, insert_keys, key_digest
+from database.plans import PlanCatalog
+from database.pool import ConnectionPool
+from database.retention import (
+    compact_rowid_window, compact_window, cutoff_for, incremental_vacuum_step, open_archive,
+    request_log_stats
+)
+from database.schema import has_requests_time_index, migrate, online_build_step, pending_online_builds
+from database.storage import StorageProfile
+from database.write_behind import RequestCounterBuffer
+from utils.metrics import metrics
+
+
+@instrument
 class Database:
-    def __init__(self, db_path: str = Config.DB_PATH):
+    def __init__(self, db_path: str = Config.DB_PATH, read_pool_size: int = Config.DB_POOL_SIZE,
+                 backend: str = Config.DB_BACKEND, storage_profile: Optional[StorageProfile] = None):
         self.db_path = db_path
-        self._lock = Lock()
+        # journal_mode, synchronous, кэш страниц, mmap - для всех соединений одинаково
+        self.storage_profile = storage_profile or StorageProfile.from_config()
+        # Писатель в SQLite всегда один: записи сериализуются этой блокировкой,
+        # а чтения идут параллельно через отдельный пул (WAL)
+        self._write_lock = Lock()
         self._ensure_data_dir()
+        self._read_pool = ConnectionPool(
+            self._get_read_connection,
+            size=read_pool_size,
+            timeout=Config.DB_POOL_TIMEOUT,
+            health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL
+        )
+        self._write_pool = ConnectionPool(
+            self._get_write_connection,
+            size=1,
+            timeout=Config.DB_POOL_TIMEOUT,
+            health_check_interval=Config.DB_POOL_HEALTH_CHECK_INTERVAL
+        )
+
+        # "threads" - asyncio.to_thread на общем пуле потоков,
+        # "dedicated" - собственные потоки БД с очередью запросов
+        if backend == "dedicated":
+            # По потоку на каждого читателя и один на писателя
+            self._executor = DedicatedExecutor(threads=read_pool_size + 1, name="db")
+        elif backend == "threads":
+            self._executor = None
+        else:
+            raise ValueError(f"Неизвестный DB_BACKEND: {backend}")
+
+        # None - еще не проверяли, есть ли в базе полнотекстовый индекс ссылок
+        self._fts_enabled: Optional[bool] = None
+
+        # Справочник планов подписки (загружается при первом обращении к БД)
+        self._plans = PlanCatalog()
+        # Вызывается после изменения планов в этом процессе: launcher через него
+        # просит остальные процессы-обработчики перечитать справочник
+        self.on_plans_changed: Optional[Callable[[], None]] = None
+
+        # Фильтр Блума выданных ключей: None - еще не построен, все проверки идут в БД.
+        # _key_filter_max_id - до какого id ключи из activation_keys уже в фильтре
+        self._key_filter: Optional[BloomFilter] = None
+        self._key_filter_max_id = 0
+        self._key_filter_mutex = Lock()
+        self._key_filter_metrics = {
+            'build_time': None,
+            'builds': 0,
+            'refreshes': 0,
+            'rejected': 0,
+            'passed': 0,
+        }
+
+        # Кэш строк пользователей для check_user_access
+        self._access_cache = TTLCache(
+            maxsize=Config.ACCESS_CACHE_SIZE,
+            ttl=Config.ACCESS_CACHE_TTL
+        )
+
+        # Количество ссылок пользователя по категориям (для пагинации)
+        self._link_counts = TTLCache(
+            maxsize=Config.LINK_COUNT_CACHE_SIZE,
+            ttl=Config.LINK_COUNT_CACHE_TTL
+        )
+
+        # Счетчики запросов копятся в памяти и пишутся пачками
+        self._request_counters = RequestCounterBuffer(
+            self._flush_request_counters,
+            interval_ms=Config.REQUESTS_FLUSH_INTERVAL_MS,
+            max_events=Config.REQUESTS_FLUSH_MAX_EVENTS
+        )
+
+        # Итог последней свертки журнала запросов (compact_requests)
+        self._last_compaction: Optional[Dict[str, Any]] = None
+
+        # Журнал запросов пишется в user_requests пачками из фонового потока
+        self._journal = RequestJournal(
+            self._write_request_journal,
+            capacity=Config.REQUEST_JOURNAL_CAPACITY,
+            batch_size=Config.REQUEST_JOURNAL_BATCH_SIZE,
+            interval_ms=Config.REQUEST_JOURNAL_INTERVAL_MS,
+            overflow=Config.REQUEST_JOURNAL_OVERFLOW,
+            spill_path=Config.REQUEST_JOURNAL_SPILL_PATH
+        )
 
     def _ensure_data_dir(self):
         """Создает папку для базы данных если её нет"""
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
 
-    def _get_connection(self) -> sqlite3.Connection:
-        """Получение соединения с базой данных"""
-        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+    def _get_connection(self, writer: bool = False) -> sqlite3.Connection:
+        """Открытие нового соединения с базой данных"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               timeout=self.storage_profile.busy_timeout)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON")
+        self.storage_profile.apply(conn, writer=writer)
         return conn
 
-    def _generate_activation_key(self, length: int = 20) -> str:
-        """Генерация ключа активации"""
-        alphabet = string.ascii_uppercase + string.digits
-        # Убираем похожие символы (0/O, 1/I/L)
-        alphabet = alphabet.replace('0', '').replace('O', '').replace('1', '').replace('I', '').replace('L', '')
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
-
-    def _hash_key(self, key: str) -> str:
-        """Хеширование ключа для безопасного хранения"""
-        return hashlib.sha256(key.encode()).hexdigest()
-
-    async def create_tables(self):
-        """Создание таблиц в базе данных"""
-
-        def sync_create():
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
-
-                # Таблица подписок (планов)
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS subscription_plans (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT UNIQUE NOT NULL,
-                        description TEXT,
-                        price REAL DEFAULT 0,
-                        max_requests INTEGER DEFAULT 100,
-                        duration_days INTEGER DEFAULT 30,
-                        max_activation_keys INTEGER DEFAULT 1,
-                        is_active BOOLEAN DEFAULT 1,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                ''')
-
-                # Таблица ключей активации
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS activation_keys (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        key_hash TEXT UNIQUE NOT NULL,
-                        plan_id INTEGER NOT NULL,
-                        key_code TEXT UNIQUE NOT NULL,
-                        is_used BOOLEAN DEFAULT 0,
-                        used_by_user_id INTEGER,
-                        used_at TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        expires_at TIMESTAMP,
-                        FOREIGN KEY (plan_id) REFERENCES subscription_plans (id)
-                    )
-                ''')
+    def _get_write_connection(self) -> sqlite3.Connection:
+        """Соединение писателя: переключает журнал (WAL - читатели не блокируются записью)"""
+        conn = self._get_connection(writer=True)
+        # _write_lock действует только внутри процесса: неявные транзакции сразу
+        # берут блокировку записи SQLite, и писатели разных процессов ждут друг
+        # друга (busy timeout), а не падают при повышении блокировки чтения
+        conn.isolation_level = "IMMEDIATE"
+        return conn
 
-                # Основная таблица пользователей
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER UNIQUE NOT NULL,
-                        username TEXT,
-                        full_name TEXT NOT NULL,
-                        subscription_plan_id INTEGER DEFAULT 1,
-                        activation_key_id INTEGER,
-                        requests_used INTEGER DEFAULT 0,
-                        requests_limit INTEGER DEFAULT 100,
-                        subscription_start DATE,
-                        subscription_end DATE,
-                        is_active BOOLEAN DEFAULT 1,
-                        is_admin BOOLEAN DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (subscription_plan_id) REFERENCES subscription_plans (id),
-                        FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
-                    )
-                ''')
+    def _get_read_connection(self) -> sqlite3.Connection:
+        """Соединение читателя: запись через него запрещена"""
+        conn = self._get_connection()
+        conn.execute("PRAGMA query_only = ON")
+        return conn
 
-                # Таблица истории подписок
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS subscription_history (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        plan_id INTEGER NOT NULL,
-                        activation_key_id INTEGER,
-                        start_date DATE NOT NULL,
-                        end_date DATE NOT NULL,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (plan_id) REFERENCES subscription_plans (id),
-                        FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
-                    )
-                ''')
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Connection]:
+        """Соединение для чтения из пула читателей"""
+        started = time.perf_counter()
+        with self._read_pool.connection() as conn:
+            record_lock_wait(time.perf_counter() - started)
+            yield conn
+
+    @contextmanager
+    def _writing(self) -> Iterator[sqlite3.Connection]:
+        """Единственное соединение писателя под блокировкой записи"""
+        started = time.perf_counter()
+        with self._write_lock, self._write_pool.connection() as conn:
+            record_lock_wait(time.perf_counter() - started)
+            yield conn
+
+    async def _run(self, func: Callable[[], Any]) -> Any:
+        """Выполнение синхронной функции работы с БД вне event loop"""
+        if current_call.get() is not None:
+            # Замер в потоке БД: без очереди исполнителя и переключений event loop
+            untimed = func
+
+            def func():
+                started = time.perf_counter()
+                try:
+                    return untimed()
+                finally:
+                    record_execution(time.perf_counter() - started)
+
+        if self._executor is not None:
+            return await self._executor.submit(func)
+        return await asyncio.to_thread(func)
+
+    def _flush_request_counters(self):
+        """Запись накопленных счетчиков запросов одной транзакцией"""
+        with self._writing() as conn:
+            batch = self._request_counters.take()
+            if not batch:
+                self._request_counters.done()
+                return
+            try:
+                conn.executemany(
+                    "UPDATE users SET requests_used = requests_used + ? WHERE user_id = ?",
+                    [(count, user_id) for user_id, count in batch.items()]
+                )
+                conn.commit()
+            except sqlite3.Error:
+                self._request_counters.done(success=False)
+                raise
+            # Сброшенные инкременты теперь в БД: кэшированные строки устарели.
+            # Инвалидация строго до done(), пока инкременты еще видны как pending
+            for user_id in batch:
+                self._access_cache.invalidate(user_id)
+            self._request_counters.done()
+
+    def _write_request_journal(self, rows: List[JournalRow]):
+        """Пакетная запись журнала запросов одной транзакцией"""
+        with self._writing() as conn:
+            # Запросы незарегистрированных пользователей пропускаются,
+            # иначе нарушение внешнего ключа отменило бы всю пачку
+            conn.executemany('''
+                INSERT INTO user_requests 
+                (user_id, request_type, request_data, response_data, tokens_used, created_at) 
+                SELECT ?, ?, ?, ?, ?, ?
+                WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?)
+            ''', [row + (row[0],) for row in rows])
+            conn.commit()
+
+    def _plan_catalog(self, conn: sqlite3.Connection) -> PlanCatalog:
+        """Справочник планов; при первом обращении читается из БД"""
+        if not self._plans.loaded:
+            self._plans.reload(conn)
+        return self._plans
+
+    def _plan_fields(self, plan_id: Optional[int]) -> Dict[str, Any]:
+        """Поля плана для строки пользователя (вместо JOIN subscription_plans)"""
+        plan = self._plans.by_id(plan_id)
+        return {
+            'plan_name': plan.name if plan else None,
+            'plan_description': plan.description if plan else None,
+            'plan_price': plan.price if plan else None,
+            'plan_max_requests': plan.max_requests if plan else None
+        }
+
+    def write_behind_stats(self) -> Dict[str, Any]:
+        """Метрики отложенной записи счетчиков и журнала запросов"""
+        return {
+            'request_counters': self._request_counters.stats(),
+            'request_journal': self._journal.stats()
+        }
+
+    def key_filter_stats(self) -> Dict[str, Any]:
+        """Метрики фильтра ключей"""
+        key_filter = self._key_filter
+        stats = {
+            'enabled': Config.KEY_FILTER_ENABLED,
+            'ready': key_filter is not None,
+            'max_id': self._key_filter_max_id,
+            **self._key_filter_metrics
+        }
+        if key_filter is not None:
+            stats.update(key_filter.stats())
+        return stats
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Метрики кэшей"""
+        return {
+            'access': self._access_cache.stats(),
+            'link_counts': self._link_counts.stats()
+        }
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Метрики пулов соединений"""
+        return {
+            'read': self._read_pool.stats(),
+            'write': self._write_pool.stats()
+        }
+
+    async def close(self):
+        """Закрытие всех соединений с базой данных"""
+
+        def sync_close():
+            self._request_counters.close()
+            self._journal.close()
+            with self._write_lock:
+                self._write_pool.close()
+            self._read_pool.close()
+
+        await self._run(sync_close)
+
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown)
+
+    def _load_key_filter(self, conn: sqlite3.Connection, rebuild: bool = False):
+        """Дочитать в фильтр ключи с id больше уже загруженных (или построить заново)"""
+        with self._key_filter_mutex:
+            key_filter = self._key_filter
+            max_id = self._key_filter_max_id
+
+            if not rebuild and key_filter is not None:
+                new_keys = conn.execute(
+                    "SELECT COUNT(*) FROM activation_keys WHERE id > ?", (max_id,)
+                ).fetchone()[0]
+                # Переполненный фильтр дает больше ложных срабатываний - строим больший
+                rebuild = key_filter.count + new_keys > key_filter.capacity
+
+            if rebuild or key_filter is None:
+                total = conn.execute("SELECT COUNT(*) FROM activation_keys").fetchone()[0]
+                key_filter = BloomFilter(
+                    capacity=max(total * 2, 10000),
+                    error_rate=Config.KEY_FILTER_ERROR_RATE
+                )
+                max_id = 0
+
+            cursor = conn.execute(
+                "SELECT id, key_digest FROM activation_keys WHERE id > ? ORDER BY id", (max_id,)
+            )
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                key_filter.update(row['key_digest'] for row in rows)
+                max_id = rows[-1]['id']
+
+            self._key_filter = key_filter
+            self._key_filter_max_id = max_id
+
+    async def build_key_filter(self):
+        """Построение фильтра Блума выданных ключей (при запуске бота)"""
+        if not Config.KEY_FILTER_ENABLED:
+            return
+
+        def sync_build():
+            started = time.perf_counter()
+            with self._reading() as conn:
+                self._load_key_filter(conn, rebuild=True)
+            self._key_filter_metrics['build_time'] = round(time.perf_counter() - started, 3)
+            self._key_filter_metrics['builds'] += 1
+
+        await self._run(sync_build)
+
+    async def _key_may_exist(self, key_code: str) -> bool:
+        """False - ключ точно не выдавался и БД можно не спрашивать"""
+        key_filter = self._key_filter
+        if key_filter is None:
+            return True
+
+        digest = key_digest(key_code)
+        if digest not in key_filter:
+            # Ключ мог быть выпущен другим процессом (key_generator.py, другой
+            # обработчик launcher) после построения фильтра: промах окончателен,
+            # только если в БД нет ключей новее загруженных. MAX(id) - одно
+            # чтение последней страницы индекса по rowid
+            def sync_refresh() -> bool:
+                with self._reading() as conn:
+                    max_id = conn.execute("SELECT MAX(id) FROM activation_keys").fetchone()[0] or 0
+                    if max_id <= self._key_filter_max_id:
+                        return False
+                    self._load_key_filter(conn)
+                self._key_filter_metrics['refreshes'] += 1
+                return True
 
-                # Таблица запросов/активности
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_requests (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        request_type TEXT,
-                        request_data TEXT,
-                        response_data TEXT,
-                        tokens_used INTEGER DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
-                    )
-                ''')
+            if not await self._run(sync_refresh) or digest not in self._key_filter:
+                self._key_filter_metrics['rejected'] += 1
+                return False
 
-                # Таблица ссылок пользователя
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS user_links (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER NOT NULL,
-                        url TEXT NOT NULL,
-                        title TEXT,
-                        description TEXT,
-                        category TEXT DEFAULT 'general',
-                        is_active BOOLEAN DEFAULT 1,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
-                    )
-                ''')
+        self._key_filter_metrics['passed'] += 1
+        return True
 
-                # Создание индексов
-                indexes = [
-                    'CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)',
-                    'CREATE INDEX IF NOT EXISTS idx_users_activation_key ON users(activation_key_id)',
-                    'CREATE INDEX IF NOT EXISTS idx_activation_keys_key_hash ON activation_keys(key_hash)',
-                    'CREATE INDEX IF NOT EXISTS idx_activation_keys_key_code ON activation_keys(key_code)',
-                    'CREATE INDEX IF NOT EXISTS idx_activation_keys_is_used ON activation_keys(is_used)',
-                    'CREATE INDEX IF NOT EXISTS idx_users_subscription_end ON users(subscription_end)',
-                    'CREATE INDEX IF NOT EXISTS idx_subscription_history_user_id ON subscription_history(user_id)',
-                    'CREATE INDEX IF NOT EXISTS idx_user_requests_user_id ON user_requests(user_id)',
-                    'CREATE INDEX IF NOT EXISTS idx_user_links_user_id ON user_links(user_id)',
-                    'CREATE INDEX IF NOT EXISTS idx_user_links_category ON user_links(category)',
-                    'CREATE INDEX IF NOT EXISTS idx_user_links_is_active ON user_links(is_active)'
-                ]
-
-                for index_sql in indexes:
-                    cursor.execute(index_sql)
-
-                # Создание стандартных планов подписки с количеством ключей
-                default_plans = [
-                    ('FREE', 'Бесплатный план', 0, 50, 30, 0),
-                    ('BASIC', 'Базовый план', 10, 500, 30, 1),
-                    ('PRO', 'Профессиональный план', 25, 2000, 30, 3),
-                    ('PREMIUM', 'Премиум план', 50, 10000, 30, 5),
-                    ('ENTERPRISE', 'Корпоративный план', 200, 50000, 30, 10)
-                ]
-
-                for plan in default_plans:
-                    cursor.execute('''
-                        INSERT OR IGNORE INTO subscription_plans 
-                        (name, description, price, max_requests, duration_days, max_activation_keys) 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', plan)
+    def _generate_activation_key(self) -> str:
+        """Генерация ключа активации формата XXXX-XXXX-XXXX-XXXX"""
+        return generate_key_codes(1)[0]
 
-                conn.commit()
-                conn.close()
+    async def create_tables(self):
+        """Создание и обновление схемы БД (на актуальной схеме - одно чтение user_version)"""
 
-        await asyncio.to_thread(sync_create)
-        print("✅ Таблицы в базе данных созданы")
+        def sync_create():
+            with self._writing() as conn:
+                version = migrate(conn)
+                self._plans.reload(conn)
+                return version
+
+        version = await self._run(sync_create)
+        # Индекс мог появиться или начать достраиваться - проверяется заново
+        self._fts_enabled = None
+        print(f"✅ Схема базы данных актуальна (версия {version})")
+
+    async def run_online_builds(self, batch_size: int = Config.SCHEMA_ONLINE_BUILD_BATCH_SIZE,
+                                pause_ms: int = Config.SCHEMA_ONLINE_BUILD_PAUSE_MS) -> int:
+        """Достраивание индексов пачками; между пачками блокировка записи свободна для бота"""
+
+        def sync_pending():
+            with self._reading() as conn:
+                return pending_online_builds(conn)
+
+        def sync_step(name: str):
+            with self._writing() as conn:
+                return online_build_step(conn, name, batch_size)
+
+        names = await self._run(sync_pending)
+        for name in names:
+            started = time.perf_counter()
+            while not await self._run(lambda: sync_step(name)):
+                await asyncio.sleep(pause_ms / 1000)
+            print(f"✅ Онлайн-построение {name} завершено за {time.perf_counter() - started:.1f} сек.")
+
+        self._fts_enabled = None
+        return len(names)
+
+    def _is_fts_enabled(self, conn: sqlite3.Connection) -> bool:
+        """Есть ли в базе полнотекстовый индекс ссылок"""
+        if self._fts_enabled is None:
+            # Пока индекс достраивается, поиск идет по LIKE, чтобы не терять старые ссылки
+            row = conn.execute('''
+                SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_links_fts'
+                AND NOT EXISTS (
+                    SELECT 1 FROM schema_online_builds
+                    WHERE name = 'user_links_fts' AND finished_at IS NULL
+                )
+            ''').fetchone()
+            self._fts_enabled = row is not None
+        return self._fts_enabled
+
+    @staticmethod
+    def _fts_query(user_id: int, search_query: str) -> Optional[str]:
+        """Запрос FTS5: все слова как префиксы, только по ссылкам пользователя"""
+        terms = re.findall(r"\w+", search_query.lower())
+        if not terms:
+            return None
+        # Слова берутся в кавычки, чтобы пользовательский ввод не был синтаксисом FTS5
+        text_query = " ".join(f'"{term}"*' for term in terms)
+        return f'user_id:"{user_id}" AND {{url title description category}}: ({text_query})'
 
     # ==================== МЕТОДЫ ДЛЯ КЛЮЧЕЙ АКТИВАЦИИ ====================
 
@@ -192,193 +422,162 @@ class Database:
         """Генерация ключей активации для плана"""
 
         def sync_generate():
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
-
-                # Получаем ID плана
-                cursor.execute(
-                    "SELECT id FROM subscription_plans WHERE name = ?",
-                    (plan_name,)
-                )
-                plan = cursor.fetchone()
+            with self._writing() as conn:
+                plan = self._plan_catalog(conn).by_name(plan_name)
 
                 if not plan:
-                    conn.close()
                     return []
 
-                plan_id = plan['id']
-                keys = []
+                max_id_before = conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM activation_keys"
+                ).fetchone()[0]
 
-                for _ in range(quantity):
-                    key_code = self._generate_activation_key()
-                    key_hash = self._hash_key(key_code)
-                    expires_at = datetime.now() + timedelta(days=expires_in_days)
-
-                    try:
-                        cursor.execute('''
-                            INSERT INTO activation_keys 
-                            (key_hash, plan_id, key_code, expires_at) 
-                            VALUES (?, ?, ?, ?)
-                        ''', (key_hash, plan_id, key_code, expires_at))
-                        keys.append(key_code)
-                    except sqlite3.IntegrityError:
-                        # Если ключ неуникальный, пропускаем
-                        continue
+                # Все ключи одной транзакцией, пачками executemany
+                expires_at = datetime.now() + timedelta(days=expires_in_days)
+                keys = insert_keys(conn, plan.id, quantity, expires_at)
+                max_id_after = conn.execute("SELECT MAX(id) FROM activation_keys").fetchone()[0]
 
                 conn.commit()
-                conn.close()
+
+                with self._key_filter_mutex:
+                    if self._key_filter is not None:
+                        self._key_filter.update(key_digest(key_code) for key_code in keys)
+                        # Если чужих ключей с прошлого чтения не было, новые id уже в фильтре
+                        if max_id_before == self._key_filter_max_id:
+                            self._key_filter_max_id = max_id_after
                 return keys
 
-        return await asyncio.to_thread(sync_generate)
+        return await self._run(sync_generate)
 
     async def activate_key(self, user_id: int, key_code: str) -> Dict[str, Any]:
         """Активация ключа пользователем с защитой от повторного использования"""
 
-        def sync_activate():
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
+        def activation_error(cursor: sqlite3.Cursor, digest: bytes) -> str:
+            """Почему ключ не удалось занять (читается в той же транзакции)"""
+            cursor.execute('''
+                SELECT plan_id, is_used, used_by_user_id FROM activation_keys
+                WHERE key_digest = ? 
+                AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+            ''', (digest,))
+            key_data = cursor.fetchone()
 
-                # Получаем информацию о ключе
-                cursor.execute('''
-                    SELECT ak.*, sp.name as plan_name, sp.max_requests, sp.duration_days
-                    FROM activation_keys ak
-                    JOIN subscription_plans sp ON ak.plan_id = sp.id
-                    WHERE ak.key_code = ? 
-                    AND (ak.expires_at IS NULL OR ak.expires_at > CURRENT_TIMESTAMP)
-                ''', (key_code,))
+            if not key_data or not self._plan_catalog(cursor.connection).by_id(key_data['plan_id']):
+                return 'Ключ не найден или просрочен'
 
-                key_data = cursor.fetchone()
+            if key_data['is_used']:
+                if key_data['used_by_user_id'] == user_id:
+                    return 'Этот ключ уже активирован на вашем аккаунте'
+                return 'Ключ уже использован другим пользователем'
 
-                if not key_data:
-                    conn.close()
-                    return {
-                        'success': False,
-                        'error': 'Ключ не найден или просрочен'
-                    }
+            cursor.execute("SELECT activation_key_id FROM users WHERE user_id = ?", (user_id,))
+            user = cursor.fetchone()
 
-                key_id = key_data['id']
-
-                # Проверяем, использован ли ключ
-                if key_data['is_used']:
-                    # Проверяем, привязан ли ключ к этому пользователю
-                    if key_data['used_by_user_id'] == user_id:
-                        conn.close()
-                        return {
-                            'success': False,
-                            'error': 'Этот ключ уже активирован на вашем аккаунте'
-                        }
-                    else:
-                        conn.close()
-                        return {
-                            'success': False,
-                            'error': 'Ключ уже использован другим пользователем'
-                        }
-
-                plan_id = key_data['plan_id']
-                plan_name = key_data['plan_name']
-                max_requests = key_data['max_requests']
-                duration_days = key_data['duration_days']
-
-                # Проверяем, есть ли уже пользователь
-                cursor.execute(
-                    "SELECT * FROM users WHERE user_id = ?",
-                    (user_id,)
-                )
-                user = cursor.fetchone()
+            if not user:
+                return 'Сначала зарегистрируйтесь через /start'
+            return 'У вас уже активирован ключ. Сначала отключите текущий.'
 
-                if not user:
-                    conn.close()
-                    return {
-                        'success': False,
-                        'error': 'Сначала зарегистрируйтесь через /start'
-                    }
-
-                # Проверяем, не активирован ли уже ключ у этого пользователя
-                cursor.execute(
-                    "SELECT activation_key_id FROM users WHERE user_id = ? AND activation_key_id IS NOT NULL",
-                    (user_id,)
-                )
-                existing_key = cursor.fetchone()
+        def sync_activate():
+            digest = key_digest(key_code)
 
-                if existing_key:
-                    conn.close()
-                    return {
-                        'success': False,
-                        'error': 'У вас уже активирован ключ. Сначала отключите текущий.'
-                    }
+            with self._writing() as conn:
+                cursor = conn.cursor()
 
-                # Устанавливаем даты подписки
-                start_date = datetime.now().date()
-                end_date = start_date + timedelta(days=duration_days)
+                # IMMEDIATE сразу берет блокировку записи SQLite: между проверкой
+                # и захватом ключа не вклинится ни другой поток, ни другой процесс
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    # Ключ занимается одним условным UPDATE: только свободный, не просроченный
+                    # и только зарегистрированным пользователем без активного ключа
+                    cursor.execute('''
+                        UPDATE activation_keys 
+                        SET is_used = 1, 
+                            used_by_user_id = ?, 
+                            used_at = CURRENT_TIMESTAMP
+                        WHERE key_digest = ? 
+                        AND is_used = 0
+                        AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+                        AND EXISTS (
+                            SELECT 1 FROM users 
+                            WHERE user_id = ? AND activation_key_id IS NULL
+                        )
+                        RETURNING id, plan_id
+                    ''', (user_id, digest, user_id))
+                    claimed = cursor.fetchone()
+                    plan = self._plan_catalog(conn).by_id(claimed['plan_id']) if claimed else None
+
+                    if not plan:
+                        error = activation_error(cursor, digest)
+                        conn.rollback()
+                        return {'success': False, 'error': error}
+
+                    key_id = claimed['id']
+                    start_date = datetime.now().date()
+                    end_date = start_date + timedelta(days=plan.duration_days)
 
-                # Обновляем пользователя
-                cursor.execute('''
-                    UPDATE users 
-                    SET subscription_plan_id = ?,
-                        activation_key_id = ?,
-                        requests_limit = ?,
-                        requests_used = 0,
-                        subscription_start = ?,
-                        subscription_end = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ?
-                ''', (plan_id, key_id, max_requests, start_date, end_date, user_id))
+                    cursor.execute('''
+                        UPDATE users 
+                        SET subscription_plan_id = ?,
+                            activation_key_id = ?,
+                            requests_limit = ?,
+                            requests_used = 0,
+                            subscription_start = ?,
+                            subscription_end = ?,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE user_id = ?
+                    ''', (plan.id, key_id, plan.max_requests, start_date, end_date, user_id))
 
-                # Помечаем ключ как использованный и привязываем к пользователю
-                cursor.execute('''
-                    UPDATE activation_keys 
-                    SET is_used = 1, 
-                        used_by_user_id = ?, 
-                        used_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (user_id, key_id))
+                    cursor.execute('''
+                        INSERT INTO subscription_history 
+                        (user_id, plan_id, activation_key_id, start_date, end_date) 
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (user_id, plan.id, key_id, start_date, end_date))
 
-                # Добавляем запись в историю подписок
-                cursor.execute('''
-                    INSERT INTO subscription_history 
-                    (user_id, plan_id, activation_key_id, start_date, end_date) 
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (user_id, plan_id, key_id, start_date, end_date))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
 
-                conn.commit()
-                conn.close()
+                # Счетчик обнулен, несброшенные инкременты старого плана не нужны.
+                # Только после фиксации: при откате они должны остаться в очереди.
+                # Сброс счетчиков идет под той же блокировкой писателя и сюда не вклинится
+                self._request_counters.discard(user_id)
+                self._access_cache.invalidate(user_id)
 
                 return {
                     'success': True,
-                    'plan_name': plan_name,
-                    'max_requests': max_requests,
+                    'plan_name': plan.name,
+                    'max_requests': plan.max_requests,
                     'start_date': start_date,
                     'end_date': end_date,
-                    'duration_days': duration_days,
+                    'duration_days': plan.duration_days,
                     'key_id': key_id
                 }
 
-        return await asyncio.to_thread(sync_activate)
+        if not await self._key_may_exist(key_code):
+            return {
+                'success': False,
+                'error': 'Ключ не найден или просрочен'
+            }
+        return await self._run(sync_activate)
 
     async def validate_key(self, key_code: str) -> Dict[str, Any]:
         """Проверка ключа с информацией о использовании"""
 
         def sync_validate():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
                 cursor.execute('''
-                    SELECT ak.*, sp.name as plan_name, sp.description, 
-                           sp.max_requests, sp.duration_days, sp.price,
-                           u.user_id as used_by_id, u.username, u.full_name
+                    SELECT ak.*, u.user_id as used_by_id, u.username, u.full_name
                     FROM activation_keys ak
-                    JOIN subscription_plans sp ON ak.plan_id = sp.id
                     LEFT JOIN users u ON ak.used_by_user_id = u.user_id
-                    WHERE ak.key_code = ?
-                ''', (key_code,))
+                    WHERE ak.key_digest = ?
+                ''', (key_digest(key_code),))
 
                 key_data = cursor.fetchone()
+                plan = self._plan_catalog(conn).by_id(key_data['plan_id']) if key_data else None
 
-                if not key_data:
-                    conn.close()
+                if not key_data or not plan:
                     return {'valid': False, 'error': 'Ключ не найден'}
 
                 key_dict = dict(key_data)
@@ -389,7 +588,6 @@ class Database:
                         used_by = f"пользователем {key_dict['full_name']} (@{key_dict['username'] or 'нет'})"
                     else:
                         used_by = "другим пользователем"
-                    conn.close()
                     return {
                         'valid': False,
                         'error': f'Ключ уже использован {used_by}',
@@ -399,30 +597,29 @@ class Database:
                     }
 
                 if key_dict['expires_at'] and datetime.fromisoformat(key_dict['expires_at']) < datetime.now():
-                    conn.close()
                     return {'valid': False, 'error': 'Ключ просрочен'}
 
-                conn.close()
                 return {
                     'valid': True,
-                    'plan_name': key_dict['plan_name'],
-                    'description': key_dict['description'],
-                    'max_requests': key_dict['max_requests'],
-                    'duration_days': key_dict['duration_days'],
-                    'price': key_dict['price'],
+                    'plan_name': plan.name,
+                    'description': plan.description,
+                    'max_requests': plan.max_requests,
+                    'duration_days': plan.duration_days,
+                    'price': plan.price,
                     'created_at': key_dict['created_at'],
                     'expires_at': key_dict['expires_at'],
                     'is_used': key_dict['is_used']
                 }
 
-        return await asyncio.to_thread(sync_validate)
+        if not await self._key_may_exist(key_code):
+            return {'valid': False, 'error': 'Ключ не найден'}
+        return await self._run(sync_validate)
 
     async def deactivate_user_key(self, user_id: int) -> bool:
         """Отвязка ключа от пользователя (перевод на FREE план)"""
 
         def sync_deactivate():
-            with self._lock:
-                conn = self._get_connection()
+            with self._writing() as conn:
                 cursor = conn.cursor()
 
                 # Получаем текущий ключ пользователя
@@ -433,17 +630,13 @@ class Database:
                 user_data = cursor.fetchone()
 
                 if not user_data or not user_data['activation_key_id']:
-                    conn.close()
                     return False
 
                 key_id = user_data['activation_key_id']
 
-                # Получаем ID FREE плана
-                cursor.execute("SELECT id, max_requests FROM subscription_plans WHERE name = 'FREE'")
-                free_plan = cursor.fetchone()
+                free_plan = self._plan_catalog(conn).by_name('FREE')
 
                 if not free_plan:
-                    conn.close()
                     return False
 
                 # Обновляем пользователя на FREE план
@@ -459,7 +652,7 @@ class Database:
                         subscription_end = ?,
                         updated_at = CURRENT_TIMESTAMP
                     WHERE user_id = ?
-                ''', (free_plan['id'], free_plan['max_requests'], start_date, end_date, user_id))
+                ''', (free_plan.id, free_plan.max_requests, start_date, end_date, user_id))
 
                 # Ключ остается использованным и не может быть использован повторно
 
@@ -468,50 +661,49 @@ class Database:
                     INSERT INTO subscription_history 
                     (user_id, plan_id, start_date, end_date) 
                     VALUES (?, ?, ?, ?)
-                ''', (user_id, free_plan['id'], start_date, end_date))
+                ''', (user_id, free_plan.id, start_date, end_date))
 
                 conn.commit()
-                conn.close()
+                self._access_cache.invalidate(user_id)
                 return True
 
-        return await asyncio.to_thread(sync_deactivate)
+        return await self._run(sync_deactivate)
 
     async def get_user_active_key(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получение активного ключа пользователя"""
 
         def sync_get_key():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
                 cursor.execute('''
-                    SELECT ak.*, sp.name as plan_name
+                    SELECT ak.*
                     FROM users u
                     JOIN activation_keys ak ON u.activation_key_id = ak.id
-                    JOIN subscription_plans sp ON ak.plan_id = sp.id
                     WHERE u.user_id = ? AND ak.is_used = 1
                 ''', (user_id,))
 
                 key_data = cursor.fetchone()
-                conn.close()
-                return dict(key_data) if key_data else None
+                plan = self._plan_catalog(conn).by_id(key_data['plan_id']) if key_data else None
+                if not plan:
+                    return None
+                return dict(key_data, plan_name=plan.name)
 
-        return await asyncio.to_thread(sync_get_key)
+        return await self._run(sync_get_key)
 
     async def get_all_keys(self, plan_name: str = None, used: bool = None,
                            limit: int = 100) -> List[Dict[str, Any]]:
         """Получение всех ключей с фильтрацией"""
 
         def sync_get_keys():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
+                plans = self._plan_catalog(conn)
+
                 query = '''
-                    SELECT ak.*, sp.name as plan_name, sp.max_requests,
-                           u.user_id as used_by_id, u.username, u.full_name
+                    SELECT ak.*, u.user_id as used_by_id, u.username, u.full_name
                     FROM activation_keys ak
-                    JOIN subscription_plans sp ON ak.plan_id = sp.id
                     LEFT JOIN users u ON ak.used_by_user_id = u.user_id
                 '''
 
@@ -519,8 +711,11 @@ class Database:
                 conditions = []
 
                 if plan_name:
-                    conditions.append("sp.name = ?")
-                    params.append(plan_name)
+                    plan = plans.by_name(plan_name)
+                    if not plan:
+                        return []
+                    conditions.append("ak.plan_id = ?")
+                    params.append(plan.id)
 
                 if used is not None:
                     conditions.append("ak.is_used = ?")
@@ -534,31 +729,36 @@ class Database:
 
                 cursor.execute(query, params)
                 rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
 
-        return await asyncio.to_thread(sync_get_keys)
+                keys = []
+                for row in rows:
+                    plan = plans.by_id(row['plan_id'])
+                    if plan:
+                        keys.append(dict(row, plan_name=plan.name, max_requests=plan.max_requests))
+                return keys
+
+        return await self._run(sync_get_keys)
 
     async def is_key_linked_to_user(self, user_id: int, key_code: str) -> bool:
         """Проверка, привязан ли ключ к пользователю"""
 
         def sync_check():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
                 cursor.execute('''
                     SELECT COUNT(*) as count 
                     FROM activation_keys ak
                     JOIN users u ON ak.id = u.activation_key_id
-                    WHERE ak.key_code = ? AND u.user_id = ?
-                ''', (key_code, user_id))
+                    WHERE ak.key_digest = ? AND u.user_id = ?
+                ''', (key_digest(key_code), user_id))
 
                 result = cursor.fetchone()
-                conn.close()
                 return result['count'] > 0 if result else False
 
-        return await asyncio.to_thread(sync_check)
+        if not await self._key_may_exist(key_code):
+            return False
+        return await self._run(sync_check)
 
     # ==================== МЕТОДЫ ДЛЯ ПОЛЬЗОВАТЕЛЕЙ ====================
 
@@ -566,8 +766,7 @@ class Database:
         """Добавление пользователя в БД"""
 
         def sync_add():
-            with self._lock:
-                conn = self._get_connection()
+            with self._writing() as conn:
                 cursor = conn.cursor()
 
                 # Проверяем, существует ли пользователь
@@ -575,19 +774,15 @@ class Database:
                 existing_user = cursor.fetchone()
 
                 if existing_user:
-                    conn.close()
                     return dict(existing_user)
 
-                # Получаем ID бесплатного плана
-                cursor.execute("SELECT id, max_requests FROM subscription_plans WHERE name = 'FREE' LIMIT 1")
-                free_plan = cursor.fetchone()
+                free_plan = self._plan_catalog(conn).by_name('FREE')
 
                 if not free_plan:
-                    conn.close()
                     return {}
 
-                plan_id = free_plan['id']
-                requests_limit = free_plan['max_requests']
+                plan_id = free_plan.id
+                requests_limit = free_plan.max_requests
 
                 # Устанавливаем даты подписки
                 start_date = datetime.now().date()
@@ -618,182 +813,370 @@ class Database:
                     ''', (user_id, plan_id, start_date, end_date))
 
                 conn.commit()
-                conn.close()
                 return dict(user) if user else None
 
-        return await asyncio.to_thread(sync_add)
+        return await self._run(sync_add)
 
-    async def get_user(self, user_id: int = None) -> Optional[Dict[str, Any]]:
-        """Получение пользователя с информацией о ключе"""
+    async def get_user(self, user_id: int = None, access_key: str = None) -> Optional[Dict[str, Any]]:
+        """Получение пользователя с информацией о ключе (по ID или по активированному ключу)"""
 
         def sync_get():
-            with self._lock:
-                conn = self._get_connection()
+            # Несброшенные инкременты читаются до запроса к БД, иначе их можно
+            # не увидеть ни в памяти, ни в БД, если сброс произойдет между чтениями
+            pending = self._request_counters.pending(user_id) if user_id else 0
+
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
                 if user_id:
                     cursor.execute('''
                         SELECT 
                             u.*, 
-                            sp.name as plan_name, 
-                            sp.description as plan_description,
-                            sp.price as plan_price, 
-                            sp.max_requests as plan_max_requests,
                             ak.key_code as activation_key,
                             ak.created_at as key_created_at
                         FROM users u
-                        LEFT JOIN subscription_plans sp ON u.subscription_plan_id = sp.id
                         LEFT JOIN activation_keys ak ON u.activation_key_id = ak.id
                         WHERE u.user_id = ?
                     ''', (user_id,))
+                elif access_key:
+                    cursor.execute('''
+                        SELECT 
+                            u.*, 
+                            ak.key_code as activation_key,
+                            ak.created_at as key_created_at
+                        FROM activation_keys ak
+                        JOIN users u ON u.activation_key_id = ak.id
+                        WHERE ak.key_digest = ?
+                    ''', (key_digest(access_key.strip().upper()),))
                 else:
-                    conn.close()
                     return None
 
                 row = cursor.fetchone()
-                conn.close()
-                return dict(row) if row else None
+                if not row:
+                    return None
+                self._plan_catalog(conn)
+                user = dict(row)
+                user.update(self._plan_fields(user['subscription_plan_id']))
+                if not user_id:
+                    # ID пользователя стал известен только из запроса
+                    pending = self._request_counters.pending(user['user_id'])
+                user['requests_used'] += pending
+                return user
 
-        return await asyncio.to_thread(sync_get)
+        return await self._run(sync_get)
 
     async def get_all_users(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
         """Получение всех пользователей"""
 
         def sync_get_all():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    SELECT u.*, sp.name as plan_name, ak.key_code as activation_key
+                    SELECT u.*, ak.key_code as activation_key
                     FROM users u
-                    LEFT JOIN subscription_plans sp ON u.subscription_plan_id = sp.id
                     LEFT JOIN activation_keys ak ON u.activation_key_id = ak.id
                     ORDER BY u.created_at DESC LIMIT ? OFFSET ?
                 ''', (limit, offset))
                 rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
+                plans = self._plan_catalog(conn)
 
-        return await asyncio.to_thread(sync_get_all)
+                users = []
+                for row in rows:
+                    plan = plans.by_id(row['subscription_plan_id'])
+                    users.append(dict(row, plan_name=plan.name if plan else None))
+                return users
+
+        return await self._run(sync_get_all)
+
+    async def set_user_admin(self, user_id: int, is_admin: bool = True) -> bool:
+        """Назначение или снятие прав администратора"""
+
+        def sync_set_admin():
+            with self._writing() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE users SET is_admin = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?",
+                    (1 if is_admin else 0, user_id)
+                )
+                conn.commit()
+                self._access_cache.invalidate(user_id)
+                return cursor.rowcount > 0
+
+        return await self._run(sync_set_admin)
+
+    async def get_admins(self) -> List[Dict[str, Any]]:
+        """Список администраторов"""
+
+        def sync_get_admins():
+            with self._reading() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT * FROM users 
+                    WHERE is_admin = 1 
+                    ORDER BY created_at DESC
+                ''')
+                return [dict(row) for row in cursor.fetchall()]
+
+        return await self._run(sync_get_admins)
 
     async def get_users_count(self) -> int:
         """Получение количества пользователей"""
 
         def sync_get_count():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) as count FROM users")
                 result = cursor.fetchone()
-                conn.close()
                 return result['count'] if result else 0
 
-        return await asyncio.to_thread(sync_get_count)
+        return await self._run(sync_get_count)
 
     async def check_user_access(self, user_id: int) -> Dict[str, Any]:
         """Проверка доступа пользователя"""
+        # Несброшенные инкременты читаются раньше строки пользователя (см. get_user)
+        pending = self._request_counters.pending(user_id)
+        result_dict = self._access_cache.get(user_id)
 
-        def sync_check():
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT 
-                        u.is_active,
-                        u.requests_used < u.requests_limit as has_requests,
-                        u.subscription_end >= date('now') as is_subscription_active,
-                        u.requests_used,
-                        u.requests_limit,
-                        sp.name as plan_name
-                    FROM users u
-                    LEFT JOIN subscription_plans sp ON u.subscription_plan_id = sp.id
-                    WHERE u.user_id = ?
-                ''', (user_id,))
-                result = cursor.fetchone()
-                conn.close()
-                if not result:
-                    return {'has_access': False, 'reason': 'Пользователь не найден'}
-                result_dict = dict(result)
-                has_access = all([
-                    result_dict['is_active'],
-                    result_dict['has_requests'],
-                    result_dict['is_subscription_active']
-                ])
-                return {
-                    'has_access': bool(has_access),
-                    'is_active': bool(result_dict['is_active']),
-                    'has_requests': bool(result_dict['has_requests']),
-                    'is_subscription_active': bool(result_dict['is_subscription_active']),
-                    'requests_used': result_dict['requests_used'],
-                    'requests_limit': result_dict['requests_limit'],
-                    'plan_name': result_dict['plan_name'],
-                    'reason': 'Доступ разрешен' if has_access else 'Доступ запрещен'
-                }
-
-        return await asyncio.to_thread(sync_check)
+        if result_dict is None:
+            def sync_check():
+                generation = self._access_cache.generation()
 
-    async def increment_user_requests(self, user_id: int) -> bool:
-        """Увеличение счетчика использованных запросов"""
+                with self._reading() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT 
+                            is_active,
+                            subscription_end >= date('now') as is_subscription_active,
+                            requests_used,
+                            requests_limit,
+                            subscription_plan_id
+                        FROM users
+                        WHERE user_id = ?
+                    ''', (user_id,))
+                    result = cursor.fetchone()
+                    self._plan_catalog(conn)
 
-        def sync_increment():
-            with self._lock:
-                conn = self._get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE users SET requests_used = requests_used + 1 WHERE user_id = ?",
-                    (user_id,)
-                )
-                conn.commit()
-                conn.close()
-                return True
+                if not result:
+                    return None
+                row = dict(result)
+                self._access_cache.set(user_id, row, generation)
+                return row
+
+            result_dict = await self._run(sync_check)
+
+        if not result_dict:
+            return {'has_access': False, 'reason': 'Пользователь не найден'}
+
+        requests_used = result_dict['requests_used'] + pending
+        has_requests = requests_used < result_dict['requests_limit']
+        has_access = all([
+            result_dict['is_active'],
+            has_requests,
+            result_dict['is_subscription_active']
+        ])
+        return {
+            'has_access': bool(has_access),
+            'is_active': bool(result_dict['is_active']),
+            'has_requests': bool(has_requests),
+            'is_subscription_active': bool(result_dict['is_subscription_active']),
+            'requests_used': requests_used,
+            'requests_limit': result_dict['requests_limit'],
+            'plan_name': self._plan_fields(result_dict['subscription_plan_id'])['plan_name'],
+            'reason': 'Доступ разрешен' if has_access else 'Доступ запрещен'
+        }
 
-        return await asyncio.to_thread(sync_increment)
+    async def increment_user_requests(self, user_id: int) -> bool:
+        """Увеличение счетчика использованных запросов (запись в БД отложенная)"""
+        self._request_counters.add(user_id)
+        return True
+
+    async def add_user_request(self, user_id: int, request_type: str, request_data: str = None,
+                               response_data: str = None, tokens_used: int = 0) -> bool:
+        """Запись запроса пользователя в журнал (в БД попадает пачкой позже)"""
+        row = RequestJournal.make_row(user_id, request_type, request_data, response_data, tokens_used)
+
+        if self._journal.append(row):
+            return True
+
+        # Буфер полон и политика block: ждем места, не блокируя event loop
+        return await asyncio.to_thread(self._journal.append, row, True)
+
+    async def compact_requests(self, retention_days: float = Config.REQUEST_RETENTION_DAYS,
+                               mode: str = Config.REQUEST_RETENTION_MODE,
+                               batch_size: int = Config.REQUEST_COMPACTION_BATCH_SIZE,
+                               pause_ms: int = Config.REQUEST_COMPACTION_PAUSE_MS,
+                               vacuum_pages: int = Config.REQUEST_VACUUM_PAGES) -> Dict[str, Any]:
+        """Свертка журнала запросов старше срока хранения в дневные итоги.
+
+        Окна по batch_size строк - отдельные короткие транзакции с паузой
+        между ними, чтобы бот не ждал блокировку записи.
+        """
+        if mode not in ("delete", "archive"):
+            raise ValueError(f"Неизвестный REQUEST_RETENTION_MODE: {mode}")
+
+        cutoff = cutoff_for(retention_days)
+        archive = None
+        if mode == "archive":
+            archive = await self._run(lambda: open_archive(Config.REQUEST_ARCHIVE_PATH))
+
+        def sync_has_index():
+            with self._reading() as conn:
+                return has_requests_time_index(conn)
+
+        def sync_compact(lower: Optional[int]):
+            with self._writing() as conn:
+                if lower is None:
+                    return None, compact_window(conn, cutoff, batch_size, archive)
+                return compact_rowid_window(conn, cutoff, lower, batch_size, archive)
+
+        def sync_vacuum():
+            with self._writing() as conn:
+                if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    return 0, conn.execute("PRAGMA page_size").fetchone()[0]
+                return (incremental_vacuum_step(conn, vacuum_pages),
+                        conn.execute("PRAGMA page_size").fetchone()[0])
+
+        started = time.perf_counter()
+        compacted = batches = 0
+        # Без индекса по времени (его отложила миграция) - окна по rowid от начала таблицы
+        lower = None if await self._run(sync_has_index) else 0
+        try:
+            while True:
+                upper, count = await self._run(lambda: sync_compact(lower))
+                if count:
+                    batches += 1
+                    compacted += count
+                    metrics.inc("requests_compacted_total", count, mode=mode)
+                if lower is None:
+                    # Неполное окно - старых строк больше нет
+                    if count < batch_size:
+                        break
+                elif upper is None:
+                    break
+                else:
+                    lower = upper
+                await asyncio.sleep(pause_ms / 1000)
+        finally:
+            if archive is not None:
+                archive.close()
+        compact_seconds = time.perf_counter() - started
+
+        vacuumed_pages = 0
+        while True:
+            freed, page_size = await self._run(sync_vacuum)
+            if not freed:
+                break
+            vacuumed_pages += freed
+            await asyncio.sleep(pause_ms / 1000)
+        metrics.inc("requests_vacuumed_bytes_total", vacuumed_pages * page_size)
+
+        result = {
+            'cutoff': cutoff,
+            'mode': mode,
+            'compacted': compacted,
+            'archived': compacted if archive is not None else 0,
+            'batches': batches,
+            'seconds': time.perf_counter() - started,
+            'rows_per_second': compacted / compact_seconds if compact_seconds > 0 else 0.0,
+            'vacuumed_bytes': vacuumed_pages * page_size,
+            'finished_at': datetime.now().isoformat(' ', 'seconds'),
+        }
+        self._last_compaction = result
+        return result
+
+    async def get_request_log_stats(self) -> Dict[str, Any]:
+        """Размер и прирост журнала запросов, место в файле БД и итог последней свертки"""
+
+        def sync_stats():
+            with self._reading() as conn:
+                return request_log_stats(conn)
+
+        stats = await self._run(sync_stats)
+        stats['last_compaction'] = self._last_compaction
+        return stats
 
     async def get_user_stats(self, user_id: int) -> Dict[str, Any]:
         """Получение статистики пользователя"""
 
         def sync_get_stats():
-            with self._lock:
-                conn = self._get_connection()
+            pending = self._request_counters.pending(user_id)
+
+            with self._reading() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT 
                         u.*,
-                        sp.name as plan_name,
-                        sp.description as plan_description,
-                        sp.price as plan_price,
-                        sp.max_requests as plan_max_requests,
                         (u.requests_limit - u.requests_used) as requests_remaining,
                         julianday(u.subscription_end) - julianday('now') as days_remaining,
                         ak.key_code as activation_key
                     FROM users u
-                    LEFT JOIN subscription_plans sp ON u.subscription_plan_id = sp.id
                     LEFT JOIN activation_keys ak ON u.activation_key_id = ak.id
                     WHERE u.user_id = ?
                 ''', (user_id,))
                 user = cursor.fetchone()
                 if not user:
-                    conn.close()
                     return {}
+                self._plan_catalog(conn)
                 result = dict(user)
-                conn.close()
+                result.update(self._plan_fields(result['subscription_plan_id']))
+                result['requests_used'] += pending
+                result['requests_remaining'] -= pending
                 return result
 
-        return await asyncio.to_thread(sync_get_stats)
+        return await self._run(sync_get_stats)
 
     async def get_all_subscription_plans(self) -> List[Dict[str, Any]]:
         """Получение всех планов подписки"""
+        if not self._plans.loaded:
+            await self.reload_subscription_plans(notify=False)
+
+        return [PlanCatalog.as_dict(plan) for plan in self._plans.active()]
+
+    async def reload_subscription_plans(self, notify: bool = True):
+        """Перечитать справочник планов из БД (после изменения планов).
 
-        def sync_get_plans():
-            with self._lock:
-                conn = self._get_connection()
+        notify=False - перечитывание по сигналу другого процесса, дальше не рассылается.
+        """
+
+        def sync_reload():
+            with self._reading() as conn:
+                self._plans.reload(conn)
+            # План пользователя мог измениться вместе с лимитами
+            self._access_cache.clear()
+
+        await self._run(sync_reload)
+        if notify and self.on_plans_changed is not None:
+            self.on_plans_changed()
+
+    async def update_subscription_plan(self, plan_name: str, **fields) -> bool:
+        """Изменение плана подписки с обновлением справочника"""
+        allowed = {'description', 'price', 'max_requests', 'duration_days',
+                   'max_activation_keys', 'is_active'}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise ValueError(f"Нельзя изменить поля плана: {', '.join(sorted(unknown))}")
+
+        if not fields:
+            return False
+
+        def sync_update():
+            with self._writing() as conn:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM subscription_plans WHERE is_active = 1 ORDER BY price ASC')
-                rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
+                assignments = ", ".join(f"{name} = ?" for name in fields)
+                cursor.execute(
+                    f"UPDATE subscription_plans SET {assignments} WHERE name = ?",
+                    (*fields.values(), plan_name.upper())
+                )
+                conn.commit()
+                success = cursor.rowcount > 0
+                self._plans.reload(conn)
+            self._access_cache.clear()
+            return success
 
-        return await asyncio.to_thread(sync_get_plans)
+        success = await self._run(sync_update)
+        if success and self.on_plans_changed is not None:
+            self.on_plans_changed()
+        return success
 
     # ==================== МЕТОДЫ ДЛЯ ССЫЛОК ====================
 
@@ -802,8 +1185,7 @@ class Database:
         """Добавление ссылки пользователя"""
 
         def sync_add_link():
-            with self._lock:
-                conn = self._get_connection()
+            with self._writing() as conn:
                 cursor = conn.cursor()
 
                 cursor.execute('''
@@ -814,18 +1196,22 @@ class Database:
 
                 link_id = cursor.lastrowid
                 conn.commit()
-                conn.close()
+                self._link_counts.invalidate(user_id)
                 return link_id
 
-        return await asyncio.to_thread(sync_add_link)
+        return await self._run(sync_add_link)
 
     async def get_user_links(self, user_id: int, category: str = None,
-                             limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """Получение ссылок пользователя"""
+                             limit: int = 50, offset: int = 0,
+                             before_id: int = None, after_id: int = None) -> List[Dict[str, Any]]:
+        """Получение ссылок пользователя (новые сначала).
+
+        before_id/after_id - курсор: ссылки старше/новее ссылки с этим ID.
+        В отличие от offset, стоимость не растет с номером страницы.
+        """
 
         def sync_get_links():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
                 query = '''
@@ -838,44 +1224,88 @@ class Database:
                     query += " AND category = ?"
                     params.append(category)
 
-                query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-                params.extend([limit, offset])
+                # Порядок (created_at, id) однозначен даже при одинаковом времени добавления
+                if after_id is not None:
+                    query += " AND (created_at, id) > (SELECT created_at, id FROM user_links WHERE id = ?)"
+                    query += " ORDER BY created_at ASC, id ASC LIMIT ?"
+                    params.extend([after_id, limit])
+                else:
+                    if before_id is not None:
+                        query += " AND (created_at, id) < (SELECT created_at, id FROM user_links WHERE id = ?)"
+                        params.append(before_id)
+                    query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+                    params.extend([limit, offset])
 
                 cursor.execute(query, params)
-                rows = cursor.fetchall()
-                conn.close()
-                return [dict(row) for row in rows]
+                links = [dict(row) for row in cursor.fetchall()]
+                if after_id is not None:
+                    links.reverse()
+                return links
+
+        return await self._run(sync_get_links)
+
+    async def iter_user_links(self, user_id: int, category: str = None,
+                              chunk_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Все ссылки пользователя пачками по chunk_size (курсором, без OFFSET)"""
+        before_id = None
+        while True:
+            chunk = await self.get_user_links(user_id, category, limit=chunk_size, before_id=before_id)
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < chunk_size:
+                return
+            before_id = chunk[-1]['id']
+
+    async def get_user_link(self, link_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получение активной ссылки пользователя по ID"""
+
+        def sync_get_link():
+            with self._reading() as conn:
+                cursor = conn.cursor()
 
-        return await asyncio.to_thread(sync_get_links)
+                cursor.execute('''
+                    SELECT * FROM user_links 
+                    WHERE id = ? AND user_id = ? AND is_active = 1
+                ''', (link_id, user_id))
+
+                row = cursor.fetchone()
+                return dict(row) if row else None
+
+        return await self._run(sync_get_link)
 
     async def get_user_link_count(self, user_id: int, category: str = None) -> int:
-        """Получение количества ссылок пользователя"""
+        """Получение количества ссылок пользователя (кэшируется до добавления/удаления)"""
 
-        def sync_get_count():
-            with self._lock:
-                conn = self._get_connection()
+        def sync_get_counts():
+            with self._reading() as conn:
+                generation = self._link_counts.generation()
                 cursor = conn.cursor()
 
-                query = "SELECT COUNT(*) as count FROM user_links WHERE user_id = ? AND is_active = 1"
-                params = [user_id]
+                cursor.execute('''
+                    SELECT category, COUNT(*) as count 
+                    FROM user_links 
+                    WHERE user_id = ? AND is_active = 1
+                    GROUP BY category
+                ''', (user_id,))
 
-                if category:
-                    query += " AND category = ?"
-                    params.append(category)
+                counts = {row['category']: row['count'] for row in cursor.fetchall()}
+                self._link_counts.set(user_id, counts, generation)
+                return counts
 
-                cursor.execute(query, params)
-                result = cursor.fetchone()
-                conn.close()
-                return result['count'] if result else 0
+        counts = self._link_counts.get(user_id)
+        if counts is None:
+            counts = await self._run(sync_get_counts)
 
-        return await asyncio.to_thread(sync_get_count)
+        if category:
+            return counts.get(category, 0)
+        return sum(counts.values())
 
     async def get_link_categories(self, user_id: int) -> List[str]:
         """Получение категорий ссылок пользователя"""
 
         def sync_get_categories():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
                 cursor.execute('''
@@ -886,20 +1316,72 @@ class Database:
                 ''', (user_id,))
 
                 rows = cursor.fetchall()
-                conn.close()
                 return [row['category'] for row in rows]
 
-        return await asyncio.to_thread(sync_get_categories)
+        return await self._run(sync_get_categories)
+
+    async def get_user_link_stats(self, user_id: int, recent_limit: int = 3) -> Dict[str, Any]:
+        """Статистика ссылок: количество по категориям, всего и последние добавленные"""
+
+        def sync_get_stats():
+            with self._reading() as conn:
+                cursor = conn.cursor()
+
+                cursor.execute('''
+                    SELECT category, COUNT(*) as count 
+                    FROM user_links 
+                    WHERE user_id = ? AND is_active = 1
+                    GROUP BY category
+                    ORDER BY category
+                ''', (user_id,))
+                categories = [dict(row) for row in cursor.fetchall()]
+
+                recent = []
+                if categories and recent_limit > 0:
+                    cursor.execute('''
+                        SELECT * FROM user_links 
+                        WHERE user_id = ? AND is_active = 1
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT ?
+                    ''', (user_id, recent_limit))
+                    recent = [dict(row) for row in cursor.fetchall()]
+
+                return {
+                    'total': sum(category['count'] for category in categories),
+                    'categories': categories,
+                    'recent': recent
+                }
+
+        return await self._run(sync_get_stats)
 
     async def search_user_links(self, user_id: int, search_query: str,
                                 limit: int = 20) -> List[Dict[str, Any]]:
-        """Поиск ссылок пользователя"""
+        """Поиск ссылок пользователя (полнотекстовый, по релевантности)"""
 
         def sync_search_links():
-            with self._lock:
-                conn = self._get_connection()
+            with self._reading() as conn:
                 cursor = conn.cursor()
 
+                fts_query = self._fts_query(user_id, search_query)
+                if fts_query and self._is_fts_enabled(conn):
+                    # bm25: совпадение в заголовке весит больше, чем в URL или описании.
+                    # В индексе только активные ссылки, поэтому первые limit результатов
+                    # отбираются внутри FTS, а с user_links соединяются только они.
+                    # При равной релевантности новые ссылки (больший id) идут первыми
+                    cursor.execute('''
+                        SELECT ul.* FROM (
+                            SELECT rowid, bm25(user_links_fts, 0.0, 1.0, 5.0, 2.0, 3.0) AS score
+                            FROM user_links_fts
+                            WHERE user_links_fts MATCH ?
+                            ORDER BY score, rowid DESC
+                            LIMIT ?
+                        ) AS hits
+                        JOIN user_links ul ON ul.id = hits.rowid
+                        WHERE ul.is_active = 1
+                        ORDER BY hits.score, hits.rowid DESC
+                    ''', (fts_query, limit))
+                    return [dict(row) for row in cursor.fetchall()]
+
                 search_term = f"%{search_query}%"
                 cursor.execute('''
                     SELECT * FROM user_links 
@@ -910,17 +1392,15 @@ class Database:
                 ''', (user_id, search_term, search_term, search_term, search_term, limit))
 
                 rows = cursor.fetchall()
-                conn.close()
                 return [dict(row) for row in rows]
 
-        return await asyncio.to_thread(sync_search_links)
+        return await self._run(sync_search_links)
 
     async def delete_user_link(self, link_id: int, user_id: int = None) -> bool:
         """Удаление ссылки пользователя"""
 
         def sync_delete_link():
-            with self._lock:
-                conn = self._get_connection()
+            with self._writing() as conn:
                 cursor = conn.cursor()
 
                 query = "UPDATE user_links SET is_active = 0 WHERE id = ?"
@@ -933,10 +1413,14 @@ class Database:
                 cursor.execute(query, params)
                 conn.commit()
                 success = cursor.rowcount > 0
-                conn.close()
+
+                if user_id:
+                    self._link_counts.invalidate(user_id)
+                else:
+                    self._link_counts.clear()
                 return success
 
-        return await asyncio.to_thread(sync_delete_link)
+        return await self._run(sync_delete_link)
 
 
 # Синглтон для работы с БД
@@ -0,0 +1,96 @@
+import asyncio
+import contextvars
+import queue
+from threading import Thread, Lock
+from typing import Callable, Any, List
+
+
+class ExecutorClosedError(Exception):
+    """Исполнитель запросов к БД уже остановлен"""
+
+
+# Маркер остановки рабочего потока
+_STOP = object()
+
+
+def _set_future_result(future: asyncio.Future, result: Any):
+    if not future.cancelled():
+        future.set_result(result)
+
+
+def _set_future_exception(future: asyncio.Future, exc: BaseException):
+    if not future.cancelled():
+        future.set_exception(exc)
+
+
+class DedicatedExecutor:
+    """Собственные потоки БД с очередью запросов.
+
+    В отличие от asyncio.to_thread не делит пул потоков по умолчанию
+    с остальным кодом бота: вся работа с SQLite идет через свою очередь.
+    """
+
+    def __init__(self, threads: int = 1, name: str = "db"):
+        if threads < 1:
+            raise ValueError("Количество потоков БД должно быть не меньше 1")
+
+        self.threads = threads
+        self.name = name
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._workers: List[Thread] = []
+        self._mutex = Lock()
+        self._closed = False
+
+    def _start(self):
+        """Ленивый запуск рабочих потоков при первом запросе"""
+        with self._mutex:
+            if self._workers:
+                return
+            for i in range(self.threads):
+                worker = Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _work(self):
+        """Цикл рабочего потока: выполнение запросов из очереди"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            loop, future, context, func = item
+            if future.cancelled():
+                continue
+
+            try:
+                result = context.run(func)
+            except BaseException as exc:
+                loop.call_soon_threadsafe(_set_future_exception, future, exc)
+            else:
+                loop.call_soon_threadsafe(_set_future_result, future, result)
+
+    def submit(self, func: Callable[[], Any]) -> asyncio.Future:
+        """Поставить синхронную функцию в очередь потоков БД"""
+        if self._closed:
+            raise ExecutorClosedError("Исполнитель БД остановлен")
+
+        if not self._workers:
+            self._start()
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((loop, future, contextvars.copy_context(), func))
+        return future
+
+    def queue_size(self) -> int:
+        """Количество запросов, ожидающих выполнения"""
+        return self._queue.qsize()
+
+    def shutdown(self):
+        """Остановка потоков после выполнения уже поставленных запросов"""
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+        self._workers.clear()
@@ -0,0 +1,87 @@
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from utils.metrics import metrics
+
+metrics.describe("db_errors_total", "Вызовы методов Database, завершившиеся исключением")
+
+
+class DbCall:
+    """Время одного вызова метода Database.
+
+    Объект кладется в contextvar и виден в потоке БД (asyncio.to_thread
+    и DedicatedExecutor копируют контекст), где к нему добавляется
+    ожидание блокировок и время выполнения.
+    """
+
+    __slots__ = ("method", "lock_wait", "execution")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.lock_wait = 0.0
+        self.execution = 0.0
+
+
+current_call: ContextVar[Optional[DbCall]] = ContextVar("db_call", default=None)
+
+
+def record_lock_wait(seconds: float):
+    """Ожидание соединения из пула или блокировки записи"""
+    call = current_call.get()
+    if call is not None:
+        call.lock_wait += seconds
+
+
+def record_execution(seconds: float):
+    """Время работы синхронной функции в потоке БД (вместе с ожиданием блокировок)"""
+    call = current_call.get()
+    if call is not None:
+        call.execution += seconds
+
+
+def count_rows(result: Any) -> int:
+    """Сколько строк вернул метод: список строк, словарь строк по id или одна строка"""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        if result and all(isinstance(value, dict) for value in result.values()):
+            return len(result)
+        return 1
+    return 0
+
+
+def _timed(name: str, func: Callable) -> Callable:
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        call = DbCall(name)
+        token = current_call.set(call)
+        started = time.perf_counter()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            metrics.inc("db_errors_total", method=name)
+            raise
+        finally:
+            current_call.reset(token)
+            metrics.observe("db_call_seconds", time.perf_counter() - started, method=name)
+            metrics.observe("db_query_seconds", max(0.0, call.execution - call.lock_wait), method=name)
+            metrics.observe("db_lock_wait_seconds", call.lock_wait, method=name)
+
+        metrics.inc("db_rows_total", count_rows(result), method=name)
+        return result
+
+    return wrapper
+
+
+def instrument(cls: type) -> type:
+    """Декоратор класса: замер всех публичных async-методов (при METRICS_ENABLED)"""
+    if not metrics.enabled:
+        return cls
+
+    for name, func in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(func):
+            setattr(cls, name, _timed(name, func))
+    return cls
@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import time
+from collections import deque
+from pathlib import Path
+from threading import Thread, Lock, Condition
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (user_id, request_type, request_data, response_data, tokens_used, created_at)
+JournalRow = Tuple[int, Optional[str], Optional[str], Optional[str], int, str]
+
+OVERFLOW_POLICIES = ("drop", "block", "spill")
+
+
+class RequestJournal:
+    """Буферизованный журнал запросов пользователей.
+
+    Записи складываются в кольцевой буфер в памяти, а фоновый поток
+    сбрасывает их в БД пачками по batch_size строк. При переполнении
+    буфера действует overflow: drop - запись отбрасывается, block - вызывающий
+    ждет освобождения места, spill - запись уходит в файл и дозаписывается позже.
+    """
+
+    def __init__(self, write: Callable[[List[JournalRow]], None], capacity: int = 10000,
+                 batch_size: int = 500, interval_ms: int = 1000, overflow: str = "drop",
+                 spill_path: str = "data/request_journal.spill"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Неизвестная политика переполнения журнала: {overflow}")
+
+        self._write = write
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self.overflow = overflow
+        self.spill_path = spill_path
+
+        self._buffer: Deque[JournalRow] = deque()
+        self._mutex = Lock()
+        self._not_empty = Condition(self._mutex)
+        self._not_full = Condition(self._mutex)
+        self._spill_lock = Lock()
+        self._thread: Optional[Thread] = None
+        self._closed = False
+
+        # Метрики
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.batches = 0
+        self.write_errors = 0
+
+    @staticmethod
+    def make_row(user_id: int, request_type: Optional[str], request_data: Optional[str],
+                 response_data: Optional[str], tokens_used: int = 0) -> JournalRow:
+        """Запись журнала со временем создания (как CURRENT_TIMESTAMP в SQLite)"""
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        return user_id, request_type, request_data, response_data, tokens_used, created_at
+
+    def _start(self):
+        """Ленивый запуск фонового потока сброса"""
+        with self._mutex:
+            if self._thread is not None:
+                return
+            self._thread = Thread(target=self._loop, name="request-journal", daemon=True)
+            self._thread.start()
+
+    def append(self, row: JournalRow, block: bool = False) -> bool:
+        """Добавить запись. Без block при полном буфере с политикой block возвращает False"""
+        if self._thread is None:
+            self._start()
+
+        with self._mutex:
+            if len(self._buffer) >= self.capacity:
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    return True
+                if self.overflow == "spill":
+                    spill = True
+                elif not block:
+                    return False
+                else:
+                    while len(self._buffer) >= self.capacity and not self._closed:
+                        self._not_full.wait()
+                    spill = False
+            else:
+                spill = False
+
+            if not spill:
+                self._buffer.append(row)
+                self.accepted += 1
+                if len(self._buffer) >= self.batch_size:
+                    self._not_empty.notify()
+                return True
+
+        self._spill([row])
+        return True
+
+    def _write_spill_file(self, rows: List[JournalRow]):
+        with self._spill_lock:
+            Path(self.spill_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _spill(self, rows: List[JournalRow]):
+        """Сохранение записей в файл до следующего сброса"""
+        self._write_spill_file(rows)
+        with self._mutex:
+            self.spilled += len(rows)
+            self.accepted += len(rows)
+
+    def _take_batch(self) -> List[JournalRow]:
+        with self._mutex:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def _write_batch(self, batch: List[JournalRow]) -> bool:
+        try:
+            self._write(batch)
+        except Exception as e:
+            logger.error(f"❌ Ошибка записи журнала запросов ({len(batch)} строк): {e}")
+            with self._mutex:
+                self.write_errors += 1
+            return False
+        with self._mutex:
+            self.written += len(batch)
+            self.batches += 1
+        return True
+
+    def _drain_spill(self):
+        """Дозапись отложенных в файл записей"""
+        if not os.path.exists(self.spill_path):
+            return
+
+        with self._spill_lock:
+            processing_path = self.spill_path + ".processing"
+            if not os.path.exists(processing_path):
+                os.replace(self.spill_path, processing_path)
+
+        with open(processing_path, encoding="utf-8") as f:
+            rows = [tuple(json.loads(line)) for line in f if line.strip()]
+
+        for start in range(0, len(rows), self.batch_size):
+            if not self._write_batch(rows[start:start + self.batch_size]):
+                # Недописанный хвост вернется в spill-файл
+                self._write_spill_file(rows[start:])
+                break
+
+        os.remove(processing_path)
+
+    def flush(self):
+        """Сброс всего буфера в БД"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                break
+            if not self._write_batch(batch):
+                if self.overflow == "spill":
+                    self._spill(batch)
+                else:
+                    # Возвращаем в начало очереди, порядок записей сохраняется
+                    with self._mutex:
+                        self._buffer.extendleft(reversed(batch))
+                break
+
+        if self.overflow == "spill":
+            self._drain_spill()
+
+    def _loop(self):
+        while True:
+            with self._mutex:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._not_empty.wait(self.interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сброса журнала запросов: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики журнала"""
+        with self._mutex:
+            return {
+                'buffered': len(self._buffer),
+                'capacity': self.capacity,
+                'accepted': self.accepted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'spilled': self.spilled,
+                'batches': self.batches,
+                'write_errors': self.write_errors,
+            }
+
+    def close(self):
+        """Остановка фонового потока и финальный сброс"""
+        with self._mutex:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
@@ -0,0 +1,164 @@
+import hashlib
+import secrets
+import sqlite3
+import string
+from datetime import datetime
+from typing import List, Optional
+
+# Алфавит ключей без похожих символов (0/O, 1/I/L)
+KEY_ALPHABET = ''.join(
+    c for c in string.ascii_uppercase + string.digits if c not in '0O1IL'
+)
+KEY_GROUPS = 4
+KEY_GROUP_LENGTH = 4
+KEY_LENGTH = KEY_GROUPS * KEY_GROUP_LENGTH
+
+# Байты >= _BYTE_LIMIT отбрасываются, чтобы символы алфавита были равновероятны
+_BYTE_LIMIT = 256 - 256 % len(KEY_ALPHABET)
+_BYTE_TABLE = bytes(KEY_ALPHABET.encode()[b % len(KEY_ALPHABET)] for b in range(256))
+_REJECTED_BYTES = bytes(range(_BYTE_LIMIT, 256))
+
+# Ключей в одном executemany (внутри общей транзакции)
+INSERT_CHUNK_SIZE = 50000
+
+# Ключи ищутся только по key_digest (SHA-256, 32 байта) через единственный
+# уникальный индекс; key_code хранится для показа пользователю и админу
+ACTIVATION_KEYS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS activation_keys (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key_digest BLOB NOT NULL,
+        plan_id INTEGER NOT NULL,
+        key_code TEXT NOT NULL,
+        is_used BOOLEAN DEFAULT 0,
+        used_by_user_id INTEGER,
+        used_at TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP,
+        FOREIGN KEY (plan_id) REFERENCES subscription_plans (id)
+    )
+'''
+
+ACTIVATION_KEYS_INDEXES = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_activation_keys_key_digest ON activation_keys(key_digest)',
+    'CREATE INDEX IF NOT EXISTS idx_activation_keys_is_used ON activation_keys(is_used)',
+]
+
+
+def random_key_chars(count: int) -> str:
+    """count случайных символов алфавита из одного блока secrets.token_bytes"""
+    chars = b''
+    while len(chars) < count:
+        # Запас на отброшенные байты (~3% для алфавита из 31 символа)
+        need = count - len(chars)
+        raw = secrets.token_bytes(need + need // 16 + 16)
+        chars += raw.translate(_BYTE_TABLE, _REJECTED_BYTES)
+    return chars[:count].decode('ascii')
+
+
+def format_key(chars: str) -> str:
+    """XXXXXXXXXXXXXXXX -> XXXX-XXXX-XXXX-XXXX"""
+    return '-'.join(
+        chars[i:i + KEY_GROUP_LENGTH] for i in range(0, KEY_LENGTH, KEY_GROUP_LENGTH)
+    )
+
+
+def generate_key_codes(count: int) -> List[str]:
+    """count уникальных ключей формата XXXX-XXXX-XXXX-XXXX"""
+    keys = []
+    seen = set()
+    while len(keys) < count:
+        chars = random_key_chars((count - len(keys)) * KEY_LENGTH)
+        for start in range(0, len(chars), KEY_LENGTH):
+            key_code = format_key(chars[start:start + KEY_LENGTH])
+            if key_code not in seen:
+                seen.add(key_code)
+                keys.append(key_code)
+    return keys
+
+
+def key_digest(key_code: str) -> bytes:
+    """SHA-256 ключа в бинарном виде - по нему ищутся ключи"""
+    return hashlib.sha256(key_code.encode()).digest()
+
+
+def create_activation_keys_table(conn: sqlite3.Connection):
+    """Создание таблицы ключей и перевод старой схемы (key_hash TEXT) на key_digest"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(activation_keys)")]
+
+    if columns and 'key_digest' not in columns:
+        migrate_key_digest(conn)
+    else:
+        conn.execute(ACTIVATION_KEYS_TABLE)
+
+    for index_sql in ACTIVATION_KEYS_INDEXES:
+        conn.execute(index_sql)
+
+
+def migrate_key_digest(conn: sqlite3.Connection) -> int:
+    """Пересборка activation_keys: key_hash TEXT и два уникальных индекса -> key_digest BLOB.
+
+    SQLite не умеет удалять UNIQUE-ограничения, поэтому таблица копируется
+    в новую с теми же id (ссылки из users и subscription_history не меняются).
+    Выполняется внутри транзакции миграции и не фиксирует ее; внешние ключи
+    на время миграций отключает migrate() - DROP TABLE с включенными
+    внешними ключами удалил бы ссылки на ключи.
+    """
+    conn.create_function("key_digest", 1, key_digest, deterministic=True)
+
+    conn.execute(ACTIVATION_KEYS_TABLE.replace(
+        "IF NOT EXISTS activation_keys", "activation_keys_digest"
+    ))
+    conn.execute('''
+        INSERT INTO activation_keys_digest
+        (id, key_digest, plan_id, key_code, is_used, used_by_user_id, used_at, created_at, expires_at)
+        SELECT id, key_digest(key_code), plan_id, key_code, is_used, used_by_user_id,
+               used_at, created_at, expires_at
+        FROM activation_keys
+    ''')
+    migrated = conn.execute("SELECT COUNT(*) FROM activation_keys_digest").fetchone()[0]
+
+    # Вместе с таблицей удаляются индексы по key_hash и key_code
+    conn.execute("DROP TABLE activation_keys")
+    conn.execute("ALTER TABLE activation_keys_digest RENAME TO activation_keys")
+
+    print(f"🔄 Ключи активации переведены на key_digest: {migrated} шт.")
+    return migrated
+
+
+def insert_keys(conn: sqlite3.Connection, plan_id: int, quantity: int,
+                expires_at: Optional[datetime] = None,
+                chunk_size: int = INSERT_CHUNK_SIZE) -> List[str]:
+    """Генерация и вставка quantity ключей в одной транзакции (commit - за вызывающим).
+
+    Пачка, столкнувшаяся с уже существующим ключом, откатывается
+    до точки сохранения и генерируется заново.
+    """
+    expires = expires_at.isoformat(' ') if expires_at else None
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+    inserted: List[str] = []
+    collisions = 0
+    while len(inserted) < quantity:
+        keys = generate_key_codes(min(chunk_size, quantity - len(inserted)))
+        # Вставка в порядке хеша - меньше случайных обращений к страницам индекса
+        rows = sorted((key_digest(key_code), plan_id, key_code, expires) for key_code in keys)
+        conn.execute("SAVEPOINT insert_keys")
+        try:
+            conn.executemany('''
+                INSERT INTO activation_keys
+                (key_digest, plan_id, key_code, expires_at)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        except sqlite3.IntegrityError:
+            conn.execute("ROLLBACK TO insert_keys")
+            conn.execute("RELEASE insert_keys")
+            collisions += 1
+            # Случайное совпадение повторяется крайне редко - иначе ошибка не в ключах
+            if collisions >= 10:
+                raise
+            continue
+        conn.execute("RELEASE insert_keys")
+        inserted.extend(keys)
+
+    return inserted
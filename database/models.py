@@ -15,4 +15,16 @@ class Message:
     id: int
     user_id: int
     text: str
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+@dataclass(frozen=True)
+class SubscriptionPlan:
+    id: int
+    name: str
+    description: Optional[str]
+    price: float
+    max_requests: int
+    duration_days: int
+    max_activation_keys: int
+    is_active: bool
+    created_at: Optional[str]
@@ -0,0 +1,72 @@
+import sqlite3
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+from database.models import SubscriptionPlan
+
+
+class PlanCatalog:
+    """Справочник планов подписки в памяти.
+
+    Планов всего несколько и меняются они редко, поэтому таблица
+    subscription_plans читается один раз, а поиск по id и имени идет по словарям.
+    Обновление подменяет снимок целиком, читатели всегда видят согласованные данные.
+    """
+
+    _COLUMNS = ("id", "name", "description", "price", "max_requests", "duration_days",
+                "max_activation_keys", "is_active", "created_at")
+
+    def __init__(self, plans: Tuple[SubscriptionPlan, ...] = ()):
+        self._snapshot = self._build(plans)
+        self.loaded = bool(plans)
+
+    @staticmethod
+    def _build(plans) -> Tuple[Dict[int, SubscriptionPlan], Dict[str, SubscriptionPlan],
+                               Tuple[SubscriptionPlan, ...]]:
+        plans = tuple(plans)
+        by_id = {plan.id: plan for plan in plans}
+        by_name = {plan.name.upper(): plan for plan in plans}
+        active = tuple(sorted((plan for plan in plans if plan.is_active), key=lambda plan: plan.price))
+        return by_id, by_name, active
+
+    @classmethod
+    def fetch(cls, conn: sqlite3.Connection) -> Tuple[SubscriptionPlan, ...]:
+        """Чтение всех планов из БД"""
+        rows = conn.execute(
+            f"SELECT {', '.join(cls._COLUMNS)} FROM subscription_plans"
+        ).fetchall()
+        return tuple(
+            SubscriptionPlan(**dict(zip(cls._COLUMNS, row)))
+            for row in rows
+        )
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "PlanCatalog":
+        """Каталог, загруженный из БД"""
+        catalog = cls()
+        catalog.reload(conn)
+        return catalog
+
+    def reload(self, conn: sqlite3.Connection):
+        """Перечитать планы из БД"""
+        self._snapshot = self._build(self.fetch(conn))
+        self.loaded = True
+
+    def by_id(self, plan_id: Optional[int]) -> Optional[SubscriptionPlan]:
+        """План по id"""
+        return self._snapshot[0].get(plan_id)
+
+    def by_name(self, name: Optional[str]) -> Optional[SubscriptionPlan]:
+        """План по имени (без учета регистра)"""
+        if not name:
+            return None
+        return self._snapshot[1].get(name.upper())
+
+    def active(self) -> List[SubscriptionPlan]:
+        """Активные планы по возрастанию цены"""
+        return list(self._snapshot[2])
+
+    @staticmethod
+    def as_dict(plan: SubscriptionPlan) -> Dict:
+        """План в виде словаря, как строка subscription_plans"""
+        return asdict(plan)
@@ -0,0 +1,164 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from queue import Queue, Empty
+from threading import Lock
+from typing import Callable, Dict, Any, Iterator, Tuple
+
+
+class PoolClosedError(Exception):
+    """Пул соединений уже закрыт"""
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений SQLite (checkout/return)"""
+
+    def __init__(self, factory: Callable[[], sqlite3.Connection], size: int = 5,
+                 timeout: float = 10.0, health_check_interval: float = 30.0):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        # Свободные соединения вместе со временем последнего использования
+        self._idle: "Queue[Tuple[sqlite3.Connection, float]]" = Queue()
+        self._mutex = Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+
+        # Метрики пула
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._health_check_failures = 0
+        self._discarded = 0
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Проверка, что соединение еще живое"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        """Закрытие соединения без возврата в пул"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._mutex:
+            self._created -= 1
+            self._discarded += 1
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Получение соединения: свободное, новое или ожидание освобождения"""
+        if self._closed:
+            raise PoolClosedError("Пул соединений закрыт")
+
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except Empty:
+            with self._mutex:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+
+            if can_create:
+                try:
+                    return self._factory()
+                except Exception:
+                    with self._mutex:
+                        self._created -= 1
+                    raise
+
+            # Пул исчерпан - ждем возврата соединения
+            started = time.perf_counter()
+            try:
+                conn, last_used = self._idle.get(timeout=self.timeout)
+            except Empty:
+                with self._mutex:
+                    self._timeouts += 1
+                raise PoolTimeoutError(
+                    f"Нет свободных соединений в пуле за {self.timeout} сек."
+                )
+            finally:
+                with self._mutex:
+                    self._waits += 1
+                    self._wait_time += time.perf_counter() - started
+
+        # Проверяем соединения, которые долго простаивали
+        if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+            with self._mutex:
+                self._health_check_failures += 1
+            self._discard(conn)
+            return self._acquire()
+
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        """Возврат соединения в пул"""
+        if self._closed:
+            self._discard(conn)
+            return
+
+        if conn.in_transaction:
+            # Незавершенная транзакция (например, после исключения) не должна
+            # достаться следующему пользователю пула
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+
+        self._idle.put_nowait((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Взять соединение из пула на время блока with"""
+        conn = self._acquire()
+        with self._mutex:
+            self._in_use += 1
+            self._checkouts += 1
+        try:
+            yield conn
+        finally:
+            with self._mutex:
+                self._in_use -= 1
+            self._release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики пула соединений"""
+        with self._mutex:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total': round(self._wait_time, 6),
+                'timeouts': self._timeouts,
+                'health_check_failures': self._health_check_failures,
+                'discarded': self._discarded,
+                'closed': self._closed,
+            }
+
+    def close(self):
+        """Закрытие пула: свободные соединения закрываются сразу, занятые - при возврате"""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(conn)
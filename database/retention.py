@@ -0,0 +1,255 @@
+"""
+Хранение журнала запросов (user_requests).
+
+Строки старше срока хранения сворачиваются в user_requests_daily
+(пользователь, день, тип запроса: количество и токены) и удаляются,
+при REQUEST_RETENTION_MODE=archive - сначала копируются в отдельную БД архива.
+Работа идет окнами из самых старых строк по индексу created_at (порядок rowid
+не годится: записи из spill-файла журнала дописываются позже со старым
+временем). Пока индекса нет (большой журнал, --create-index еще не выполнен),
+окна идут по rowid через всю таблицу. Каждое окно - одна короткая транзакция,
+в которой свертка и удаление выполняются вместе, поэтому строка не
+учитывается дважды даже при нескольких процессах. Освободившиеся страницы возвращаются
+файловой системе через PRAGMA incremental_vacuum.
+
+Запуск вручную: python -m database.retention [--days 30] [--stats] [--enable-auto-vacuum] [--create-index]
+"""
+import sqlite3
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from database.schema import REQUESTS_TIME_INDEX, REQUESTS_TIME_INDEX_SQL
+from database.storage import connect
+
+ARCHIVE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS user_requests (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        request_type TEXT,
+        request_data TEXT,
+        response_data TEXT,
+        tokens_used INTEGER DEFAULT 0,
+        created_at TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+_COLUMNS = "id, user_id, request_type, request_data, response_data, tokens_used, created_at"
+
+
+def cutoff_for(days: float) -> str:
+    """Граница хранения в формате created_at (UTC, как CURRENT_TIMESTAMP)"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - days * 86400))
+
+
+def open_archive(path: str) -> sqlite3.Connection:
+    """БД архива исходных записей журнала"""
+    # Архив пишется из потока БД, в котором выполняется свертка
+    conn = connect(path, check_same_thread=False)
+    conn.execute(ARCHIVE_TABLE)
+    conn.commit()
+    return conn
+
+
+def _compact_selected(conn: sqlite3.Connection, archive: Optional[sqlite3.Connection]) -> int:
+    """Архив, свертка и удаление строк из temp.compaction_window (внутри транзакции)"""
+    window = "id IN (SELECT id FROM temp.compaction_window)"
+
+    if archive is not None:
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM user_requests WHERE {window}"
+        ).fetchall()
+        # Архив фиксируется первым: если удаление не пройдет, строки
+        # заархивируются повторно, а OR IGNORE не даст дублей
+        archive.executemany(
+            f"INSERT OR IGNORE INTO user_requests ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [tuple(row) for row in rows]
+        )
+        archive.commit()
+
+    conn.execute(f'''
+        INSERT INTO user_requests_daily (user_id, day, request_type, requests, tokens_used)
+        SELECT user_id, date(created_at), COALESCE(request_type, ''), COUNT(*), SUM(tokens_used)
+        FROM user_requests
+        WHERE {window}
+        GROUP BY user_id, date(created_at), COALESCE(request_type, '')
+        ON CONFLICT (user_id, day, request_type) DO UPDATE SET
+            requests = requests + excluded.requests,
+            tokens_used = tokens_used + excluded.tokens_used
+    ''')
+    return conn.execute(f"DELETE FROM user_requests WHERE {window}").rowcount
+
+
+def _begin_window(conn: sqlite3.Connection):
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    # Окно фиксируется во временной таблице: архив, свертка и удаление
+    # должны видеть одни и те же строки
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS compaction_window (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.compaction_window")
+
+
+def compact_window(conn: sqlite3.Connection, cutoff: str, batch_size: int,
+                   archive: Optional[sqlite3.Connection] = None) -> int:
+    """Свертка и удаление до batch_size самых старых строк, созданных до cutoff.
+
+    Возвращает, сколько строк свернуто; меньше batch_size - старых строк
+    больше нет. Строки выбираются по индексу created_at, а не по rowid.
+    """
+    _begin_window(conn)
+    try:
+        conn.execute(f'''
+            INSERT INTO temp.compaction_window (id)
+            SELECT id FROM user_requests INDEXED BY {REQUESTS_TIME_INDEX}
+            WHERE created_at < ? ORDER BY created_at LIMIT ?
+        ''', (cutoff, batch_size))
+        compacted = _compact_selected(conn, archive)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return compacted
+
+
+def compact_rowid_window(conn: sqlite3.Connection, cutoff: str, lower: int, batch_size: int,
+                         archive: Optional[sqlite3.Connection] = None) -> Tuple[Optional[int], int]:
+    """Без индекса по времени: свертка старых строк среди batch_size строк после rowid lower.
+
+    Возвращает (верхняя граница окна, сколько строк свернуто); граница None -
+    строк после lower нет. Окно без старых строк не означает конец: старые
+    строки из spill-файла журнала могут идти дальше, проходится вся таблица.
+    """
+    _begin_window(conn)
+    try:
+        upper = conn.execute('''
+            SELECT MAX(id) FROM (
+                SELECT id FROM user_requests WHERE id > ? ORDER BY id LIMIT ?
+            )
+        ''', (lower, batch_size)).fetchone()[0]
+        if upper is None:
+            conn.rollback()
+            return None, 0
+
+        conn.execute('''
+            INSERT INTO temp.compaction_window (id)
+            SELECT id FROM user_requests WHERE id > ? AND id <= ? AND created_at < ?
+        ''', (lower, upper, cutoff))
+        compacted = _compact_selected(conn, archive)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return upper, compacted
+
+
+def incremental_vacuum_step(conn: sqlite3.Connection, pages: int) -> int:
+    """Вернуть файловой системе до pages свободных страниц; сколько освобождено"""
+    if conn.in_transaction:
+        conn.commit()
+
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if not before:
+        return 0
+    # incremental_vacuum возвращает строку на каждую страницу - их нужно дочитать
+    conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    if conn.in_transaction:
+        conn.commit()
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def request_log_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Размер журнала запросов, его прирост за сутки и занятое место в файле"""
+    raw = conn.execute('''
+        SELECT COUNT(*), MIN(created_at),
+               SUM(CASE WHEN created_at >= ? THEN 1 ELSE 0 END)
+        FROM user_requests
+    ''', (cutoff_for(1),)).fetchone()
+    daily = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(requests), 0), MIN(day) FROM user_requests_daily"
+    ).fetchone()
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    return {
+        'raw_rows': raw[0],
+        'raw_oldest': raw[1],
+        'raw_last_24h': raw[2] or 0,
+        'daily_rows': daily[0],
+        'daily_requests': daily[1],
+        'daily_oldest': daily[2],
+        'file_bytes': page_size * page_count,
+        'free_bytes': page_size * freelist,
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}[conn.execute("PRAGMA auto_vacuum").fetchone()[0]],
+    }
+
+
+def create_requests_time_index(conn: sqlite3.Connection):
+    """Индекс журнала по времени на большом журнале: одна долгая транзакция, бот должен быть остановлен"""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute(REQUESTS_TIME_INDEX_SQL)
+    conn.commit()
+
+
+def enable_auto_vacuum(conn: sqlite3.Connection):
+    """Перевод существующей БД на auto_vacuum=INCREMENTAL: полный VACUUM, бот должен быть остановлен"""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Свертка и очистка журнала запросов")
+    parser.add_argument("--db", default=Config.DB_PATH, help="Путь к БД")
+    parser.add_argument("--days", type=float, default=Config.REQUEST_RETENTION_DAYS,
+                        help="Сколько дней хранить исходные записи")
+    parser.add_argument("--stats", action="store_true", help="Только показать размер журнала")
+    parser.add_argument("--enable-auto-vacuum", action="store_true",
+                        help="Включить incremental auto_vacuum на существующей БД (полный VACUUM)")
+    parser.add_argument("--create-index", action="store_true",
+                        help="Построить индекс журнала по времени (если миграция его отложила)")
+
+    args = parser.parse_args()
+
+    async def run():
+        from database.db import Database
+
+        db = Database(args.db)
+        try:
+            await db.create_tables()
+            if not args.stats:
+                result = await db.compact_requests(retention_days=args.days)
+                print(f"🧹 Свернуто {result['compacted']} записей "
+                      f"({result['archived']} в архив) за {result['seconds']:.1f} сек.: "
+                      f"{result['rows_per_second']:.0f} записей/сек., "
+                      f"освобождено {result['vacuumed_bytes'] / 1024 / 1024:.1f} МБ")
+            print(f"📊 Журнал запросов: {await db.get_request_log_stats()}")
+        finally:
+            await db.close()
+
+    if args.enable_auto_vacuum:
+        # Отдельное действие для остановленного бота: свертку запускают потом
+        started = time.perf_counter()
+        conn = connect(args.db)
+        enable_auto_vacuum(conn)
+        conn.close()
+        print(f"✅ auto_vacuum=INCREMENTAL включен за {time.perf_counter() - started:.1f} сек.")
+    elif args.create_index:
+        # Тоже отдельное действие для остановленного бота
+        started = time.perf_counter()
+        conn = connect(args.db)
+        create_requests_time_index(conn)
+        conn.close()
+        print(f"✅ Индекс {REQUESTS_TIME_INDEX} построен за {time.perf_counter() - started:.1f} сек.")
+    else:
+        asyncio.run(run())
@@ -0,0 +1,508 @@
+"""
+Версионированная схема БД.
+
+Версия схемы хранится в PRAGMA user_version (заголовок файла БД), поэтому
+проверка при запуске - одно чтение заголовка без обращения к таблицам.
+Миграции применяются по порядку, каждая в своей транзакции BEGIN IMMEDIATE
+вместе с новой версией: прерванное обновление продолжается со следующей
+миграции, а несколько процессов не применяют одну миграцию дважды.
+
+Заполнение индексов по уже сохраненным строкам (онлайн-построение) на
+больших таблицах не делается внутри миграции: миграция только регистрирует
+его в schema_online_builds, а строки дописываются пачками по диапазонам
+rowid короткими транзакциями, между которыми бот пишет в БД как обычно.
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from database.keys import create_activation_keys_table
+
+DEFAULT_PLANS = [
+    ('FREE', 'Бесплатный план', 0, 50, 30, 0),
+    ('BASIC', 'Базовый план', 10, 500, 30, 1),
+    ('PRO', 'Профессиональный план', 25, 2000, 30, 3),
+    ('PREMIUM', 'Премиум план', 50, 10000, 30, 5),
+    ('ENTERPRISE', 'Корпоративный план', 200, 50000, 30, 10)
+]
+
+# Строк в одной транзакции онлайн-построения
+ONLINE_BUILD_BATCH_SIZE = 5000
+
+# Индекс журнала запросов по времени. Обычный индекс пачками не достроить,
+# поэтому миграция строит его сама только на небольшом журнале (доли секунды
+# под блокировкой записи), а большой - отдельным шагом при остановленном боте:
+# python -m database.retention --create-index
+REQUESTS_TIME_INDEX = "idx_user_requests_created_at"
+REQUESTS_TIME_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS {REQUESTS_TIME_INDEX} ON user_requests(created_at)"
+REQUESTS_TIME_INDEX_INLINE_ROWS = 100000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+@dataclass(frozen=True)
+class OnlineBuild:
+    """Индекс, заполняемый пачками: batch_sql получает границы (lo, hi] по rowid"""
+    table: str
+    batch_sql: str
+    finish: Optional[Callable[[sqlite3.Connection], None]] = None
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> bool:
+    """Добавление колонки в существующую таблицу старой схемы"""
+    columns = _columns(conn, table)
+    if not columns or column in columns:
+        return False
+    print(f"➕ Добавляем колонку {column} в {table}")
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+
+def _baseline(conn: sqlite3.Connection):
+    """Схема до появления версий; на старых БД досоздает недостающее"""
+    # Колонки, которых нет в БД старых версий: добавляются до пересборки ключей,
+    # потому что перевод на key_digest копирует expires_at
+    _add_column(conn, 'activation_keys', 'expires_at', 'TIMESTAMP')
+    _add_column(conn, 'users', 'activation_key_id', 'INTEGER REFERENCES activation_keys (id)')
+    _add_column(conn, 'subscription_history', 'activation_key_id', 'INTEGER REFERENCES activation_keys (id)')
+    if _add_column(conn, 'subscription_plans', 'max_activation_keys', 'INTEGER DEFAULT 1'):
+        conn.executemany(
+            "UPDATE subscription_plans SET max_activation_keys = ? WHERE name = ?",
+            [(plan[5], plan[0]) for plan in DEFAULT_PLANS]
+        )
+
+    # Таблица подписок (планов)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subscription_plans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            price REAL DEFAULT 0,
+            max_requests INTEGER DEFAULT 100,
+            duration_days INTEGER DEFAULT 30,
+            max_activation_keys INTEGER DEFAULT 1,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Таблица ключей активации (старая схема key_hash переводится на key_digest
+    # в той же транзакции)
+    create_activation_keys_table(conn)
+
+    # Основная таблица пользователей
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            username TEXT,
+            full_name TEXT NOT NULL,
+            subscription_plan_id INTEGER DEFAULT 1,
+            activation_key_id INTEGER,
+            requests_used INTEGER DEFAULT 0,
+            requests_limit INTEGER DEFAULT 100,
+            subscription_start DATE,
+            subscription_end DATE,
+            is_active BOOLEAN DEFAULT 1,
+            is_admin BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (subscription_plan_id) REFERENCES subscription_plans (id),
+            FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
+        )
+    ''')
+
+    # Таблица истории подписок
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS subscription_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            plan_id INTEGER NOT NULL,
+            activation_key_id INTEGER,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE,
+            FOREIGN KEY (plan_id) REFERENCES subscription_plans (id),
+            FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
+        )
+    ''')
+
+    # Таблица запросов/активности
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            request_type TEXT,
+            request_data TEXT,
+            response_data TEXT,
+            tokens_used INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Таблица ссылок пользователя
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT,
+            description TEXT,
+            category TEXT DEFAULT 'general',
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Задания массового выпуска ключей (mint) - для продолжения после прерывания
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS key_mint_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            minted INTEGER DEFAULT 0,
+            expires_at TIMESTAMP,
+            output_path TEXT,
+            status TEXT DEFAULT 'running',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (plan_id) REFERENCES subscription_plans (id)
+        )
+    ''')
+
+    # Онлайн-построения индексов: position - до какого rowid строки уже в индексе,
+    # target - последний rowid на момент регистрации (новые строки ведут триггеры)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_online_builds (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL DEFAULT 0,
+            target INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+    indexes = [
+        'CREATE INDEX IF NOT EXISTS idx_users_user_id ON users(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_activation_key ON users(activation_key_id)',
+        'CREATE INDEX IF NOT EXISTS idx_users_subscription_end ON users(subscription_end)',
+        'CREATE INDEX IF NOT EXISTS idx_subscription_history_user_id ON subscription_history(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_user_requests_user_id ON user_requests(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_user_links_user_id ON user_links(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_user_links_category ON user_links(category)',
+        'CREATE INDEX IF NOT EXISTS idx_user_links_is_active ON user_links(is_active)',
+        # Постраничный вывод ссылок по курсору (created_at, id)
+        'CREATE INDEX IF NOT EXISTS idx_user_links_user_created '
+        'ON user_links(user_id, is_active, created_at DESC, id DESC)'
+    ]
+    for index_sql in indexes:
+        conn.execute(index_sql)
+
+    # Стандартные планы подписки с количеством ключей
+    conn.executemany('''
+        INSERT OR IGNORE INTO subscription_plans
+        (name, description, price, max_requests, duration_days, max_activation_keys)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', DEFAULT_PLANS)
+
+
+# Строка ссылки уже в полнотекстовом индексе: проиндексирована пачкой
+# онлайн-построения (id <= position) или триггером вставки (id > target)
+_LINK_INDEXED = '''
+    (old.id > (SELECT target FROM schema_online_builds WHERE name = 'user_links_fts')
+     OR old.id <= (SELECT position FROM schema_online_builds WHERE name = 'user_links_fts'))
+'''
+
+
+def _links_fts_triggers(conn: sqlite3.Connection, online: bool):
+    """Триггеры синхронизации FTS с user_links.
+
+    В индексе только активные ссылки (is_active = 1): поиск берет первые
+    результаты по релевантности прямо из FTS, без проверки каждой ссылки.
+    Пока индекс достраивается, удаление и изменение еще не проиндексированной
+    строки не трогают FTS (иначе 'delete' испортит external content индекс):
+    ее актуальную версию добавит пачка онлайн-построения.
+    """
+    when = f"WHEN {_LINK_INDEXED}" if online else ""
+    conn.execute("DROP TRIGGER IF EXISTS user_links_fts_ai")
+    conn.execute("DROP TRIGGER IF EXISTS user_links_fts_ad")
+    conn.execute("DROP TRIGGER IF EXISTS user_links_fts_au")
+
+    conn.execute('''
+        CREATE TRIGGER user_links_fts_ai AFTER INSERT ON user_links WHEN new.is_active = 1 BEGIN
+            INSERT INTO user_links_fts (rowid, user_id, url, title, description, category)
+            VALUES (new.id, new.user_id, new.url, new.title, new.description, new.category);
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER user_links_fts_ad AFTER DELETE ON user_links {when} BEGIN
+            INSERT INTO user_links_fts (user_links_fts, rowid, user_id, url, title, description, category)
+            SELECT 'delete', old.id, old.user_id, old.url, old.title, old.description, old.category
+            WHERE old.is_active = 1;
+        END
+    ''')
+    # Смена is_active - тоже изменение индекса: удаленная ссылка из него уходит
+    conn.execute(f'''
+        CREATE TRIGGER user_links_fts_au AFTER UPDATE OF user_id, url, title, description, category, is_active
+        ON user_links {when} BEGIN
+            INSERT INTO user_links_fts (user_links_fts, rowid, user_id, url, title, description, category)
+            SELECT 'delete', old.id, old.user_id, old.url, old.title, old.description, old.category
+            WHERE old.is_active = 1;
+            INSERT INTO user_links_fts (rowid, user_id, url, title, description, category)
+            SELECT new.id, new.user_id, new.url, new.title, new.description, new.category
+            WHERE new.is_active = 1;
+        END
+    ''')
+
+
+def _links_fts(conn: sqlite3.Connection):
+    """Полнотекстовый индекс ссылок (FTS5) с триггерами синхронизации"""
+    # БД до появления версий могла уже получить заполненный индекс
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_links_fts'"
+    ).fetchone() is not None
+
+    try:
+        # Индекс хранит только токены, текст берется из user_links (external content).
+        # user_id проиндексирован, чтобы пересекать списки документов внутри FTS
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS user_links_fts USING fts5(
+                user_id, url, title, description, category,
+                content='user_links',
+                content_rowid='id',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite собран без FTS5 - поиск останется на LIKE
+        print(f"⚠️ Полнотекстовый поиск недоступен: {e}")
+        return
+
+    if exists:
+        _links_fts_triggers(conn, online=False)
+        return
+
+    # Уже сохраненные ссылки попадут в индекс пачками после запуска
+    register_online_build(conn, 'user_links_fts')
+    _links_fts_triggers(conn, online=True)
+
+
+def _requests_daily(conn: sqlite3.Connection):
+    """Дневные итоги журнала запросов: сюда сворачиваются записи старше срока хранения"""
+    # request_type NULL хранится как '' - в ключе WITHOUT ROWID таблицы NULL недопустим
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_requests_daily (
+            user_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            request_type TEXT NOT NULL DEFAULT '',
+            requests INTEGER NOT NULL DEFAULT 0,
+            tokens_used INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, day, request_type),
+            FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+
+
+def _links_fts_active_only(conn: sqlite3.Connection):
+    """Удаленные (is_active = 0) ссылки убираются из полнотекстового индекса"""
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_links_fts'"
+    ).fetchone() is None:
+        return
+
+    build = conn.execute(
+        "SELECT position, target FROM schema_online_builds WHERE name = 'user_links_fts' AND finished_at IS NULL"
+    ).fetchone()
+    _links_fts_triggers(conn, online=build is not None)
+
+    # Из индекса удаляются только уже попавшие в него строки; недостроенный
+    # диапазон онлайн-построение заполнит сразу без удаленных ссылок
+    indexed = "AND (id <= ? OR id > ?)" if build else ""
+    conn.execute(f'''
+        INSERT INTO user_links_fts (user_links_fts, rowid, user_id, url, title, description, category)
+        SELECT 'delete', id, user_id, url, title, description, category FROM user_links
+        WHERE is_active = 0 {indexed}
+    ''', tuple(build or ()))
+
+
+def _requests_created_index(conn: sqlite3.Connection):
+    """Индекс журнала запросов по времени: свертка выбирает старые строки по created_at"""
+    # Строки, дописанные из spill-файла журнала, получают новые rowid со старым
+    # created_at, поэтому порядок rowid не совпадает с порядком времени.
+    # Оценка размера по rowid - без полного просмотра таблицы
+    rows = conn.execute(
+        "SELECT COALESCE(MAX(rowid) - MIN(rowid) + 1, 0) FROM user_requests"
+    ).fetchone()[0]
+    if rows > REQUESTS_TIME_INDEX_INLINE_ROWS:
+        print(f"⚠️ Журнал запросов большой (~{rows} строк): индекс по времени не строится при запуске, "
+              f"выполните python -m database.retention --create-index при остановленном боте")
+        return
+    conn.execute(REQUESTS_TIME_INDEX_SQL)
+
+
+def has_requests_time_index(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (REQUESTS_TIME_INDEX,)
+    ).fetchone() is not None
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Базовая схема", _baseline),
+    Migration(2, "Полнотекстовый индекс ссылок", _links_fts),
+    Migration(3, "Дневные итоги журнала запросов", _requests_daily),
+    Migration(4, "Только активные ссылки в полнотекстовом индексе", _links_fts_active_only),
+    Migration(5, "Индекс журнала запросов по времени", _requests_created_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+ONLINE_BUILDS: Dict[str, OnlineBuild] = {
+    'user_links_fts': OnlineBuild(
+        table='user_links',
+        batch_sql='''
+            INSERT INTO user_links_fts (rowid, user_id, url, title, description, category)
+            SELECT id, user_id, url, title, description, category FROM user_links
+            WHERE id > ? AND id <= ? AND is_active = 1
+        ''',
+        finish=lambda conn: _links_fts_triggers(conn, online=False)
+    ),
+}
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Применение недостающих миграций; возвращает версию схемы.
+
+    На актуальной схеме - одно чтение PRAGMA user_version.
+    """
+    version = get_version(conn)
+    if version >= SCHEMA_VERSION:
+        if version > SCHEMA_VERSION:
+            print(f"⚠️ Схема БД версии {version} новее кода (версия {SCHEMA_VERSION})")
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    # Пересборка таблиц (копия, DROP, RENAME) идет с отключенными внешними
+    # ключами, а PRAGMA foreign_keys внутри транзакции не действует
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for migration in MIGRATIONS:
+            if migration.version <= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Пока ждали блокировку, миграцию мог применить другой процесс
+                version = get_version(conn)
+                if migration.version <= version:
+                    conn.rollback()
+                    continue
+                migration.apply(conn)
+                conn.execute(f"PRAGMA user_version = {migration.version}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            version = migration.version
+            print(f"🔄 Схема БД: версия {version} - {migration.description}")
+    finally:
+        if foreign_keys:
+            conn.execute("PRAGMA foreign_keys = ON")
+
+    return version
+
+
+def register_online_build(conn: sqlite3.Connection, name: str):
+    """Регистрация онлайн-построения (внутри миграции): строки до текущего rowid дописываются пачками"""
+    table = ONLINE_BUILDS[name].table
+    target = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+    conn.execute('''
+        INSERT OR REPLACE INTO schema_online_builds (name, position, target)
+        VALUES (?, 0, ?)
+    ''', (name, target))
+
+
+def pending_online_builds(conn: sqlite3.Connection) -> List[str]:
+    """Незавершенные онлайн-построения"""
+    return [
+        row[0] for row in conn.execute(
+            "SELECT name FROM schema_online_builds WHERE finished_at IS NULL ORDER BY started_at"
+        )
+    ]
+
+
+def online_build_step(conn: sqlite3.Connection, name: str,
+                      batch_size: int = ONLINE_BUILD_BATCH_SIZE) -> bool:
+    """Одна пачка онлайн-построения в своей транзакции; True - построение завершено.
+
+    Позиция читается под блокировкой записи, поэтому несколько процессов
+    могут достраивать один индекс, не вставляя строки дважды.
+    """
+    build = ONLINE_BUILDS[name]
+    if conn.in_transaction:
+        conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT position, target, finished_at FROM schema_online_builds WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None or row[2] is not None:
+            conn.rollback()
+            return True
+
+        position, target = row[0], row[1]
+        if position < target:
+            # Граница пачки - batch_size-я строка после position (rowid могут идти с пропусками)
+            upper = conn.execute(f'''
+                SELECT MAX(rowid) FROM (
+                    SELECT rowid FROM {build.table} WHERE rowid > ? AND rowid <= ?
+                    ORDER BY rowid LIMIT ?
+                )
+            ''', (position, target, batch_size)).fetchone()[0]
+            upper = target if upper is None else upper
+            conn.execute(build.batch_sql, (position, upper))
+            position = upper
+
+        done = position >= target
+        if done and build.finish:
+            build.finish(conn)
+        conn.execute('''
+            UPDATE schema_online_builds
+            SET position = ?, finished_at = CASE WHEN ? THEN CURRENT_TIMESTAMP END
+            WHERE name = ?
+        ''', (position, done, name))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return done
+
+
+def run_online_builds(conn: sqlite3.Connection, batch_size: int = ONLINE_BUILD_BATCH_SIZE) -> int:
+    """Достроить все онлайн-построения сразу (для скриптов без работающего бота)"""
+    names = pending_online_builds(conn)
+    for name in names:
+        while not online_build_step(conn, name, batch_size):
+            pass
+        print(f"✅ Онлайн-построение {name} завершено")
+    return len(names)
@@ -0,0 +1,104 @@
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import Config
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+TEMP_STORES = ("DEFAULT", "FILE", "MEMORY")
+AUTO_VACUUM_MODES = ("NONE", "FULL", "INCREMENTAL")
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """Настройки хранения SQLite, одинаковые для всех соединений с БД.
+
+    journal_mode хранится в самом файле БД и переключается только соединением,
+    которому разрешена запись; остальные параметры действуют на соединение.
+    cache_size - как в PRAGMA: отрицательное значение в КиБ, положительное в страницах.
+    """
+    journal_mode: str
+    synchronous: str
+    cache_size: int
+    mmap_size: int
+    temp_store: str
+    busy_timeout: float = 30
+    # Действует только для новой БД (до первой записи в файл), существующую
+    # переводит python -m database.retention --enable-auto-vacuum
+    auto_vacuum: str = "NONE"
+
+    @classmethod
+    def from_config(cls) -> "StorageProfile":
+        """Профиль из Config (читается при вызове, чтобы учитывать подмену настроек)"""
+        return cls(
+            journal_mode=Config.DB_JOURNAL_MODE,
+            synchronous=Config.DB_SYNCHRONOUS,
+            cache_size=Config.DB_CACHE_SIZE,
+            mmap_size=Config.DB_MMAP_SIZE,
+            temp_store=Config.DB_TEMP_STORE,
+            busy_timeout=Config.DB_BUSY_TIMEOUT,
+            auto_vacuum=Config.DB_AUTO_VACUUM
+        )
+
+    def __post_init__(self):
+        # Значения подставляются в PRAGMA, поэтому проверяются заранее
+        for name, value, allowed in (("journal_mode", self.journal_mode, JOURNAL_MODES),
+                                     ("synchronous", self.synchronous, SYNCHRONOUS_MODES),
+                                     ("temp_store", self.temp_store, TEMP_STORES),
+                                     ("auto_vacuum", self.auto_vacuum, AUTO_VACUUM_MODES)):
+            if value.upper() not in allowed:
+                raise ValueError(f"Недопустимое значение {name}: {value} (допустимо: {', '.join(allowed)})")
+
+    def apply(self, conn: sqlite3.Connection, writer: bool = True):
+        """Применение профиля к открытому соединению (вне транзакции)"""
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        if writer:
+            # До journal_mode: переключение в WAL записывает заголовок новой БД
+            conn.execute(f"PRAGMA auto_vacuum = {self.auto_vacuum}")
+            mode = conn.execute(f"PRAGMA journal_mode = {self.journal_mode}").fetchone()[0]
+            if mode.upper() != self.journal_mode.upper():
+                # Например, WAL недоступен для БД в памяти
+                print(f"⚠️ journal_mode = {self.journal_mode} не применен, используется {mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA temp_store = {self.temp_store}")
+
+    def settings(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """Фактические значения PRAGMA соединения (для проверки и отчетов)"""
+        return {
+            name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout",
+                         "auto_vacuum")
+        }
+
+
+# Профили для сравнения (benchmarks.storage_profiles); бот использует StorageProfile.from_config()
+STORAGE_PROFILES: Dict[str, StorageProfile] = {
+    # Настройки SQLite по умолчанию: журнал отката, fsync на каждую фиксацию
+    "sqlite_default": StorageProfile(journal_mode="DELETE", synchronous="FULL", cache_size=-2000,
+                                     mmap_size=0, temp_store="DEFAULT"),
+    # WAL с полной синхронизацией: fsync журнала на каждую фиксацию
+    "wal_full": StorageProfile(journal_mode="WAL", synchronous="FULL", cache_size=-2000,
+                               mmap_size=0, temp_store="DEFAULT"),
+    # WAL + NORMAL: fsync только при checkpoint; при сбое питания можно потерять
+    # последние фиксации, но не целостность БД
+    "wal_normal": StorageProfile(journal_mode="WAL", synchronous="NORMAL", cache_size=-2000,
+                                 mmap_size=0, temp_store="DEFAULT"),
+    # WAL + NORMAL с кэшем страниц, mmap и временными таблицами в памяти
+    "tuned": StorageProfile(journal_mode="WAL", synchronous="NORMAL", cache_size=-16384,
+                            mmap_size=256 * 1024 * 1024, temp_store="MEMORY", auto_vacuum="INCREMENTAL"),
+}
+
+
+def connect(db_path: str, profile: Optional[StorageProfile] = None, writer: bool = True,
+            **kwargs) -> sqlite3.Connection:
+    """sqlite3.connect с профилем хранения (для скриптов вне Database)"""
+    profile = profile or StorageProfile.from_config()
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=profile.busy_timeout, **kwargs)
+    profile.apply(conn, writer=writer)
+    return conn
+
@@ -0,0 +1,122 @@
+import logging
+from threading import Thread, Lock, Event
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCounterBuffer:
+    """Накопитель инкрементов requests_used (write-behind).
+
+    Инкременты одного пользователя складываются в памяти и сбрасываются
+    в БД одной транзакцией раз в interval_ms или после max_events событий.
+    Пока запись не сброшена, она учитывается через pending().
+    """
+
+    def __init__(self, flush: Callable[[], None], interval_ms: int = 500, max_events: int = 100):
+        self._flush = flush
+        self.interval = interval_ms / 1000
+        self.max_events = max_events
+
+        self._mutex = Lock()
+        self._pending: Dict[int, int] = {}
+        # Инкременты, которые прямо сейчас записываются в БД
+        self._in_flight: Dict[int, int] = {}
+        self._events = 0
+
+        self._wakeup = Event()
+        self._thread: Optional[Thread] = None
+        self._closed = False
+
+        # Метрики
+        self.flushes = 0
+        self.flushed_events = 0
+        self.flush_errors = 0
+
+    def _start(self):
+        """Ленивый запуск фонового потока сброса"""
+        with self._mutex:
+            if self._thread is not None:
+                return
+            self._thread = Thread(target=self._loop, name="requests-write-behind", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        """Сброс по таймеру или по накоплению max_events событий"""
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._closed:
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сброса счетчиков запросов: {e}")
+
+    def add(self, user_id: int, count: int = 1):
+        """Учесть запрос пользователя"""
+        if self._thread is None:
+            self._start()
+
+        with self._mutex:
+            self._pending[user_id] = self._pending.get(user_id, 0) + count
+            self._events += 1
+            full = self._events >= self.max_events
+
+        if full:
+            self._wakeup.set()
+
+    def pending(self, user_id: int) -> int:
+        """Сколько запросов пользователя еще не отражено в БД"""
+        with self._mutex:
+            return self._pending.get(user_id, 0) + self._in_flight.get(user_id, 0)
+
+    def discard(self, user_id: int):
+        """Забыть несброшенные инкременты (например, после обнуления счетчика)"""
+        with self._mutex:
+            self._pending.pop(user_id, None)
+
+    def take(self) -> Dict[int, int]:
+        """Забрать накопленное для записи (вызывается под блокировкой писателя)"""
+        with self._mutex:
+            self._in_flight, self._pending = self._pending, {}
+            self._events = 0
+            return dict(self._in_flight)
+
+    def done(self, success: bool = True):
+        """Завершение записи: при ошибке инкременты возвращаются в очередь"""
+        with self._mutex:
+            if success:
+                self.flushes += 1
+                self.flushed_events += sum(self._in_flight.values())
+            else:
+                self.flush_errors += 1
+                for user_id, count in self._in_flight.items():
+                    self._pending[user_id] = self._pending.get(user_id, 0) + count
+            self._in_flight = {}
+
+    def flush(self):
+        """Немедленный сброс накопленных инкрементов"""
+        with self._mutex:
+            if not self._pending:
+                return
+        self._flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики накопителя"""
+        with self._mutex:
+            return {
+                'pending_users': len(self._pending),
+                'pending_events': sum(self._pending.values()),
+                'flushes': self.flushes,
+                'flushed_events': self.flushed_events,
+                'flush_errors': self.flush_errors,
+            }
+
+    def close(self):
+        """Остановка фонового потока и финальный сброс"""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
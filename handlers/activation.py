@@ -318,7 +318,9 @@ async def cmd_admin_keys(message: types.Message, command: CommandObject):
             "/admin_keys list <план> [used/all] - Список ключей\n"
             "/admin_keys check <ключ> - Проверить ключ\n"
             "/admin_keys stats - Статистика ключей\n"
-            "/admin_keys user <user_id> - Ключ пользователя"
+            "/admin_keys user <user_id> - Ключ пользователя\n"
+            "/admin_keys reload_plans - Перечитать планы подписки\n"
+            "/admin_keys filter - Фильтр несуществующих ключей"
         )
         await message.answer(help_text)
 
@@ -452,6 +454,32 @@ async def cmd_admin_keys(message: types.Message, command: CommandObject):
 
         await message.answer(stats_text)
 
+    elif args == "reload_plans":
+        await database.reload_subscription_plans()
+        plans = await database.get_all_subscription_plans()
+        await message.answer(
+            f"✅ Планы подписки перечитаны: {', '.join(plan['name'] for plan in plans)}"
+        )
+
+    elif args == "filter":
+        stats = database.key_filter_stats()
+
+        if not stats['ready']:
+            status = "выключен" if not stats['enabled'] else "строится"
+            await message.answer(f"🧮 Фильтр ключей {status}: все ключи проверяются по БД")
+            return
+
+        await message.answer(
+            f"🧮 Фильтр ключей (Блума):\n\n"
+            f"🔑 Ключей: {stats['keys']} из {stats['capacity']}\n"
+            f"💾 Размер: {stats['size_bytes'] / 1024:.1f} КБ, хешей: {stats['hashes']}\n"
+            f"🎯 Ложные срабатывания: {stats['estimated_error_rate']:.4%} "
+            f"(цель {stats['target_error_rate']:.2%})\n"
+            f"⏱️ Построение: {stats['build_time']} сек., дочитываний: {stats['refreshes']}\n"
+            f"🚫 Отсечено без БД: {stats['rejected']}\n"
+            f"✅ Пропущено в БД: {stats['passed']}"
+        )
+
     elif args.startswith("user"):
         try:
             user_id = int(args.split()[1])
@@ -2,6 +2,7 @@ from aiogram import Router, types
 from aiogram.filters import Command, CommandObject
 from datetime import datetime
 from database.db import database
+from utils.metrics import metrics
 
 router = Router()
 
@@ -108,6 +109,8 @@ async def cmd_admin(message: types.Message, command: CommandObject):
             "/admin make_admin <user_id> - Сделать админом\n"
             "/admin admins - Список админов\n"
             "/admin cleanup - Очистка просроченных подписок\n"
+            "/admin metrics [db] - Время обработчиков (или запросов к БД)\n"
+            "/admin requests - Размер журнала запросов и свертка\n"
         )
         await message.answer(admin_help)
 
@@ -168,6 +171,61 @@ async def cmd_admin(message: types.Message, command: CommandObject):
         except IndexError:
             await message.answer("❌ Используйте: /admin search <запрос>")
 
+    elif args.startswith("metrics"):
+        if not metrics.enabled:
+            await message.answer("📭 Метрики отключены (METRICS_ENABLED=0)")
+            return
+
+        if args.split()[-1] == "db":
+            text = (
+                "🗄 Методы БД (полное время):\n\n"
+                f"{format_metrics('db_call_seconds', 'method')}\n\n"
+                "🔒 Ожидание блокировок:\n\n"
+                f"{format_metrics('db_lock_wait_seconds', 'method', limit=5)}"
+            )
+        else:
+            text = f"⏱ Обработчики:\n\n{format_metrics('bot_update_seconds', 'handler')}"
+
+        await message.answer(text)
+
+    elif args.startswith("requests"):
+        stats = await database.get_request_log_stats()
+        text = (
+            "🗂 Журнал запросов:\n\n"
+            f"📝 Записей: {stats['raw_rows']} (за сутки +{stats['raw_last_24h']})\n"
+            f"📅 Самая старая: {stats['raw_oldest'] or '-'}\n"
+            f"📊 Дневных итогов: {stats['daily_rows']} ({stats['daily_requests']} запросов"
+            f" с {stats['daily_oldest'] or '-'})\n"
+            f"💾 Файл БД: {stats['file_bytes'] / 1024 / 1024:.1f} МБ, "
+            f"свободно {stats['free_bytes'] / 1024 / 1024:.1f} МБ (auto_vacuum: {stats['auto_vacuum']})\n"
+        )
+        last = stats['last_compaction']
+        if last:
+            text += (
+                f"\n🧹 Последняя свертка ({last['finished_at']}): {last['compacted']} записей "
+                f"за {last['seconds']:.1f} сек. ({last['rows_per_second']:.0f}/сек.), "
+                f"освобождено {last['vacuumed_bytes'] / 1024 / 1024:.1f} МБ"
+            )
+        else:
+            text += "\n🧹 Свертка в этом процессе еще не выполнялась"
+
+        await message.answer(text)
+
+
+def format_metrics(name: str, label: str, limit: int = 15) -> str:
+    """Самые медленные серии метрики: p50/p99 в миллисекундах"""
+    rows = metrics.summaries(name)[:limit]
+    if not rows:
+        return "📭 Данных пока нет"
+
+    lines = []
+    for row in rows:
+        lines.append(
+            f"{row[label]}: {row['count']} шт., "
+            f"p50 {row['p50'] * 1000:.1f} / p99 {row['p99'] * 1000:.1f} мс"
+        )
+    return "\n".join(lines)
+
 
 @router.message(Command("help"))
 async def cmd_help(message: types.Message):
@@ -190,6 +248,7 @@ async def cmd_help(message: types.Message):
     /links - Меню ссылок
     /my_links - Просмотр ссылок
     /link <id> - Действия с ссылкой
+    /export [txt|csv|json|html] - Экспорт ссылок
 
     💎 Особенности:
     • Уникальные ключи активации для каждого пользователя
@@ -5,7 +5,8 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import ReplyKeyboardRemove, CallbackQuery
 from database.db import database
 from keyboards.reply import get_links_menu_keyboard, get_categories_keyboard
-from keyboards.inline import get_link_actions_keyboard
+from keyboards.inline import get_link_actions_keyboard, get_links_page_keyboard
+from utils.link_export import EXPORT_FORMATS, build_links_export
 
 router = Router()
 
@@ -205,10 +206,10 @@ async def show_my_links(message: types.Message):
         await message.answer("❌ Нет доступа. Активируйте ключ через /activate")
         return
 
-    # Получаем категории
-    categories = await database.get_link_categories(message.from_user.id)
+    # Получаем категории вместе с количеством ссылок
+    stats = await database.get_user_link_stats(message.from_user.id, recent_limit=0)
 
-    if not categories:
+    if not stats['categories']:
         await message.answer(
             "📭 У вас пока нет сохраненных ссылок.\n\n"
             "📥 Используйте 'Добавить ссылку' для начала."
@@ -217,9 +218,8 @@ async def show_my_links(message: types.Message):
 
     # Показываем категории
     categories_text = "📁 Ваши категории ссылок:\n\n"
-    for i, category in enumerate(categories, 1):
-        count = await database.get_user_link_count(message.from_user.id, category)
-        categories_text += f"{i}. {category} - {count} ссылок\n"
+    for i, category in enumerate(stats['categories'], 1):
+        categories_text += f"{i}. {category['category']} - {category['count']} ссылок\n"
 
     categories_text += "\n🔍 Для просмотра ссылок в категории отправьте её название."
 
@@ -288,6 +288,83 @@ async def process_search_links(message: types.Message, state: FSMContext):
     await state.clear()
 
 
+# Telegram ограничивает callback_data 64 байтами
+CALLBACK_DATA_LIMIT = 64
+LINKS_PAGE_SIZE = 10
+
+
+async def render_links_page(user_id: int, category: str = None, page: int = 1,
+                            before_id: int = None, after_id: int = None):
+    """Текст страницы ссылок и клавиатура навигации (None, если ссылок нет)"""
+    limit = LINKS_PAGE_SIZE
+
+    # Берем на одну ссылку больше, чтобы узнать, есть ли следующая страница
+    links = await database.get_user_links(
+        user_id=user_id,
+        category=category,
+        limit=limit + 1,
+        offset=(page - 1) * limit if before_id is None and after_id is None else 0,
+        before_id=before_id,
+        after_id=after_id
+    )
+
+    if after_id is not None:
+        has_prev = len(links) > limit
+        has_next = True
+        links = links[-limit:]
+    else:
+        has_prev = before_id is not None or page > 1
+        has_next = len(links) > limit
+        links = links[:limit]
+
+    if not links:
+        return None, None
+
+    total_count = await database.get_user_link_count(user_id, category)
+
+    if category:
+        header = f"📁 Ссылки в категории '{category}':\n\n"
+    else:
+        header = f"🔗 Все ваши ссылки:\n\n"
+
+    links_text = header
+
+    for link in links:
+        title = link['title'] or 'Без названия'
+        links_text += f"• {title}\n"
+        links_text += f"   🔗 {link['url']}\n"
+        if link['description']:
+            desc = link['description']
+            links_text += f"   📄 {desc[:50]}...\n" if len(desc) > 50 else f"   📄 {desc}\n"
+        links_text += f"   📁 {link['category']} | 🆔 {link['id']}\n\n"
+
+    links_text += f"📊 Всего: {total_count} ссылок\n"
+
+    first_id, last_id = links[0]['id'], links[-1]['id']
+    if len(f"links_page:>{last_id}:{category or ''}".encode()) <= CALLBACK_DATA_LIMIT:
+        keyboard = get_links_page_keyboard(category, first_id, last_id, has_prev, has_next)
+    else:
+        # Слишком длинная категория для callback_data - навигация командами
+        keyboard = None
+        navigation = ""
+        if has_prev:
+            navigation += f"⬅️ /my_links {category} <{first_id} "
+        if has_next:
+            navigation += f"➡️ /my_links {category} >{last_id}"
+        if navigation:
+            links_text += f"\n📑 Навигация: {navigation}"
+
+    return links_text, keyboard
+
+
+def parse_links_cursor(token: str):
+    """Курсор вида >id (старше ссылки id) или <id (новее): (before_id, after_id)"""
+    if len(token) > 1 and token[0] in "<>" and token[1:].isdigit():
+        link_id = int(token[1:])
+        return (link_id, None) if token[0] == ">" else (None, link_id)
+    return None
+
+
 @router.message(Command("my_links"))
 async def cmd_my_links(message: types.Message, command: CommandObject = None):
     """Просмотр ссылок пользователя с пагинацией"""
@@ -297,31 +374,27 @@ async def cmd_my_links(message: types.Message, command: CommandObject = None):
         await message.answer("❌ Нет доступа. Активируйте ключ через /activate")
         return
 
-    # Парсим аргументы
+    # Парсим аргументы: /my_links [категория] [страница | >id | <id]
     args = command.args if command else None
     category = None
     page = 1
+    before_id = after_id = None
 
     if args:
-        parts = args.split()
-        if parts:
-            category = parts[0]
-            if len(parts) > 1 and parts[1].isdigit():
-                page = int(parts[1])
-
-    # Определяем лимит и смещение
-    limit = 10
-    offset = (page - 1) * limit
-
-    # Получаем ссылки
-    links = await database.get_user_links(
-        user_id=message.from_user.id,
-        category=category,
-        limit=limit,
-        offset=offset
+        for part in args.split():
+            cursor = parse_links_cursor(part)
+            if cursor:
+                before_id, after_id = cursor
+            elif part.isdigit():
+                page = max(int(part), 1)
+            elif category is None:
+                category = part
+
+    links_text, keyboard = await render_links_page(
+        message.from_user.id, category, page, before_id, after_id
     )
 
-    if not links:
+    if not links_text:
         if category:
             await message.answer(f"📭 В категории '{category}' нет ссылок.")
         else:
@@ -331,39 +404,55 @@ async def cmd_my_links(message: types.Message, command: CommandObject = None):
             )
         return
 
-    # Формируем сообщение
-    total_count = await database.get_user_link_count(message.from_user.id, category)
-    total_pages = (total_count + limit - 1) // limit
+    await message.answer(links_text, reply_markup=keyboard)
 
-    if category:
-        header = f"📁 Ссылки в категории '{category}' (стр. {page}/{total_pages}):\n\n"
-    else:
-        header = f"🔗 Все ваши ссылки (стр. {page}/{total_pages}):\n\n"
 
-    links_text = header
+@router.callback_query(F.data.startswith("links_page:"))
+async def callback_links_page(callback: CallbackQuery):
+    """Переход на соседнюю страницу ссылок"""
+    token, _, category = callback.data[len("links_page:"):].partition(":")
+    cursor = parse_links_cursor(token)
+    if not cursor:
+        await callback.answer("❌ Ошибка: неверная страница")
+        return
 
-    for i, link in enumerate(links, offset + 1):
-        title = link['title'] or 'Без названия'
-        links_text += f"{i}. {title}\n"
-        links_text += f"   🔗 {link['url']}\n"
-        if link['description']:
-            desc = link['description']
-            links_text += f"   📄 {desc[:50]}...\n" if len(desc) > 50 else f"   📄 {desc}\n"
-        links_text += f"   📁 {link['category']} | 🆔 {link['id']}\n\n"
+    before_id, after_id = cursor
+    links_text, keyboard = await render_links_page(
+        callback.from_user.id, category or None, before_id=before_id, after_id=after_id
+    )
 
-    links_text += f"📊 Всего: {total_count} ссылок\n"
+    if not links_text:
+        await callback.answer("📭 Больше ссылок нет")
+        return
+
+    await callback.message.edit_text(links_text, reply_markup=keyboard)
+    await callback.answer()
 
-    # Добавляем навигацию
-    navigation = ""
-    if page > 1:
-        navigation += f"⬅️ /my_links {category if category else ''} {page - 1} "
-    if page < total_pages:
-        navigation += f"➡️ /my_links {category if category else ''} {page + 1}"
 
-    if navigation:
-        links_text += f"\n📑 Навигация: {navigation}"
+@router.callback_query(F.data == "show_all_links")
+async def callback_show_all_links(callback: CallbackQuery):
+    """Первая страница всех ссылок"""
+    links_text, keyboard = await render_links_page(callback.from_user.id)
+
+    if not links_text:
+        await callback.answer("📭 У вас пока нет сохраненных ссылок")
+        return
+
+    await callback.message.answer(links_text, reply_markup=keyboard)
+    await callback.answer()
 
-    await message.answer(links_text)
+
+def format_link_info(link: dict) -> str:
+    """Карточка ссылки для /link"""
+    link_info = f"🔗 Ссылка #{link['id']}\n\n"
+    link_info += f"📝 Заголовок: {link['title'] or 'Не указан'}\n"
+    link_info += f"🌐 URL: {link['url']}\n"
+    if link['description']:
+        link_info += f"📄 Описание: {link['description']}\n"
+    link_info += f"📁 Категория: {link['category']}\n"
+    link_info += f"📅 Добавлена: {link['created_at'][:10]}\n"
+    link_info += f"✅ Статус: {'Активна' if link['is_active'] else 'Неактивна'}"
+    return link_info
 
 
 @router.message(Command("link"))
@@ -380,33 +469,20 @@ async def cmd_link_actions(message: types.Message, command: CommandObject):
 
     try:
         link_id = int(command.args.split()[0])
-
-        # Получаем информацию о ссылке
-        # Для простоты получим все и отфильтруем
-        all_links = await database.get_user_links(message.from_user.id, limit=100)
-        link = next((l for l in all_links if l['id'] == link_id), None)
-
-        if not link:
-            await message.answer(f"❌ Ссылка с ID {link_id} не найдена.")
-            return
-
-        # Формируем информацию о ссылке
-        link_info = f"🔗 Ссылка #{link_id}\n\n"
-        link_info += f"📝 Заголовок: {link['title'] or 'Не указан'}\n"
-        link_info += f"🌐 URL: {link['url']}\n"
-        if link['description']:
-            link_info += f"📄 Описание: {link['description']}\n"
-        link_info += f"📁 Категория: {link['category']}\n"
-        link_info += f"📅 Добавлена: {link['created_at'][:10]}\n"
-        link_info += f"✅ Статус: {'Активна' if link['is_active'] else 'Неактивна'}"
-
-        await message.answer(
-            link_info,
-            reply_markup=get_link_actions_keyboard(link_id)
-        )
-
     except ValueError:
         await message.answer("❌ Неверный ID. ID должен быть числом.")
+        return
+
+    # Получаем ссылку по первичному ключу
+    link = await database.get_user_link(link_id, message.from_user.id)
+    if not link:
+        await message.answer(f"❌ Ссылка с ID {link_id} не найдена.")
+        return
+
+    await message.answer(
+        format_link_info(link),
+        reply_markup=get_link_actions_keyboard(link_id)
+    )
 
 
 @router.message(F.text == "📊 Статистика ссылок")
@@ -418,9 +494,10 @@ async def show_links_stats(message: types.Message):
         await message.answer("❌ Нет доступа. Активируйте ключ через /activate")
         return
 
-    # Получаем категории и количество ссылок в каждой
-    categories = await database.get_link_categories(message.from_user.id)
-    total_count = await database.get_user_link_count(message.from_user.id)
+    # Получаем количество ссылок по категориям и последние ссылки одним запросом
+    stats = await database.get_user_link_stats(message.from_user.id, recent_limit=3)
+    categories = stats['categories']
+    total_count = stats['total']
 
     if total_count == 0:
         await message.answer("📊 У вас пока нет сохраненных ссылок.")
@@ -432,12 +509,11 @@ async def show_links_stats(message: types.Message):
     if categories:
         stats_text += "📁 Распределение по категориям:\n"
         for category in categories:
-            count = await database.get_user_link_count(message.from_user.id, category)
-            percentage = (count / total_count) * 100
-            stats_text += f"• {category}: {count} ({percentage:.1f}%)\n"
+            percentage = (category['count'] / total_count) * 100
+            stats_text += f"• {category['category']}: {category['count']} ({percentage:.1f}%)\n"
 
-    # Получаем последние добавленные ссылки
-    recent_links = await database.get_user_links(message.from_user.id, limit=3)
+    # Последние добавленные ссылки
+    recent_links = stats['recent']
 
     if recent_links:
         stats_text += "\n📅 Последние добавленные:\n"
@@ -448,50 +524,52 @@ async def show_links_stats(message: types.Message):
     await message.answer(stats_text)
 
 
-@router.message(F.text == "📤 Экспорт ссылок")
-async def export_links(message: types.Message):
-    """Экспорт ссылок в текстовый формат"""
+async def send_links_export(message: types.Message, fmt: str):
+    """Выгрузка ссылок файлом в выбранном формате"""
     # Проверяем доступ
     access_check = await database.check_user_access(message.from_user.id)
     if not access_check['has_access']:
         await message.answer("❌ Нет доступа. Активируйте ключ через /activate")
         return
 
-    # Получаем все ссылки
-    links = await database.get_user_links(message.from_user.id, limit=1000)
+    # Файл собирается пачками в памяти (большой - во временном файле) и не остается на диске
+    export_file, count = await build_links_export(
+        database, message.from_user.id, message.from_user.full_name, fmt
+    )
 
-    if not links:
+    if not export_file:
         await message.answer("📭 Нет ссылок для экспорта.")
         return
 
-    # Формируем текстовый файл
-    import datetime
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"links_export_{timestamp}.txt"
+    try:
+        await message.answer_document(
+            export_file,
+            caption=f"📤 Экспорт ссылок ({count} шт.)"
+        )
+    finally:
+        # Если отправка сорвалась до чтения файла, он закрывается здесь
+        export_file.close()
 
-    export_text = f"Экспорт ссылок пользователя {message.from_user.full_name}\n"
-    export_text += f"Дата экспорта: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-    export_text += f"Всего ссылок: {len(links)}\n"
-    export_text += "=" * 50 + "\n\n"
 
-    for i, link in enumerate(links, 1):
-        export_text += f"{i}. {link['title'] or 'Без названия'}\n"
-        export_text += f"   URL: {link['url']}\n"
-        if link['description']:
-            export_text += f"   Описание: {link['description']}\n"
-        export_text += f"   Категория: {link['category']}\n"
-        export_text += f"   Добавлена: {link['created_at']}\n"
-        export_text += "\n"
-
-    # Сохраняем в файл
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write(export_text)
-
-    # Отправляем файл пользователю
-    await message.answer_document(
-        types.FSInputFile(filename),
-        caption=f"📤 Экспорт ссылок ({len(links)} шт.)"
-    )
+@router.message(F.text == "📤 Экспорт ссылок")
+async def export_links(message: types.Message):
+    """Экспорт ссылок в текстовый формат"""
+    await send_links_export(message, "txt")
+
+
+@router.message(Command("export"))
+async def cmd_export_links(message: types.Message, command: CommandObject = None):
+    """Экспорт ссылок: /export [txt|csv|json|html]"""
+    fmt = (command.args or "txt").strip().lower() if command else "txt"
+    if fmt not in EXPORT_FORMATS:
+        await message.answer(
+            "📤 Экспорт ссылок:\n\n"
+            f"Используйте: /export <{'|'.join(EXPORT_FORMATS)}>\n"
+            "html - закладки для импорта в браузер"
+        )
+        return
+
+    await send_links_export(message, fmt)
 
 
 @router.message(F.text == "🏠 Главное меню")
@@ -511,6 +589,11 @@ async def callback_edit_link(callback: CallbackQuery, state: FSMContext):
     """Редактирование ссылки"""
     try:
         link_id = int(callback.data.replace("edit_link_", ""))
+        link = await database.get_user_link(link_id, callback.from_user.id)
+        if not link:
+            await callback.answer("❌ Ссылка не найдена")
+            return
+
         await callback.message.answer(
             f"✏️ Редактирование ссылки #{link_id}\n\n"
             f"Введите новые данные в формате:\n"
@@ -531,6 +614,12 @@ async def callback_delete_link(callback: CallbackQuery):
     """Удаление ссылки"""
     try:
         link_id = int(callback.data.replace("delete_link_", ""))
+        link = await database.get_user_link(link_id, callback.from_user.id)
+        if not link:
+            # Уже удалена (повторное нажатие) или чужая
+            await callback.answer("❌ Ссылка не найдена")
+            return
+
         success = await database.delete_user_link(link_id, callback.from_user.id)
 
         if success:
@@ -7,10 +7,12 @@ async def init_db():
     """Инициализация базы данных"""
     db = Database()
     await db.create_tables()
+    await db.run_online_builds()
+    await db.close()
     print("✅ База данных успешно создана!")
 
     # Проверим созданные таблицы
-    conn = sqlite3.connect("database/data/database.db")
+    conn = sqlite3.connect(db.db_path)
     cursor = conn.cursor()
 
     # Получим список всех таблиц
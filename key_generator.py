@@ -1,137 +1,55 @@
+import os
+import signal
 import sqlite3
-import secrets
-import string
-import hashlib
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from database.keys import generate_key_codes, insert_keys, key_digest
+from database.plans import PlanCatalog
+from database.schema import migrate
+from database.storage import connect
+
+# Справочники планов по пути к БД: планы читаются один раз за запуск
+_plan_catalogs: Dict[str, PlanCatalog] = {}
 
 
 def create_tables_if_not_exist(db_path: str = "data/database.db"):
-    """Создание таблиц если их нет"""
+    """Создание/обновление схемы; на актуальной схеме - одно чтение user_version"""
     # Создаем папку если ее нет
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Таблица подписок (планов)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subscription_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT,
-            price REAL DEFAULT 0,
-            max_requests INTEGER DEFAULT 100,
-            duration_days INTEGER DEFAULT 30,
-            max_activation_keys INTEGER DEFAULT 1,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Таблица ключей активации - ПРАВИЛЬНАЯ СТРУКТУРА
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activation_keys (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            key_hash TEXT UNIQUE NOT NULL,
-            plan_id INTEGER NOT NULL,
-            key_code TEXT UNIQUE NOT NULL,
-            is_used BOOLEAN DEFAULT 0,
-            used_by_user_id INTEGER,
-            used_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP,
-            FOREIGN KEY (plan_id) REFERENCES subscription_plans (id)
-        )
-    ''')
-
-    # Таблица пользователей (минимальная версия для генератора ключей)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE NOT NULL,
-            username TEXT,
-            full_name TEXT NOT NULL,
-            subscription_plan_id INTEGER DEFAULT 1,
-            activation_key_id INTEGER,
-            requests_used INTEGER DEFAULT 0,
-            requests_limit INTEGER DEFAULT 100,
-            subscription_start DATE,
-            subscription_end DATE,
-            is_active BOOLEAN DEFAULT 1,
-            is_admin BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (subscription_plan_id) REFERENCES subscription_plans (id),
-            FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
-        )
-    ''')
-
-    # Проверяем наличие колонки expires_at
-    cursor.execute("PRAGMA table_info(activation_keys)")
-    columns = [col[1] for col in cursor.fetchall()]
+    conn = connect(db_path)
+    migrate(conn)
+    conn.close()
 
-    if 'expires_at' not in columns:
-        print("➕ Добавляем колонку expires_at в таблицу activation_keys")
-        cursor.execute('''
-            ALTER TABLE activation_keys 
-            ADD COLUMN expires_at TIMESTAMP
-        ''')
 
-    # Проверяем наличие колонки max_activation_keys в subscription_plans
-    cursor.execute("PRAGMA table_info(subscription_plans)")
-    columns = [col[1] for col in cursor.fetchall()]
-
-    if 'max_activation_keys' not in columns:
-        print("➕ Добавляем колонку max_activation_keys в таблицу subscription_plans")
-        cursor.execute('''
-            ALTER TABLE subscription_plans 
-            ADD COLUMN max_activation_keys INTEGER DEFAULT 1
-        ''')
-
-    # Создаем стандартные планы если их нет
-    default_plans = [
-        ('FREE', 'Бесплатный план', 0, 50, 30, 0),
-        ('BASIC', 'Базовый план', 10, 500, 30, 1),
-        ('PRO', 'Профессиональный план', 25, 2000, 30, 3),
-        ('PREMIUM', 'Премиум план', 50, 10000, 30, 5),
-        ('ENTERPRISE', 'Корпоративный план', 200, 50000, 30, 10)
-    ]
-
-    for plan in default_plans:
-        cursor.execute('''
-            INSERT OR IGNORE INTO subscription_plans 
-            (name, description, price, max_requests, duration_days, max_activation_keys) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', plan)
-
-    conn.commit()
-    conn.close()
-    print("✅ Таблицы созданы/проверены")
+def get_plan_catalog(db_path: str = "data/database.db", refresh: bool = False) -> PlanCatalog:
+    """Справочник планов подписки для БД"""
+    if refresh or db_path not in _plan_catalogs:
+        conn = connect(db_path, writer=False)
+        _plan_catalogs[db_path] = PlanCatalog.from_connection(conn)
+        conn.close()
+    return _plan_catalogs[db_path]
 
 
 def get_plan_id_by_name(plan_name: str, db_path: str = "data/database.db") -> int:
     """Получение ID плана по имени"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT id FROM subscription_plans WHERE name = ?",
-        (plan_name.upper(),)
-    )
+    plan = get_plan_catalog(db_path).by_name(plan_name)
 
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        return result[0]
+    if plan:
+        return plan.id
     else:
         # Возвращаем ID BASIC плана по умолчанию
         return 2  # BASIC
 
 
 def generate_key(plan_name: str = "BASIC", quantity: int = 1,
-                 expires_in_days: int = 365, db_path: str = "data/database.db") -> list:
+                 expires_in_days: int = 365, db_path: str = "data/database.db",
+                 quiet: bool = False) -> list:
     """Генерация ключей активации"""
 
     # Создаем таблицы если их нет
@@ -140,66 +58,213 @@ def generate_key(plan_name: str = "BASIC", quantity: int = 1,
     # Получаем ID плана
     plan_id = get_plan_id_by_name(plan_name, db_path)
 
-    # Алфавит для генерации ключей (без похожих символов)
-    alphabet = string.ascii_uppercase + string.digits
-    alphabet = alphabet.replace('0', '').replace('O', '').replace('1', '').replace('I', '').replace('L', '')
+    # Устанавливаем срок действия (может быть None для бессрочных)
+    expires_at = None
+    if expires_in_days > 0:
+        expires_at = datetime.now() + timedelta(days=expires_in_days)
+
+    conn = connect(db_path)
+    # Больше кэша страниц - меньше вытеснений индексов при большой партии
+    conn.execute("PRAGMA cache_size = -65536")
+
+    # Ключи генерируются из одного блока случайных байт и пишутся пачками в одной транзакции
+    started = time.perf_counter()
+    generated_keys = insert_keys(conn, plan_id, quantity, expires_at)
+    conn.commit()
+    conn.close()
+    elapsed = time.perf_counter() - started
+
+    if not quiet:
+        for i, key_code in enumerate(generated_keys, 1):
+            print(f"✅ Сгенерирован ключ #{i}: {key_code} (план: {plan_name})")
+
+    rate = len(generated_keys) / elapsed if elapsed > 0 else float("inf")
+    print(f"⚡ Сгенерировано {len(generated_keys)} ключей за {elapsed:.2f} сек. ({rate:,.0f} ключей/сек)")
+
+    # Информация о плане
+    plan = get_plan_catalog(db_path).by_id(plan_id)
+    plan_info = (plan.name, plan.max_requests, plan.duration_days, plan.price) if plan else None
+
+    return generated_keys, plan_info
+
+
+def _ignore_sigint():
+    """Ctrl+C обрабатывает только главный процесс mint"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
 
-    conn = sqlite3.connect(db_path)
+
+def _mint_chunk(size: int) -> List[Tuple[bytes, str]]:
+    """Рабочий процесс mint: пачка ключей с хешами, отсортированная по хешу"""
+    return sorted((key_digest(key_code), key_code) for key_code in generate_key_codes(size))
+
+
+def _truncate_output(output_path: str, lines: int):
+    """Обрезка файла задания до lines выпущенных ключей.
+
+    Пачка пишется в файл до фиксации в БД, поэтому после сбоя в конце файла
+    может остаться пачка (или ее часть), которой нет в БД.
+    """
+    if not os.path.exists(output_path):
+        if lines:
+            print(f"⚠️ Файл задания {output_path} не найден: {lines} выпущенных ключей в нем нет")
+        return
+
+    with open(output_path, 'rb+') as out:
+        offset = 0
+        kept = 0
+        for line in out:
+            if kept >= lines or not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            kept += 1
+
+        if kept < lines:
+            print(f"⚠️ В файле {output_path} {kept} ключей из {lines} выпущенных")
+        out.seek(0, os.SEEK_END)
+        if out.tell() > offset:
+            out.truncate(offset)
+            print(f"✂️ Из файла {output_path} удалены ключи незафиксированной пачки")
+
+
+def mint_keys(plan_name: str = "BASIC", quantity: int = 0, expires_in_days: int = 365,
+              db_path: str = "data/database.db", workers: int = None,
+              chunk_size: int = 20000, resume_job_id: int = None) -> Optional[int]:
+    """Массовый выпуск ключей: генерация и хеширование в пуле процессов, запись одним писателем.
+
+    Каждая пачка пишется отдельной короткой транзакцией вместе с прогрессом
+    задания в key_mint_jobs, поэтому бот может писать в БД между пачками,
+    а прерванный выпуск продолжается с --resume <id> без потерь и дублей.
+    Пачка попадает в файл задания (с fsync) до фиксации в БД: выпущенный ключ
+    всегда есть в файле, а лишний хвост незафиксированной пачки обрезается при продолжении.
+    """
+    create_tables_if_not_exist(db_path)
+
+    # busy_timeout профиля - ожидание, пока бот освободит блокировку записи
+    conn = connect(db_path)
+    conn.execute("PRAGMA cache_size = -65536")
     cursor = conn.cursor()
 
-    generated_keys = []
-
-    for i in range(quantity):
-        # Пробуем сгенерировать уникальный ключ
-        for attempt in range(10):  # 10 попыток
-            # Генерируем ключ формата XXXX-XXXX-XXXX-XXXX
-            key_parts = []
-            for _ in range(4):
-                key_parts.append(''.join(secrets.choice(alphabet) for _ in range(4)))
-            key_code = '-'.join(key_parts)
-
-            # Хешируем для хранения
-            key_hash = hashlib.sha256(key_code.encode()).hexdigest()
-
-            # Устанавливаем срок действия (может быть None для бессрочных)
-            expires_at = None
-            if expires_in_days > 0:
-                expires_at = datetime.now() + timedelta(days=expires_in_days)
-
-            try:
-                cursor.execute('''
-                    INSERT INTO activation_keys 
-                    (key_hash, plan_id, key_code, expires_at) 
-                    VALUES (?, ?, ?, ?)
-                ''', (key_hash, plan_id, key_code, expires_at))
-
-                generated_keys.append(key_code)
-                print(f"✅ Сгенерирован ключ #{i + 1}: {key_code} (план: {plan_name})")
-                break  # Успешно, выходим из попыток
-
-            except sqlite3.IntegrityError as e:
-                if attempt == 9:  # Последняя попытка
-                    print(f"❌ Не удалось сгенерировать уникальный ключ после 10 попыток: {e}")
-                continue  # Пробуем снова
+    if resume_job_id is not None:
+        cursor.execute(
+            "SELECT plan_id, quantity, minted, expires_at, output_path, status FROM key_mint_jobs WHERE id = ?",
+            (resume_job_id,)
+        )
+        job = cursor.fetchone()
+        if not job:
+            print(f"❌ Задание #{resume_job_id} не найдено")
+            conn.close()
+            return None
+
+        plan_id, quantity, minted, expires_at, output_path, status = job
+        job_id = resume_job_id
+        if status == 'done' or minted >= quantity:
+            print(f"✅ Задание #{job_id} уже завершено: {minted}/{quantity} ключей, файл {output_path}")
+            conn.close()
+            return job_id
+        print(f"🔄 Продолжаем задание #{job_id}: выпущено {minted}/{quantity}")
+        _truncate_output(output_path, minted)
+    else:
+        if quantity <= 0:
+            print("❌ Укажите количество ключей: --quantity N")
+            conn.close()
+            return None
+
+        plan_id = get_plan_id_by_name(plan_name, db_path)
+        expires_at = None
+        if expires_in_days > 0:
+            expires_at = (datetime.now() + timedelta(days=expires_in_days)).isoformat(' ')
+        minted = 0
+        output_path = f"keys_{plan_name.upper()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
 
-    conn.commit()
+        cursor.execute('''
+            INSERT INTO key_mint_jobs (plan_id, quantity, expires_at, output_path)
+            VALUES (?, ?, ?, ?)
+        ''', (plan_id, quantity, expires_at, output_path))
+        job_id = cursor.lastrowid
+        conn.commit()
+        print(f"🏭 Задание #{job_id}: {quantity} ключей, файл {output_path}")
+
+    started = time.perf_counter()
+    session_minted = 0
+    remaining = quantity - minted
+    collisions = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint) as pool, open(output_path, 'a', encoding='utf-8') as out:
+        # Не больше двух пачек на процесс в очереди - память не растет с размером задания
+        max_in_flight = (workers or os.cpu_count() or 1) * 2
+        in_flight = deque()
+        scheduled = 0
+
+        def schedule():
+            nonlocal scheduled
+            while len(in_flight) < max_in_flight and scheduled < remaining:
+                size = min(chunk_size, remaining - scheduled)
+                in_flight.append((size, pool.submit(_mint_chunk, size)))
+                scheduled += size
+
+        try:
+            schedule()
+            while in_flight:
+                size, future = in_flight.popleft()
+                rows = future.result()
+
+                try:
+                    cursor.execute("BEGIN IMMEDIATE")
+                    cursor.executemany('''
+                        INSERT INTO activation_keys (key_digest, plan_id, key_code, expires_at)
+                        VALUES (?, ?, ?, ?)
+                    ''', ((digest, plan_id, key_code, expires_at) for digest, key_code in rows))
+                    cursor.execute('''
+                        UPDATE key_mint_jobs
+                        SET minted = minted + ?, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (len(rows), job_id))
+                except sqlite3.IntegrityError:
+                    # Совпадение с существующим ключом - пачка генерируется заново
+                    conn.rollback()
+                    collisions += 1
+                    if collisions >= 10:
+                        raise
+                    in_flight.append((size, pool.submit(_mint_chunk, size)))
+                    continue
+
+                # Сначала файл, потом фиксация: ключ, принятый БД, не может пропасть из файла
+                out.writelines(f"{key_code}\n" for _, key_code in rows)
+                out.flush()
+                os.fsync(out.fileno())
+                conn.commit()
+                session_minted += len(rows)
+
+                elapsed = time.perf_counter() - started
+                print(f"⏳ {minted + session_minted}/{quantity} "
+                      f"({session_minted / elapsed:,.0f} ключей/сек)", end="\r", flush=True)
+                schedule()
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"\n⏸️ Прервано: выпущено {minted + session_minted}/{quantity}. "
+                  f"Продолжить: python key_generator.py mint --resume {job_id}")
+            conn.close()
+            return job_id
 
-    # Получаем информацию о плане
     cursor.execute(
-        "SELECT name, max_requests, duration_days, price FROM subscription_plans WHERE id = ?",
-        (plan_id,)
+        "UPDATE key_mint_jobs SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (job_id,)
     )
-    plan_info = cursor.fetchone()
-
+    conn.commit()
     conn.close()
 
-    return generated_keys, plan_info
+    elapsed = time.perf_counter() - started
+    rate = session_minted / elapsed if elapsed > 0 else float("inf")
+    print(f"\n🎉 Задание #{job_id} завершено: {quantity} ключей, "
+          f"{session_minted} за {elapsed:.1f} сек. ({rate:,.0f} ключей/сек)")
+    print(f"💾 Ключи сохранены в файл: {output_path}")
+    return job_id
 
 
 def list_keys(plan_name: str = None, show_used: bool = False,
               limit: int = 20, db_path: str = "data/database.db"):
     """Просмотр сгенерированных ключей"""
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, writer=False)
     cursor = conn.cursor()
 
     query = '''
@@ -244,7 +309,7 @@ def list_keys(plan_name: str = None, show_used: bool = False,
 
 def get_key_stats(db_path: str = "data/database.db"):
     """Статистика ключей"""
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path, writer=False)
     cursor = conn.cursor()
 
     # Общая статистика
@@ -293,81 +358,9 @@ def recreate_database(db_path: str = "data/database.db"):
     # Создаем папку если ее нет
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
     print("🔄 Создаем новую базу данных...")
-
-    # Таблица подписок (планов)
-    cursor.execute('''
-        CREATE TABLE subscription_plans (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT,
-            price REAL DEFAULT 0,
-            max_requests INTEGER DEFAULT 100,
-            duration_days INTEGER DEFAULT 30,
-            max_activation_keys INTEGER DEFAULT 1,
-            is_active BOOLEAN DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Таблица ключей активации - ПРАВИЛЬНАЯ СТРУКТУРА
-    cursor.execute('''
-        CREATE TABLE activation_keys (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            key_hash TEXT UNIQUE NOT NULL,
-            plan_id INTEGER NOT NULL,
-            key_code TEXT UNIQUE NOT NULL,
-            is_used BOOLEAN DEFAULT 0,
-            used_by_user_id INTEGER,
-            used_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP,
-            FOREIGN KEY (plan_id) REFERENCES subscription_plans (id)
-        )
-    ''')
-
-    # Основная таблица пользователей
-    cursor.execute('''
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE NOT NULL,
-            username TEXT,
-            full_name TEXT NOT NULL,
-            subscription_plan_id INTEGER DEFAULT 1,
-            activation_key_id INTEGER,
-            requests_used INTEGER DEFAULT 0,
-            requests_limit INTEGER DEFAULT 100,
-            subscription_start DATE,
-            subscription_end DATE,
-            is_active BOOLEAN DEFAULT 1,
-            is_admin BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (subscription_plan_id) REFERENCES subscription_plans (id),
-            FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
-        )
-    ''')
-
-    # Создаем стандартные планы подписки
-    default_plans = [
-        ('FREE', 'Бесплатный план', 0, 50, 30, 0),
-        ('BASIC', 'Базовый план', 10, 500, 30, 1),
-        ('PRO', 'Профессиональный план', 25, 2000, 30, 3),
-        ('PREMIUM', 'Премиум план', 50, 10000, 30, 5),
-        ('ENTERPRISE', 'Корпоративный план', 200, 50000, 30, 10)
-    ]
-
-    for plan in default_plans:
-        cursor.execute('''
-            INSERT INTO subscription_plans 
-            (name, description, price, max_requests, duration_days, max_activation_keys) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', plan)
-
-    conn.commit()
+    conn = connect(db_path)
+    migrate(conn)
     conn.close()
 
     print("✅ Новая база данных успешно создана!")
@@ -378,8 +371,9 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Генератор ключей активации")
-    parser.add_argument("action", choices=["generate", "list", "stats", "recreate"],
-                        help="Действие: generate - создать ключи, list - список, stats - статистика, recreate - пересоздать базу")
+    parser.add_argument("action", choices=["generate", "mint", "list", "stats", "recreate"],
+                        help="Действие: generate - создать ключи, mint - массовый выпуск в несколько процессов, "
+                             "list - список, stats - статистика, recreate - пересоздать базу")
     parser.add_argument("--plan", default="BASIC",
                         help="Название плана (FREE, BASIC, PRO, PREMIUM, ENTERPRISE)")
     parser.add_argument("--quantity", type=int, default=1,
@@ -390,6 +384,14 @@ if __name__ == "__main__":
                         help="Показывать использованные ключи (только для list)")
     parser.add_argument("--limit", type=int, default=20,
                         help="Лимит для списка ключей")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Процессов генерации для mint (по умолчанию - число ядер)")
+    parser.add_argument("--chunk", type=int, default=20000,
+                        help="Ключей в одной транзакции для mint")
+    parser.add_argument("--resume", type=int, default=None,
+                        help="ID прерванного задания mint для продолжения")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Не выводить ключи в консоль (для больших партий, только для generate)")
 
     args = parser.parse_args()
 
@@ -403,7 +405,8 @@ if __name__ == "__main__":
         keys, plan_info = generate_key(
             plan_name=args.plan,
             quantity=args.quantity,
-            expires_in_days=args.expires
+            expires_in_days=args.expires,
+            quiet=args.quiet
         )
 
         if keys:
@@ -413,9 +416,10 @@ if __name__ == "__main__":
             print(f"📅 Длительность: {plan_info[2]} дней")
             print(f"💰 Цена: {plan_info[3]}$")
             print(f"📅 Срок действия ключей: {args.expires if args.expires > 0 else 'бессрочно'} дней")
-            print("\n🔑 Ключи:")
-            for key in keys:
-                print(f"  {key}")
+            if not args.quiet:
+                print("\n🔑 Ключи:")
+                for key in keys:
+                    print(f"  {key}")
 
             # Сохраняем ключи в файл
             if keys:
@@ -428,10 +432,19 @@ if __name__ == "__main__":
                     f.write(f"Срок действия: {args.expires if args.expires > 0 else 'бессрочно'} дней\n")
                     f.write(f"Дата генерации: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                     f.write("=" * 40 + "\n")
-                    for key in keys:
-                        f.write(f"{key}\n")
+                    f.writelines(f"{key}\n" for key in keys)
                 print(f"\n💾 Ключи сохранены в файл: {filename}")
 
+    elif args.action == "mint":
+        mint_keys(
+            plan_name=args.plan,
+            quantity=args.quantity,
+            expires_in_days=args.expires,
+            workers=args.workers,
+            chunk_size=args.chunk,
+            resume_job_id=args.resume
+        )
+
     elif args.action == "list":
         list_keys(
             plan_name=args.plan,
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -82,6 +84,30 @@ def get_link_actions_keyboard(link_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def get_links_page_keyboard(category: Optional[str], first_id: int, last_id: int,
+                            has_prev: bool, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Навигация по страницам ссылок: курсор - ID первой/последней ссылки на странице"""
+    builder = InlineKeyboardBuilder()
+    suffix = f":{category}" if category else ""
+
+    if has_prev:
+        builder.add(InlineKeyboardButton(
+            text="⬅️ Новее",
+            callback_data=f"links_page:<{first_id}{suffix}"
+        ))
+    if has_next:
+        builder.add(InlineKeyboardButton(
+            text="Старше ➡️",
+            callback_data=f"links_page:>{last_id}{suffix}"
+        ))
+
+    if not has_prev and not has_next:
+        return None
+
+    builder.adjust(2)
+    return builder.as_markup()
+
+
 def get_upgrade_keyboard(plans: list) -> InlineKeyboardMarkup:
     """Клавиатура для обновления подписки"""
     builder = InlineKeyboardBuilder()
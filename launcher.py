@@ -0,0 +1,371 @@
+"""
+Запуск бота в нескольких процессах.
+
+Апдейты получает один процесс (long polling) и раздает их процессам-обработчикам
+по user_id: все апдейты пользователя попадают в один и тот же процесс, поэтому его
+кэши, счетчики и состояния FSM не расходятся между процессами. Запись в БД
+координирует сама SQLite (BEGIN IMMEDIATE + busy timeout).
+
+Обработчик сообщает launcher о каждом обработанном апдейте, и только тогда
+launcher подтверждает его Telegram (offset): апдейты, которые были в работе
+при падении обработчика, отдаются перезапущенному процессу, а при падении
+launcher - приходят от Telegram заново (кроме зависших дольше
+STUCK_UPDATE_TIMEOUT: их offset перестает ждать). Одновременно каждый обработчик
+выполняет не больше WEBHOOK_MAX_CONCURRENCY апдейтов, как и вебхук.
+
+Справочник планов подписки у каждого процесса свой: после изменения планов
+обработчик сообщает launcher, и тот просит остальные процессы перечитать его.
+
+Запуск: python launcher.py --workers 4
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.types import Update
+
+from config import Config
+
+logger = logging.getLogger("launcher")
+
+# Long polling: сколько секунд Telegram держит запрос getUpdates
+POLLING_TIMEOUT = 30
+# Пока апдейты в работе, getUpdates отвечает сразу (с ними же): сколько секунд
+# ждать событий от обработчиков перед следующим запросом
+EVENT_WAIT = 0.5
+
+# Зависший апдейт держит offset не дольше STUCK_UPDATE_TIMEOUT сек. и не больше
+# чем на MAX_UPDATE_LAG апдейтов: getUpdates отдает от offset не больше 100 апдейтов,
+# и без этой границы один медленный обработчик остановил бы прием для всех
+STUCK_UPDATE_TIMEOUT = 120
+MAX_UPDATE_LAG = 90
+
+# Сообщения обработчиков launcher: (UPDATE_DONE, update_id), (PLANS_CHANGED, номер процесса)
+UPDATE_DONE = "update_done"
+PLANS_CHANGED = "plans_changed"
+# Сообщение launcher обработчику вместо апдейта: перечитать планы подписки
+RELOAD_PLANS = "reload_plans"
+
+
+def shard_for_update(update: Update, workers: int) -> int:
+    """Номер процесса-обработчика для апдейта"""
+    try:
+        event = update.event
+    except Exception:
+        # Неизвестный aiogram тип апдейта - нужен любой, но постоянный процесс
+        return update.update_id % workers
+
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    chat = getattr(event, "chat", None)
+    if user is not None:
+        return user.id % workers
+    if chat is not None:
+        return chat.id % workers
+    return update.update_id % workers
+
+
+async def process_updates(index: int, queue: "multiprocessing.Queue", events: "multiprocessing.Queue"):
+    """Обработка апдейтов, полученных от launcher, в процессе-обработчике"""
+    # Импорт здесь: Database создается при импорте database.db, уже с настройками процесса
+    from database.db import database
+    from main import create_dispatcher, start_key_filter, start_online_builds, start_request_compaction
+
+    bot = Bot(token=Config.BOT_TOKEN)
+    dp = create_dispatcher()
+    start_key_filter()
+    start_online_builds()
+    # Свертка журнала общая для БД - достаточно одного процесса
+    if index == 0:
+        start_request_compaction()
+    database.on_plans_changed = lambda: events.put((PLANS_CHANGED, index))
+
+    tasks = set()
+    # Как у вебхука: пока все слоты заняты, следующий апдейт не берется из очереди
+    slots = asyncio.Semaphore(Config.WEBHOOK_MAX_CONCURRENCY)
+
+    async def handle(raw: dict):
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception as e:
+            logger.exception(f"❌ Обработчик {index}: ошибка обработки апдейта {raw.get('update_id')}: {e}")
+        finally:
+            slots.release()
+            # Апдейт с ошибкой тоже считается обработанным, как при обычном polling
+            events.put((UPDATE_DONE, raw['update_id']))
+
+    loop = asyncio.get_running_loop()
+    logger.info(f"🤖 Обработчик {index} запущен")
+    try:
+        while True:
+            await slots.acquire()
+            raw = await loop.run_in_executor(None, queue.get)
+            if raw is None:
+                break
+            if raw == RELOAD_PLANS:
+                slots.release()
+                await database.reload_subscription_plans(notify=False)
+                continue
+            task = asyncio.create_task(handle(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Дорабатываем уже принятые апдейты
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await dp.storage.close()
+        await bot.session.close()
+        await database.close()
+        logger.info(f"🛑 Обработчик {index} остановлен")
+
+
+def run_worker(index: int, queue: "multiprocessing.Queue", events: "multiprocessing.Queue"):
+    """Точка входа процесса-обработчика"""
+    # Остановкой управляет launcher (через None в очереди): Ctrl+C и SIGTERM, который
+    # systemd рассылает всей группе процессов, обработчики не прерывают
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # У каждого процесса свой файл отложенного журнала, иначе они дозаписывают чужие строки
+    Config.REQUEST_JOURNAL_SPILL_PATH = f"{Config.REQUEST_JOURNAL_SPILL_PATH}.{index}"
+    asyncio.run(process_updates(index, queue, events))
+
+
+def start_worker(ctx, index: int, queue: "multiprocessing.Queue", events: "multiprocessing.Queue"):
+    process = ctx.Process(target=run_worker, args=(index, queue, events), name=f"bot-worker-{index}")
+    process.start()
+    return process
+
+
+class UpdateTracker:
+    """Апдейты, розданные обработчикам и еще не обработанные.
+
+    Telegram считает апдейт доставленным, когда getUpdates приходит с offset
+    больше его update_id, поэтому offset - самый ранний необработанный апдейт.
+    Telegram при этом повторяет все апдейты после offset, и уже розданные
+    пропускаются. Зависший апдейт перестает держать offset (release_stuck):
+    при падении launcher он уже не придет повторно, но обработчик его доделает.
+    """
+
+    def __init__(self):
+        # update_id -> (номер обработчика, апдейт, когда роздан)
+        self.in_flight: Dict[int, Tuple[int, dict, float]] = {}
+        # Отпущенные зависшие апдейты: offset их уже не ждет
+        self.stuck: Dict[int, Tuple[int, dict]] = {}
+        # Розданные апдейты начиная с offset - их Telegram отдает повторно
+        self._window: Deque[int] = deque()
+        self.last_update_id: Optional[int] = None
+
+    def is_new(self, update_id: int) -> bool:
+        return self.last_update_id is None or update_id > self.last_update_id
+
+    def dispatch(self, update_id: int, shard: int, raw: dict, now: Optional[float] = None):
+        self.in_flight[update_id] = (shard, raw, time.monotonic() if now is None else now)
+        self._window.append(update_id)
+        self.last_update_id = update_id
+
+    def _trim(self):
+        while self._window and self._window[0] not in self.in_flight:
+            self._window.popleft()
+
+    def done(self, update_id: int):
+        self.in_flight.pop(update_id, None)
+        self.stuck.pop(update_id, None)
+        self._trim()
+
+    def offset(self) -> Optional[int]:
+        """offset для getUpdates: все апдейты до него обработаны или отпущены"""
+        if self._window:
+            return self._window[0]
+        if self.last_update_id is None:
+            return None
+        return self.last_update_id + 1
+
+    def release_stuck(self, timeout: float = STUCK_UPDATE_TIMEOUT, max_lag: int = MAX_UPDATE_LAG,
+                      now: Optional[float] = None) -> List[int]:
+        """Отпустить самые ранние апдейты, которые в работе дольше timeout сек.
+        или отстали от последнего больше чем на max_lag апдейтов"""
+        now = time.monotonic() if now is None else now
+        released = []
+        while self._window:
+            update_id = self._window[0]
+            shard, raw, dispatched_at = self.in_flight[update_id]
+            if now - dispatched_at < timeout and len(self._window) <= max_lag:
+                break
+            del self.in_flight[update_id]
+            self.stuck[update_id] = (shard, raw)
+            released.append(update_id)
+            self._trim()
+        return released
+
+    def pending(self, shard: int) -> List[dict]:
+        """Необработанные апдейты обработчика (и отпущенные) в порядке получения"""
+        updates = [(update_id, raw) for update_id, (index, raw, _) in self.in_flight.items() if index == shard]
+        updates += [(update_id, raw) for update_id, (index, raw) in self.stuck.items() if index == shard]
+        return [raw for _, raw in sorted(updates, key=lambda item: item[0])]
+
+
+def apply_event(event: tuple, tracker: UpdateTracker, queues: List["multiprocessing.Queue"]):
+    """Событие от обработчика: апдейт обработан или изменились планы подписки"""
+    kind, value = event
+    if kind == UPDATE_DONE:
+        tracker.done(value)
+    elif kind == PLANS_CHANGED:
+        for index, queue in enumerate(queues):
+            if index != value:
+                queue.put(RELOAD_PLANS)
+
+
+def drain_events(events: "multiprocessing.Queue", tracker: UpdateTracker,
+                 queues: List["multiprocessing.Queue"], timeout: Optional[float] = None):
+    """Разобрать накопившиеся события; timeout - сколько ждать первого"""
+    try:
+        event = events.get(timeout=timeout) if timeout else events.get_nowait()
+        while True:
+            apply_event(event, tracker, queues)
+            event = events.get_nowait()
+    except queue_module.Empty:
+        pass
+
+
+async def poll_updates(ctx, queues: List["multiprocessing.Queue"], processes: list,
+                       events: "multiprocessing.Queue", tracker: UpdateTracker):
+    """Long polling и раздача апдейтов по процессам"""
+    from main import create_dispatcher
+
+    bot = Bot(token=Config.BOT_TOKEN)
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    loop = asyncio.get_running_loop()
+    backoff = 1
+
+    logger.info(f"🤖 Бот запущен: {len(queues)} процесс(ов)-обработчик(ов)")
+    try:
+        while True:
+            drain_events(events, tracker, queues)
+            for update_id in tracker.release_stuck():
+                logger.warning(f"⚠️ Апдейт {update_id} обрабатывается слишком долго, "
+                               f"прием следующих апдейтов его больше не ждет")
+
+            # Упавший обработчик перезапускается с новой очередью: в нее заново
+            # кладутся все его необработанные апдейты, включая те, что он уже взял
+            for index, process in enumerate(processes):
+                if not process.is_alive():
+                    pending = tracker.pending(index)
+                    logger.error(f"❌ Обработчик {index} завершился (код {process.exitcode}), "
+                                 f"перезапуск, повтор апдейтов: {len(pending)}")
+                    queues[index] = ctx.Queue()
+                    for raw in pending:
+                        queues[index].put(raw)
+                    processes[index] = start_worker(ctx, index, queues[index], events)
+
+            try:
+                updates = await bot.get_updates(
+                    offset=tracker.offset(),
+                    timeout=POLLING_TIMEOUT,
+                    allowed_updates=allowed_updates,
+                    request_timeout=POLLING_TIMEOUT + 10
+                )
+            except TelegramNetworkError as e:
+                logger.warning(f"⚠️ Ошибка сети при получении апдейтов: {e}, повтор через {backoff} сек.")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = 1
+
+            new_updates = 0
+            for update in updates:
+                if not tracker.is_new(update.update_id):
+                    continue
+                raw = update.model_dump(mode="json", by_alias=True, exclude_none=True)
+                shard = shard_for_update(update, len(queues))
+                tracker.dispatch(update.update_id, shard, raw)
+                queues[shard].put(raw)
+                new_updates += 1
+
+            # Telegram вернул только розданные апдейты - ждем, пока обработчики их закончат
+            if not new_updates and tracker.in_flight:
+                await loop.run_in_executor(None, drain_events, events, tracker, queues, EVENT_WAIT)
+    finally:
+        await bot.session.close()
+
+
+async def confirm_updates(tracker: UpdateTracker):
+    """Подтвердить Telegram апдейты, обработанные до остановки"""
+    offset = tracker.offset()
+    if offset is None:
+        return
+
+    bot = Bot(token=Config.BOT_TOKEN)
+    try:
+        await bot.get_updates(offset=offset, limit=1, timeout=0)
+    except TelegramNetworkError as e:
+        logger.warning(f"⚠️ Не удалось подтвердить обработанные апдейты, они придут повторно: {e}")
+    finally:
+        await bot.session.close()
+
+
+async def init_database():
+    """Таблицы создаются один раз до старта обработчиков"""
+    from database.db import database
+
+    await database.create_tables()
+    await database.close()
+
+
+def stop_on_sigterm(signum, frame):
+    """SIGTERM (systemd, docker stop) останавливает launcher так же, как Ctrl+C"""
+    raise KeyboardInterrupt
+
+
+def main(workers: int):
+    if Config.FSM_STORAGE == "memory":
+        logger.warning("⚠️ FSM_STORAGE=memory: состояния FSM теряются при перезапуске "
+                       "и при смене числа процессов, для launcher рекомендуется sqlite")
+
+    asyncio.run(init_database())
+
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(workers)]
+    events = ctx.Queue()
+    tracker = UpdateTracker()
+    processes = [start_worker(ctx, index, queue, events) for index, queue in enumerate(queues)]
+
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    try:
+        asyncio.run(poll_updates(ctx, queues, processes, events, tracker))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Повторный сигнал не должен прервать остановку на полпути
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        logger.info("🛑 Остановка обработчиков...")
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join()
+        drain_events(events, tracker, queues)
+        asyncio.run(confirm_updates(tracker))
+        logger.info("🛑 Бот остановлен")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="Запуск бота в нескольких процессах")
+    parser.add_argument("--workers", type=int, default=Config.BOT_WORKERS,
+                        help="Количество процессов-обработчиков")
+
+    args = parser.parse_args()
+    main(args.workers)
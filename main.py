@@ -1,7 +1,9 @@
 import asyncio
 import logging
+from typing import Optional
+
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
 
 from config import Config
 from database.db import database
@@ -10,6 +12,8 @@ from handlers.common import router as common_router
 from handlers.activation import router as activation_router
 from handlers.links import router as links_router
 from handlers.main_menu import router as main_menu_router
+from middlewares import setup_metrics
+from utils.fsm_storage import create_storage
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,28 +22,102 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def log_key_filter(task: asyncio.Task):
+    """Итог фонового построения фильтра ключей"""
+    if task.cancelled():
+        return
+    if task.exception():
+        logger.error(f"❌ Фильтр ключей не построен: {task.exception()}")
+    else:
+        logger.info(f"🔑 Фильтр ключей: {database.key_filter_stats()}")
+
+
+def start_key_filter() -> asyncio.Task:
+    """Фильтр ключей строится в фоне: пока он не готов, ключи проверяются по БД"""
+    key_filter_task = asyncio.create_task(database.build_key_filter())
+    key_filter_task.add_done_callback(log_key_filter)
+    return key_filter_task
+
+
+def log_online_builds(task: asyncio.Task):
+    """Итог фонового достраивания индексов после миграции"""
+    if task.cancelled():
+        return
+    if task.exception():
+        logger.error(f"❌ Онлайн-построение индексов прервано: {task.exception()}")
+    elif task.result():
+        logger.info(f"🗂 Индексы достроены: {task.result()}")
+
+
+def start_online_builds() -> asyncio.Task:
+    """Индексы, зарегистрированные миграциями, достраиваются пачками в фоне"""
+    online_builds_task = asyncio.create_task(database.run_online_builds())
+    online_builds_task.add_done_callback(log_online_builds)
+    return online_builds_task
+
+
+async def compact_requests_periodically(interval: float):
+    """Фоновая свертка журнала запросов: сразу после запуска и затем раз в interval сек."""
+    while True:
+        try:
+            result = await database.compact_requests()
+            if result['compacted'] or result['vacuumed_bytes']:
+                logger.info(
+                    f"🧹 Журнал запросов: свернуто {result['compacted']} записей за {result['seconds']:.1f} сек. "
+                    f"({result['rows_per_second']:.0f}/сек.), освобождено {result['vacuumed_bytes'] // 1024} КБ"
+                )
+        except Exception as e:
+            logger.error(f"❌ Ошибка свертки журнала запросов: {e}")
+        await asyncio.sleep(interval)
+
+
+def start_request_compaction() -> Optional[asyncio.Task]:
+    """Запуск фоновой свертки журнала запросов (REQUEST_COMPACTION_INTERVAL=0 - отключена)"""
+    if Config.REQUEST_COMPACTION_INTERVAL <= 0:
+        return None
+    return asyncio.create_task(compact_requests_periodically(Config.REQUEST_COMPACTION_INTERVAL))
+
+
+def create_dispatcher(storage: Optional[BaseStorage] = None) -> Dispatcher:
+    """Диспетчер со всеми роутерами (роутеры подключаются один раз на процесс)"""
+    dp = Dispatcher(storage=storage or create_storage())
+
+    # Регистрация роутеров
+    dp.include_router(start_router)
+    dp.include_router(activation_router)
+    dp.include_router(links_router)
+    dp.include_router(main_menu_router)
+    dp.include_router(common_router)
+
+    setup_metrics(dp)
+    return dp
+
+
 async def main():
+    dp = None
     try:
         bot = Bot(token=Config.BOT_TOKEN)
-        dp = Dispatcher(storage=MemoryStorage())
-
-        # Регистрация роутеров
-        dp.include_router(start_router)
-        dp.include_router(activation_router)
-        dp.include_router(links_router)
-        dp.include_router(main_menu_router)
-        dp.include_router(common_router)
+        dp = create_dispatcher()
 
         # Создание таблиц в БД
         await database.create_tables()
         logger.info("✅ База данных инициализирована")
 
+        start_key_filter()
+        start_online_builds()
+        start_request_compaction()
+
         logger.info("🤖 Бот запущен!")
         await dp.start_polling(bot)
 
     except Exception as e:
         logger.error(f"❌ Ошибка при запуске бота: {e}")
     finally:
+        # Хранилище FSM (sqlite) держит свое соединение
+        if dp is not None:
+            await dp.storage.close()
+        await database.close()
+        logger.info(f"📊 Пул соединений: {database.pool_stats()}")
         logger.info("🛑 Бот остановлен")
 
 
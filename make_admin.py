@@ -14,23 +14,7 @@ async def make_admin(user_id: int):
         return False
 
     # Обновляем статус админа
-    from threading import Lock
-    import sqlite3
-
-    def sync_make_admin():
-        with Lock():
-            conn = sqlite3.connect("data/database.db")
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE users SET is_admin = 1 WHERE user_id = ?",
-                (user_id,)
-            )
-            conn.commit()
-            affected = cursor.rowcount
-            conn.close()
-            return affected > 0
-
-    success = await asyncio.to_thread(sync_make_admin)
+    success = await database.set_user_admin(user_id)
 
     if success:
         print(f"✅ Пользователь {user['full_name']} (ID: {user_id}) назначен администратором!")
@@ -43,25 +27,7 @@ async def make_admin(user_id: int):
 async def list_admins():
     """Показать список администраторов"""
 
-    def sync_get_admins():
-        import sqlite3
-        from threading import Lock
-
-        with Lock():
-            conn = sqlite3.connect("data/database.db")
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT u.* 
-                FROM users u
-                WHERE u.is_admin = 1 
-                ORDER BY u.created_at DESC
-            ''')
-            rows = cursor.fetchall()
-            conn.close()
-            return [dict(row) for row in rows]
-
-    admins = await asyncio.to_thread(sync_get_admins)
+    admins = await database.get_admins()
 
     if not admins:
         print("👑 Администраторов нет")
@@ -107,23 +73,7 @@ if __name__ == "__main__":
 
         # Удаление админ прав
         async def remove_admin():
-            from threading import Lock
-            import sqlite3
-
-            def sync_remove_admin():
-                with Lock():
-                    conn = sqlite3.connect("data/database.db")
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "UPDATE users SET is_admin = 0 WHERE user_id = ?",
-                        (args.user_id,)
-                    )
-                    conn.commit()
-                    affected = cursor.rowcount
-                    conn.close()
-                    return affected > 0
-
-            success = await asyncio.to_thread(sync_remove_admin)
+            success = await database.set_user_admin(args.user_id, is_admin=False)
 
             if success:
                 print(f"✅ Админ права у пользователя {args.user_id} удалены!")
@@ -1,6 +1,11 @@
-from aiogram import BaseMiddleware
+import logging
+import time
+from aiogram import BaseMiddleware, Dispatcher
 from typing import Callable, Dict, Any, Awaitable
-from aiogram.types import Message
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Message, TelegramObject, Update
+
+from utils.metrics import metrics
 
 class LoggingMiddleware(BaseMiddleware):
     async def __call__(
@@ -10,4 +15,57 @@ class LoggingMiddleware(BaseMiddleware):
         data: Dict[str, Any]
     ) -> Any:
         logging.info(f"User {event.from_user.id} sent: {event.text}")
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
+
+
+class UpdateTimingMiddleware(BaseMiddleware):
+    """Внешний middleware апдейтов: время обработки по роутеру и обработчику"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Обработчик выбирается уже после фильтров - его запишет HandlerRouteMiddleware
+        route = {'router': '-', 'handler': 'unhandled'}
+        data['metrics_route'] = route
+        status = 'error'
+        started = time.perf_counter()
+        try:
+            result = await handler(event, data)
+            status = 'unhandled' if result is UNHANDLED else 'ok'
+            return result
+        finally:
+            metrics.observe("bot_update_seconds", time.perf_counter() - started,
+                            event=event.event_type, **route)
+            metrics.inc("bot_updates_total", event=event.event_type, status=status)
+
+
+class HandlerRouteMiddleware(BaseMiddleware):
+    """Внутренний middleware: какой обработчик выбран для апдейта"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        route = data.get('metrics_route')
+        if route is not None:
+            callback = data['handler'].callback
+            route['router'] = callback.__module__
+            route['handler'] = callback.__name__
+        return await handler(event, data)
+
+
+def setup_metrics(dp: Dispatcher):
+    """Замер обработчиков: внутренние middleware диспетчера наследуют все роутеры"""
+    if not metrics.enabled:
+        return
+
+    dp.update.outer_middleware(UpdateTimingMiddleware())
+    route_middleware = HandlerRouteMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ('update', 'error'):
+            observer.middleware(route_middleware)
@@ -0,0 +1,29 @@
+import asyncio
+import os
+
+import pytest
+
+from config import Config
+
+
+@pytest.fixture(autouse=True)
+def isolated_files(tmp_path, monkeypatch):
+    """Файлы, которые Database пишет рядом с рабочей БД, - во временной папке"""
+    monkeypatch.setattr(Config, "REQUEST_JOURNAL_SPILL_PATH", str(tmp_path / "journal.spill"))
+    monkeypatch.setattr(Config, "REQUEST_ARCHIVE_PATH", str(tmp_path / "archive.db"))
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    return os.path.join(tmp_path, "test.db")
+
+
+@pytest.fixture
+def db(db_path):
+    """Database на новой БД с актуальной схемой"""
+    from database.db import Database
+
+    database = Database(db_path)
+    asyncio.run(database.create_tables())
+    yield database
+    asyncio.run(database.close())
@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from benchmarks.activation_stress import seed, verify, worker
+
+
+def test_each_key_has_one_winner_across_processes(db, db_path):
+    """Процессы одновременно активируют одни и те же ключи разными пользователями"""
+    processes, attempts, keys = 3, 40, 4
+    seed(db_path, processes * attempts, keys)
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(processes)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=worker,
+                    args=(db_path, range(i * attempts + 1, (i + 1) * attempts + 1), keys, barrier, results))
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    outcome = Counter()
+    for _ in workers:
+        outcome.update(results.get(timeout=60))
+    for process in workers:
+        process.join(timeout=60)
+
+    assert outcome['успех'] == keys
+    assert not [result for result in outcome if result.startswith("исключение")]
+    assert verify(db_path, keys) == []
+
+
+def test_same_key_twice_in_one_process(db, db_path):
+    seed(db_path, 2, 1)
+
+    async def activate_both():
+        return await asyncio.gather(db.activate_key(1, "STRESS-KEY-0"), db.activate_key(2, "STRESS-KEY-0"))
+
+    results = asyncio.run(activate_both())
+
+    assert sorted(result['success'] for result in results) == [False, True]
+    assert verify(db_path, 1) == []
+
+
+def test_failed_activation_keeps_buffered_requests(db, db_path):
+    """Если транзакция активации откатилась, несброшенные запросы пользователя не теряются"""
+    seed(db_path, 1, 1)
+    for _ in range(3):
+        asyncio.run(db.increment_user_requests(1))
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TRIGGER fail_history BEFORE INSERT ON subscription_history
+        BEGIN SELECT RAISE(ABORT, 'history unavailable'); END
+    ''')
+    conn.commit()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        asyncio.run(db.activate_key(1, "STRESS-KEY-0"))
+
+    stored = conn.execute("SELECT requests_used, activation_key_id FROM users WHERE user_id = 1").fetchone()
+    conn.close()
+    assert stored[1] is None
+    assert stored[0] + db._request_counters.pending(1) == 3
+
+
+def test_successful_activation_resets_buffered_requests(db, db_path):
+    seed(db_path, 1, 1)
+    for _ in range(3):
+        asyncio.run(db.increment_user_requests(1))
+
+    assert asyncio.run(db.activate_key(1, "STRESS-KEY-0"))['success']
+    db._request_counters.flush()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT requests_used FROM users WHERE user_id = 1").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,69 @@
+import asyncio
+
+from benchmarks.activation_stress import seed
+from database import cache as cache_module
+from database.cache import TTLCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+
+    cache.set(3, "c")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "a" and cache.get(3) == "c"
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set(1, "a")
+
+    now[0] += 4
+    assert cache.get(1) == "a"
+    now[0] += 2
+    assert cache.get(1) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_value_read_before_invalidation_is_not_cached():
+    cache = TTLCache()
+    generation = cache.generation()
+    # Пока значение читалось из БД, запись изменили и инвалидировали
+    cache.invalidate(1)
+
+    cache.set(1, "stale", generation)
+
+    assert cache.get(1) is None
+    cache.set(1, "fresh", cache.generation())
+    assert cache.get(1) == "fresh"
+
+
+def test_access_counts_unflushed_requests(db):
+    asyncio.run(db.add_user(1, None, "Cache"))
+    assert asyncio.run(db.check_user_access(1))['requests_used'] == 0
+
+    for _ in range(3):
+        asyncio.run(db.increment_user_requests(1))
+    # Строка пользователя из кэша, несброшенные инкременты добавляются сверху
+    assert asyncio.run(db.check_user_access(1))['requests_used'] == 3
+
+    db._request_counters.flush()
+
+    assert db._request_counters.pending(1) == 0
+    assert asyncio.run(db.check_user_access(1))['requests_used'] == 3
+
+
+def test_access_is_reread_after_activation(db, db_path):
+    seed(db_path, 1, 1)
+    assert not asyncio.run(db.check_user_access(1))['is_subscription_active']
+
+    assert asyncio.run(db.activate_key(1, "STRESS-KEY-0"))['success']
+
+    access = asyncio.run(db.check_user_access(1))
+    assert access['has_access'] and access['plan_name'] == 'BASIC'
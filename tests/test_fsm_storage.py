@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+from utils.fsm_storage import SQLiteStorage, create_storage
+
+
+class Form(StatesGroup):
+    waiting_url = State()
+
+
+def key(user_id: int = 1) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+
+@pytest.fixture
+def fsm_path(tmp_path) -> str:
+    return os.path.join(tmp_path, "fsm.db")
+
+
+def test_state_and_data_survive_restart(fsm_path):
+    async def save():
+        storage = SQLiteStorage(fsm_path)
+        await storage.set_state(key(), Form.waiting_url)
+        await storage.set_data(key(), {'url': "https://example.com", 'tags': ["дом"]})
+        await storage.close()
+
+    async def load():
+        storage = SQLiteStorage(fsm_path)
+        try:
+            return await storage.get_state(key()), await storage.get_data(key()), await storage.get_state(key(2))
+        finally:
+            await storage.close()
+
+    asyncio.run(save())
+
+    assert asyncio.run(load()) == (Form.waiting_url.state, {'url': "https://example.com", 'tags': ["дом"]}, None)
+
+
+def test_clearing_state_keeps_data(fsm_path):
+    async def scenario():
+        storage = SQLiteStorage(fsm_path)
+        try:
+            await storage.set_data(key(), {'step': 1})
+            await storage.set_state(key(), Form.waiting_url)
+            await storage.set_state(key(), None)
+            return await storage.get_state(key()), await storage.get_data(key())
+        finally:
+            await storage.close()
+
+    assert asyncio.run(scenario()) == (None, {'step': 1})
+
+
+def test_update_data_is_atomic_across_connections(fsm_path):
+    """Два хранилища - как два процесса бота - одновременно дописывают данные одного ключа"""
+    async def scenario():
+        storages = [SQLiteStorage(fsm_path) for _ in range(2)]
+        try:
+            await asyncio.gather(*(
+                storages[n % 2].update_data(key(), {f"field{n}": n}) for n in range(20)
+            ))
+            return await storages[0].get_data(key())
+        finally:
+            for storage in storages:
+                await storage.close()
+
+    assert asyncio.run(scenario()) == {f"field{n}": n for n in range(20)}
+
+
+def test_set_data_requires_dict(fsm_path):
+    storage = SQLiteStorage(fsm_path)
+
+    with pytest.raises(TypeError):
+        asyncio.run(storage.set_data(key(), [("a", 1)]))
+
+
+def test_unknown_storage_kind():
+    with pytest.raises(ValueError):
+        create_storage("redis")
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from database.journal import RequestJournal
+
+
+class Sink:
+    """Приемник пачек журнала; failing=True - запись в БД недоступна"""
+
+    def __init__(self):
+        self.rows = []
+        self.failing = False
+
+    def __call__(self, rows):
+        if self.failing:
+            raise RuntimeError("database is locked")
+        self.rows.extend(rows)
+
+
+def row(n: int):
+    return RequestJournal.make_row(1, "ask", str(n), None)
+
+
+def make_journal(sink, tmp_path, overflow: str, capacity: int = 2):
+    # Большой интервал: сброс только явный, фоновый поток не мешает
+    return RequestJournal(sink, capacity=capacity, batch_size=10, interval_ms=60000,
+                          overflow=overflow, spill_path=str(tmp_path / "journal.spill"))
+
+
+def test_unknown_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        make_journal(Sink(), tmp_path, "ignore")
+
+
+def test_drop_policy_discards_rows_over_capacity(tmp_path):
+    sink = Sink()
+    journal = make_journal(sink, tmp_path, "drop")
+
+    assert all(journal.append(row(n)) for n in range(5))
+    journal.close()
+
+    assert [r[2] for r in sink.rows] == ["0", "1"]
+    assert journal.stats()['dropped'] == 3
+
+
+def test_block_policy_waits_for_flush(tmp_path):
+    sink = Sink()
+    journal = make_journal(sink, tmp_path, "block")
+    journal.append(row(0))
+    journal.append(row(1))
+
+    assert journal.append(row(2)) is False
+
+    waiter = threading.Thread(target=journal.append, args=(row(2), True))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()
+
+    journal.flush()
+    waiter.join(5)
+    assert not waiter.is_alive()
+    journal.close()
+    assert [r[2] for r in sink.rows] == ["0", "1", "2"]
+
+
+def test_spill_policy_writes_overflow_to_file(tmp_path):
+    sink = Sink()
+    journal = make_journal(sink, tmp_path, "spill")
+
+    for n in range(5):
+        journal.append(row(n))
+    assert os.path.exists(journal.spill_path)
+
+    journal.close()
+
+    assert sorted(r[2] for r in sink.rows) == ["0", "1", "2", "3", "4"]
+    assert not os.path.exists(journal.spill_path)
+    assert journal.stats()['spilled'] == 3
+
+
+def test_spill_keeps_rows_while_database_is_unavailable(tmp_path):
+    sink = Sink()
+    journal = make_journal(sink, tmp_path, "spill", capacity=10)
+    rows = [row(n) for n in range(3)]
+    for r in rows:
+        journal.append(r)
+
+    sink.failing = True
+    journal.flush()
+    assert sink.rows == [] and journal.stats()['buffered'] == 0
+
+    sink.failing = False
+    journal.close()
+
+    # Строки из файла дописываются позже, но с исходным временем создания
+    assert sorted(sink.rows) == sorted(rows)
+
+
+def test_failed_write_is_retried_in_order(tmp_path):
+    sink = Sink()
+    journal = make_journal(sink, tmp_path, "drop", capacity=10)
+    for n in range(3):
+        journal.append(row(n))
+
+    sink.failing = True
+    journal.flush()
+    assert journal.stats()['buffered'] == 3
+
+    sink.failing = False
+    journal.close()
+    assert [r[2] for r in sink.rows] == ["0", "1", "2"]
+
+
+def test_requests_of_unknown_users_do_not_fail_the_batch(db, db_path):
+    asyncio.run(db.add_user(1, None, "Journal"))
+    asyncio.run(db.add_user_request(1, "ask"))
+    asyncio.run(db.add_user_request(404, "ask"))
+    db._journal.flush()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT user_id FROM user_requests").fetchall() == [(1,)]
+    conn.close()
@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+from benchmarks.activation_stress import seed
+from database.bloom import BloomFilter
+from database.keys import key_digest
+
+
+def test_filter_has_no_false_negatives():
+    key_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    digests = [key_digest(f"KEY-{n}") for n in range(1000)]
+    key_filter.update(digests)
+
+    assert all(digest in key_filter for digest in digests)
+    false_positives = sum(os.urandom(32) in key_filter for _ in range(20000))
+    assert false_positives / 20000 < 0.03
+
+
+def test_unknown_key_is_rejected_by_filter(db, db_path):
+    seed(db_path, 1, 1)
+    asyncio.run(db.build_key_filter())
+
+    result = asyncio.run(db.activate_key(1, "NO-SUCH-KEY"))
+
+    assert not result['success']
+    assert db.key_filter_stats()['rejected'] == 1
+    assert asyncio.run(db.activate_key(1, "STRESS-KEY-0"))['success']
+
+
+def test_key_minted_after_build_validates(db, db_path):
+    seed(db_path, 1, 0)
+    asyncio.run(db.build_key_filter())
+    # Ключ выпущен другим процессом уже после построения фильтра
+    seed(db_path, 0, 1)
+
+    assert asyncio.run(db.validate_key("STRESS-KEY-0"))['valid']
+    assert asyncio.run(db.activate_key(1, "STRESS-KEY-0"))['success']
+    assert db.key_filter_stats()['refreshes'] == 1
+
+
+def test_miss_without_new_keys_skips_reload(db, db_path):
+    seed(db_path, 1, 1)
+    asyncio.run(db.build_key_filter())
+
+    for _ in range(3):
+        assert not asyncio.run(db.validate_key("NO-SUCH-KEY"))['valid']
+
+    stats = db.key_filter_stats()
+    assert stats['rejected'] == 3 and stats['refreshes'] == 0
@@ -0,0 +1,67 @@
+import queue
+
+from launcher import PLANS_CHANGED, RELOAD_PLANS, UPDATE_DONE, UpdateTracker, apply_event
+
+
+def test_offset_waits_for_earliest_unfinished_update():
+    tracker = UpdateTracker()
+    assert tracker.offset() is None
+
+    for update_id, shard in ((10, 0), (11, 1), (12, 0)):
+        tracker.dispatch(update_id, shard, {'update_id': update_id})
+
+    apply_event((UPDATE_DONE, 11), tracker, [])
+    assert tracker.offset() == 10
+    assert [raw['update_id'] for raw in tracker.pending(0)] == [10, 12]
+
+    apply_event((UPDATE_DONE, 10), tracker, [])
+    assert tracker.offset() == 12
+    apply_event((UPDATE_DONE, 12), tracker, [])
+    assert tracker.offset() == 13
+
+
+def test_redelivered_updates_are_not_dispatched_again():
+    tracker = UpdateTracker()
+    tracker.dispatch(10, 0, {'update_id': 10})
+
+    assert not tracker.is_new(10)
+    assert tracker.is_new(11)
+
+
+def test_plan_change_is_sent_to_other_workers():
+    queues = [queue.Queue() for _ in range(3)]
+
+    apply_event((PLANS_CHANGED, 1), UpdateTracker(), queues)
+
+    assert [q.qsize() for q in queues] == [1, 0, 1]
+    assert queues[0].get_nowait() == RELOAD_PLANS
+
+
+def test_hung_update_stops_holding_offset_after_lag():
+    tracker = UpdateTracker()
+    tracker.dispatch(1, 0, {'update_id': 1}, now=0)
+    # Обработчик апдейта 1 завис, следующие обрабатываются сразу
+    for update_id in range(2, 12):
+        tracker.dispatch(update_id, 1, {'update_id': update_id}, now=0)
+        apply_event((UPDATE_DONE, update_id), tracker, [])
+    tracker.dispatch(12, 1, {'update_id': 12}, now=0)
+
+    assert tracker.release_stuck(timeout=60, max_lag=20, now=1) == []
+    assert tracker.offset() == 1
+
+    assert tracker.release_stuck(timeout=60, max_lag=5, now=1) == [1]
+    assert tracker.offset() == 12
+    # Отпущенный апдейт по-прежнему повторяется при перезапуске обработчика
+    assert tracker.pending(0) == [{'update_id': 1}]
+    apply_event((UPDATE_DONE, 1), tracker, [])
+    assert tracker.pending(0) == [] and not tracker.stuck
+
+
+def test_hung_update_stops_holding_offset_after_timeout():
+    tracker = UpdateTracker()
+    tracker.dispatch(1, 0, {'update_id': 1}, now=0)
+    tracker.dispatch(2, 0, {'update_id': 2}, now=50)
+
+    assert tracker.release_stuck(timeout=60, max_lag=90, now=59) == []
+    assert tracker.release_stuck(timeout=60, max_lag=90, now=61) == [1]
+    assert tracker.offset() == 2
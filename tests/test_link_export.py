@@ -0,0 +1,49 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.link_export import EXPORT_CHUNK_SIZE, LinkExportWriter, build_links_export
+
+
+async def read_export(export_file) -> str:
+    return b"".join([chunk async for chunk in export_file.read(None)]).decode("utf-8")
+
+
+def add_links(db, user_id: int, count: int):
+    async def add():
+        await db.add_user(user_id, None, "Export")
+        for n in range(count):
+            await db.add_user_link(user_id, f"https://example.com/{n}", f"Ссылка {n}")
+
+    asyncio.run(add())
+
+
+def test_writer_must_implement_link():
+    with pytest.raises(TypeError):
+        LinkExportWriter(None, "owner")
+
+
+def test_txt_total_matches_streamed_links(db):
+    # Больше одной пачки, чтобы выгрузка шла несколькими запросами
+    add_links(db, 1, EXPORT_CHUNK_SIZE + 3)
+
+    export_file, count = asyncio.run(build_links_export(db, 1, "Export", "txt"))
+    text = asyncio.run(read_export(export_file))
+
+    assert count == EXPORT_CHUNK_SIZE + 3
+    assert text.rstrip().endswith(f"Всего ссылок: {count}")
+    assert text.count("   URL: ") == count
+    assert export_file.spool.closed
+
+
+def test_json_export_is_valid(db):
+    add_links(db, 1, 3)
+
+    export_file, count = asyncio.run(build_links_export(db, 1, "Export", "json"))
+
+    assert len(json.loads(asyncio.run(read_export(export_file)))) == count == 3
+
+
+def test_no_links_gives_no_file(db):
+    assert asyncio.run(build_links_export(db, 1, "Export", "csv")) == (None, 0)
@@ -0,0 +1,118 @@
+import asyncio
+import sqlite3
+
+from database.schema import SCHEMA_VERSION, migrate, run_online_builds
+
+FTS_COLUMNS = "user_id, url, title, description, category"
+
+
+def add_links(db, user_id: int, titles):
+    async def add():
+        await db.add_user(user_id, None, "Search")
+        return [await db.add_user_link(user_id, f"https://example.com/{n}", title)
+                for n, title in enumerate(titles)]
+
+    return asyncio.run(add())
+
+
+def indexed_ids(conn: sqlite3.Connection, query: str):
+    return sorted(row[0] for row in conn.execute(
+        "SELECT rowid FROM user_links_fts WHERE user_links_fts MATCH ?", (query,)
+    ))
+
+
+def integrity_check(conn: sqlite3.Connection):
+    conn.execute("INSERT INTO user_links_fts (user_links_fts) VALUES ('integrity-check')")
+
+
+def test_search_uses_fts_and_skips_deleted_links(db, db_path):
+    asyncio.run(db.run_online_builds())
+    ids = add_links(db, 1, ["python asyncio", "python sqlite", "рецепт борща"])
+    other_user_link = add_links(db, 2, ["python telegram"])[0]
+    assert asyncio.run(db.delete_user_link(ids[0], 1))
+
+    found = asyncio.run(db.search_user_links(1, "pyth"))
+
+    assert db._fts_enabled
+    assert [link['id'] for link in found] == [ids[1]]
+    conn = sqlite3.connect(db_path)
+    assert indexed_ids(conn, '"python"') == [ids[1], other_user_link]
+    integrity_check(conn)
+    conn.close()
+
+
+def test_title_match_ranks_first(db):
+    asyncio.run(db.run_online_builds())
+
+    async def add():
+        await db.add_user(1, None, "Search")
+        in_description = await db.add_user_link(1, "https://example.com/a", "заметка", "про python")
+        in_title = await db.add_user_link(1, "https://example.com/b", "python")
+        return in_description, in_title
+
+    in_description, in_title = asyncio.run(add())
+    found = asyncio.run(db.search_user_links(1, "python"))
+
+    assert [link['id'] for link in found] == [in_title, in_description]
+
+
+def test_restored_link_is_indexed_again(db, db_path):
+    asyncio.run(db.run_online_builds())
+    link_id = add_links(db, 1, ["python"])[0]
+    conn = sqlite3.connect(db_path)
+
+    conn.execute("UPDATE user_links SET is_active = 0 WHERE id = ?", (link_id,))
+    conn.commit()
+    assert indexed_ids(conn, '"python"') == []
+
+    conn.execute("UPDATE user_links SET is_active = 1 WHERE id = ?", (link_id,))
+    conn.commit()
+    assert indexed_ids(conn, '"python"') == [link_id]
+    integrity_check(conn)
+    conn.close()
+
+
+def test_migration_removes_inactive_links_from_index(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    run_online_builds(conn)
+    conn.execute("INSERT INTO users (user_id, full_name) VALUES (1, 'Search')")
+    conn.executemany(
+        "INSERT INTO user_links (user_id, url, title, is_active) VALUES (1, ?, 'python', ?)",
+        [("https://example.com/active", 1), ("https://example.com/deleted", 0)]
+    )
+    # Версия 3 индексировала и удаленные ссылки
+    conn.execute(f'''
+        INSERT INTO user_links_fts (rowid, {FTS_COLUMNS})
+        SELECT id, {FTS_COLUMNS} FROM user_links WHERE is_active = 0
+    ''')
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+    assert indexed_ids(conn, '"python"') == [1, 2]
+
+    assert migrate(conn) == SCHEMA_VERSION
+
+    assert indexed_ids(conn, '"python"') == [1]
+    integrity_check(conn)
+    conn.close()
+
+
+def test_online_build_skips_inactive_links(db_path):
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    conn.execute("INSERT INTO users (user_id, full_name) VALUES (1, 'Search')")
+    conn.executemany(
+        "INSERT INTO user_links (user_id, url, title, is_active) VALUES (1, ?, 'python', ?)",
+        [(f"https://example.com/{n}", n % 2) for n in range(10)]
+    )
+    conn.commit()
+    # Индекс, как после миграции БД без FTS: строки дописываются пачками
+    conn.execute("INSERT INTO user_links_fts (user_links_fts) VALUES ('delete-all')")
+    conn.execute("UPDATE schema_online_builds SET position = 0, target = 10, finished_at = NULL")
+    conn.commit()
+
+    run_online_builds(conn, batch_size=3)
+
+    assert indexed_ids(conn, '"python"') == [2, 4, 6, 8, 10]
+    integrity_check(conn)
+    conn.close()
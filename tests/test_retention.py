@@ -0,0 +1,88 @@
+import asyncio
+import sqlite3
+
+import database.schema as schema
+from config import Config
+from database.retention import create_requests_time_index, cutoff_for
+from database.schema import REQUESTS_TIME_INDEX
+
+
+def add_requests(db_path, rows):
+    """rows: (user_id, request_type, tokens_used, created_at) в порядке вставки"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (user_id, full_name) VALUES (?, 'Retention')",
+        {(row[0],) for row in rows}
+    )
+    conn.executemany(
+        "INSERT INTO user_requests (user_id, request_type, tokens_used, created_at) VALUES (?, ?, ?, ?)",
+        rows
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_spilled_old_rows_after_fresh_rows_are_compacted(db, db_path):
+    old, fresh = cutoff_for(40), cutoff_for(1)
+    # Свежие строки идут первыми, старые дописаны позже из spill-файла журнала
+    add_requests(db_path, [(1, "ask", 1, fresh)] * 5 + [(1, "ask", 2, old)] * 7)
+
+    result = asyncio.run(db.compact_requests(retention_days=30, batch_size=3, pause_ms=0))
+
+    assert result['compacted'] == 7
+    assert result['batches'] == 3
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM user_requests").fetchone() == (5,)
+    assert conn.execute(
+        "SELECT day, request_type, requests, tokens_used FROM user_requests_daily"
+    ).fetchall() == [(old[:10], "ask", 7, 14)]
+    conn.close()
+
+
+def test_archive_mode_keeps_compacted_rows(db, db_path):
+    old = cutoff_for(40)
+    add_requests(db_path, [(1, None, 0, old), (2, "ask", 3, old), (2, "ask", 0, cutoff_for(1))])
+
+    result = asyncio.run(db.compact_requests(retention_days=30, mode="archive", batch_size=10, pause_ms=0))
+
+    assert result['archived'] == 2
+    archive = sqlite3.connect(Config.REQUEST_ARCHIVE_PATH)
+    assert archive.execute("SELECT user_id FROM user_requests ORDER BY user_id").fetchall() == [(1,), (2,)]
+    archive.close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute(
+        "SELECT user_id, request_type, requests FROM user_requests_daily ORDER BY user_id"
+    ).fetchall() == [(1, "", 1), (2, "ask", 1)]
+    conn.close()
+
+
+def test_compaction_without_time_index_walks_whole_table(db, db_path):
+    old, fresh = cutoff_for(40), cutoff_for(1)
+    add_requests(db_path, [(1, "ask", 1, fresh)] * 5 + [(1, "ask", 2, old)] * 4)
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"DROP INDEX {REQUESTS_TIME_INDEX}")
+    conn.commit()
+
+    result = asyncio.run(db.compact_requests(retention_days=30, batch_size=3, pause_ms=0))
+
+    assert result['compacted'] == 4
+    assert conn.execute("SELECT COUNT(*) FROM user_requests").fetchone() == (5,)
+    conn.close()
+
+
+def test_migration_defers_time_index_on_large_log(db_path, monkeypatch):
+    conn = sqlite3.connect(db_path)
+    monkeypatch.setattr(schema, "REQUESTS_TIME_INDEX_INLINE_ROWS", 3)
+    for migration in schema.MIGRATIONS[:-1]:
+        migration.apply(conn)
+    conn.execute("INSERT INTO users (user_id, full_name) VALUES (1, 'Retention')")
+    conn.executemany("INSERT INTO user_requests (user_id) VALUES (1)", [()] * 5)
+    conn.execute(f"PRAGMA user_version = {schema.SCHEMA_VERSION - 1}")
+    conn.commit()
+
+    assert schema.migrate(conn) == schema.SCHEMA_VERSION
+    assert not schema.has_requests_time_index(conn)
+
+    create_requests_time_index(conn)
+    assert schema.has_requests_time_index(conn)
+    conn.close()
@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+import database.schema as schema
+from database.keys import key_digest
+from database.schema import SCHEMA_VERSION, get_version, migrate
+
+
+def legacy_db(db_path) -> sqlite3.Connection:
+    """БД до версий схемы: ключи по key_hash, пользователь ссылается на ключ"""
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE activation_keys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key_hash TEXT UNIQUE NOT NULL,
+            plan_id INTEGER NOT NULL,
+            key_code TEXT UNIQUE NOT NULL,
+            is_used BOOLEAN DEFAULT 0,
+            used_by_user_id INTEGER,
+            used_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            username TEXT,
+            full_name TEXT NOT NULL,
+            subscription_plan_id INTEGER DEFAULT 1,
+            activation_key_id INTEGER,
+            requests_used INTEGER DEFAULT 0,
+            requests_limit INTEGER DEFAULT 100,
+            subscription_start DATE,
+            subscription_end DATE,
+            is_active BOOLEAN DEFAULT 1,
+            is_admin BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (activation_key_id) REFERENCES activation_keys (id)
+        );
+        INSERT INTO activation_keys (key_hash, plan_id, key_code, is_used, used_by_user_id)
+        VALUES ('h1', 1, 'KEY-ONE', 1, 7), ('h2', 2, 'KEY-TWO', 0, NULL);
+        INSERT INTO users (user_id, full_name, activation_key_id) VALUES (7, 'Legacy', 1);
+    ''')
+    return conn
+
+
+def test_legacy_keys_are_migrated(db_path):
+    conn = legacy_db(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    assert migrate(conn) == SCHEMA_VERSION
+
+    rows = conn.execute("SELECT id, key_digest, key_code FROM activation_keys ORDER BY id").fetchall()
+    assert rows == [(1, key_digest("KEY-ONE"), "KEY-ONE"), (2, key_digest("KEY-TWO"), "KEY-TWO")]
+    # Ссылка пользователя на ключ пережила пересборку таблицы
+    assert conn.execute("SELECT activation_key_id FROM users WHERE user_id = 7").fetchone() == (1,)
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    assert conn.execute("PRAGMA foreign_keys").fetchone() == (1,)
+    conn.close()
+
+
+def test_migrate_is_idempotent(db_path):
+    conn = sqlite3.connect(db_path)
+    assert migrate(conn) == SCHEMA_VERSION
+    tables = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    plans = conn.execute("SELECT COUNT(*) FROM subscription_plans").fetchone()
+
+    assert migrate(conn) == SCHEMA_VERSION
+
+    assert conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall() == tables
+    assert conn.execute("SELECT COUNT(*) FROM subscription_plans").fetchone() == plans
+    conn.close()
+
+
+def test_failed_migration_leaves_legacy_schema(db_path, monkeypatch):
+    conn = legacy_db(db_path)
+    # Ошибка в конце миграции 1, уже после пересборки ключей
+    monkeypatch.setattr(schema, 'DEFAULT_PLANS', [("broken",)])
+
+    with pytest.raises(sqlite3.Error):
+        migrate(conn)
+
+    assert get_version(conn) == 0
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(activation_keys)")]
+    assert 'key_hash' in columns and 'key_digest' not in columns
+    assert conn.execute("SELECT COUNT(*) FROM activation_keys").fetchone() == (2,)
+    conn.close()
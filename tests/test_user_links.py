@@ -0,0 +1,137 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import handlers.links
+from handlers.links import LinkStates, callback_delete_link, callback_edit_link
+
+
+def add_links(db, db_path, user_id: int, count: int, created_at: str = "2026-01-01 12:00:00"):
+    """Ссылки с одинаковым временем добавления: порядок задает только id"""
+    async def add():
+        await db.add_user(user_id, None, "Links")
+        return [await db.add_user_link(user_id, f"https://example.com/{user_id}/{n}", f"Ссылка {n}")
+                for n in range(count)]
+
+    ids = asyncio.run(add())
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE user_links SET created_at = ? WHERE user_id = ?", (created_at, user_id))
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def test_cursor_pages_cover_every_link_once(db, db_path):
+    ids = add_links(db, db_path, 1, 7)
+    add_links(db, db_path, 2, 3)
+
+    pages, before_id = [], None
+    while True:
+        page = asyncio.run(db.get_user_links(1, limit=3, before_id=before_id))
+        if not page:
+            break
+        pages.append([link['id'] for link in page])
+        before_id = page[-1]['id']
+
+    assert pages == [ids[6:3:-1], ids[3:0:-1], ids[:1]]
+
+
+def test_after_id_returns_newer_page_newest_first(db, db_path):
+    ids = add_links(db, db_path, 1, 7)
+
+    page = asyncio.run(db.get_user_links(1, limit=3, after_id=ids[1]))
+
+    assert [link['id'] for link in page] == [ids[4], ids[3], ids[2]]
+    assert asyncio.run(db.get_user_links(1, limit=3, after_id=ids[-1])) == []
+
+
+def test_cursor_on_deleted_link_still_pages(db, db_path):
+    ids = add_links(db, db_path, 1, 5)
+    assert asyncio.run(db.delete_user_link(ids[3], 1))
+
+    page = asyncio.run(db.get_user_links(1, limit=10, before_id=ids[3]))
+
+    assert [link['id'] for link in page] == [ids[2], ids[1], ids[0]]
+
+
+def test_iter_user_links_streams_all_chunks(db, db_path):
+    ids = add_links(db, db_path, 1, 6)
+
+    async def collect():
+        return [[link['id'] for link in chunk] async for chunk in db.iter_user_links(1, chunk_size=3)]
+
+    assert asyncio.run(collect()) == [ids[5:2:-1], ids[2::-1]]
+
+
+def test_link_lookup_is_limited_to_owner_and_active_links(db, db_path):
+    own = add_links(db, db_path, 1, 2)
+    foreign = add_links(db, db_path, 2, 1)[0]
+    assert asyncio.run(db.delete_user_link(own[1], 1))
+
+    assert asyncio.run(db.get_user_link(own[0], 1))['url'] == "https://example.com/1/0"
+    assert asyncio.run(db.get_user_link(own[1], 1)) is None
+    assert asyncio.run(db.get_user_link(foreign, 1)) is None
+
+
+class Recorder:
+    """Запоминает тексты, отправленные обработчиком"""
+
+    def __init__(self):
+        self.texts = []
+
+    async def __call__(self, text=None, **kwargs):
+        self.texts.append(text)
+
+
+class FakeState:
+    def __init__(self):
+        self.state, self.data = None, {}
+
+    async def set_state(self, state):
+        self.state = state
+
+    async def set_data(self, data):
+        self.data = data
+
+
+def callback(data: str, user_id: int):
+    return SimpleNamespace(
+        data=data,
+        from_user=SimpleNamespace(id=user_id),
+        answer=Recorder(),
+        message=SimpleNamespace(answer=Recorder(), edit_text=Recorder()),
+    )
+
+
+def test_delete_callback_removes_only_own_active_link(db, db_path, monkeypatch):
+    monkeypatch.setattr(handlers.links, "database", db)
+    own = add_links(db, db_path, 1, 1)[0]
+    foreign = add_links(db, db_path, 2, 1)[0]
+
+    first = callback(f"delete_link_{own}", 1)
+    asyncio.run(callback_delete_link(first))
+    assert first.message.edit_text.texts == [f"✅ Ссылка #{own} успешно удалена!"]
+    assert asyncio.run(db.get_user_link(own, 1)) is None
+
+    # Повторное нажатие и чужая ссылка не доходят до удаления
+    for query in (callback(f"delete_link_{own}", 1), callback(f"delete_link_{foreign}", 1)):
+        asyncio.run(callback_delete_link(query))
+        assert query.answer.texts == ["❌ Ссылка не найдена"]
+        assert query.message.edit_text.texts == []
+    assert asyncio.run(db.get_user_link(foreign, 2)) is not None
+
+
+def test_edit_callback_starts_edit_for_own_link(db, db_path, monkeypatch):
+    monkeypatch.setattr(handlers.links, "database", db)
+    own = add_links(db, db_path, 1, 1)[0]
+    foreign = add_links(db, db_path, 2, 1)[0]
+
+    query, state = callback(f"edit_link_{own}", 1), FakeState()
+    asyncio.run(callback_edit_link(query, state))
+    assert state.state == LinkStates.waiting_for_link_edit
+    assert state.data == {'link_id': own}
+
+    query, state = callback(f"edit_link_{foreign}", 1), FakeState()
+    asyncio.run(callback_edit_link(query, state))
+    assert query.answer.texts == ["❌ Ссылка не найдена"]
+    assert state.state is None and query.message.answer.texts == []
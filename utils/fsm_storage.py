@@ -0,0 +1,139 @@
+import asyncio
+import json
+import sqlite3
+from dataclasses import replace
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import Config
+from database.storage import StorageProfile
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM в SQLite: состояния видны всем процессам бота и переживают перезапуск.
+
+    Одна строка на ключ (бот, чат, пользователь): состояние и данные в JSON.
+    Запросы выполняются вне event loop, запись - транзакциями BEGIN IMMEDIATE,
+    поэтому update_data атомарен и между процессами.
+    """
+
+    def __init__(self, db_path: str = Config.FSM_DB_PATH, timeout: float = Config.DB_BUSY_TIMEOUT):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._mutex = Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Ленивое открытие соединения (вызывается под блокировкой)"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.timeout,
+                                   isolation_level=None)
+            replace(StorageProfile.from_config(), busy_timeout=self.timeout).apply(conn)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT NOT NULL DEFAULT '{}',
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполнение запроса вне event loop на единственном соединении"""
+        def locked():
+            with self._mutex:
+                return func(self._connection())
+
+        return await asyncio.to_thread(locked)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+
+        def sync_set_state(conn: sqlite3.Connection):
+            conn.execute('''
+                INSERT INTO fsm_states (key, state) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET state = excluded.state, updated_at = CURRENT_TIMESTAMP
+            ''', (self.key_builder.build(key), value))
+
+        await self._run(sync_set_state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        def sync_get_state(conn: sqlite3.Connection):
+            row = conn.execute(
+                "SELECT state FROM fsm_states WHERE key = ?", (self.key_builder.build(key),)
+            ).fetchone()
+            return row[0] if row else None
+
+        return await self._run(sync_get_state)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Данные FSM должны быть словарем, получено {type(data).__name__}")
+        payload = json.dumps(data, ensure_ascii=False)
+
+        def sync_set_data(conn: sqlite3.Connection):
+            conn.execute('''
+                INSERT INTO fsm_states (key, data) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+            ''', (self.key_builder.build(key), payload))
+
+        await self._run(sync_set_data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        def sync_get_data(conn: sqlite3.Connection):
+            row = conn.execute(
+                "SELECT data FROM fsm_states WHERE key = ?", (self.key_builder.build(key),)
+            ).fetchone()
+            return json.loads(row[0]) if row else {}
+
+        return await self._run(sync_get_data)
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        """Чтение и запись данных одной транзакцией"""
+        storage_key = self.key_builder.build(key)
+
+        def sync_update_data(conn: sqlite3.Connection):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM fsm_states WHERE key = ?", (storage_key,)).fetchone()
+                current = json.loads(row[0]) if row else {}
+                current.update(data)
+                conn.execute('''
+                    INSERT INTO fsm_states (key, data) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+                ''', (storage_key, json.dumps(current, ensure_ascii=False)))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return current
+
+        return await self._run(sync_update_data)
+
+    async def close(self) -> None:
+        def sync_close():
+            with self._mutex:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+        await asyncio.to_thread(sync_close)
+
+
+def create_storage(kind: str = Config.FSM_STORAGE) -> BaseStorage:
+    """Хранилище FSM по настройке FSM_STORAGE"""
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "sqlite":
+        return SQLiteStorage()
+    raise ValueError(f"Неизвестный FSM_STORAGE: {kind}")
@@ -0,0 +1,177 @@
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from html import escape
+from typing import AsyncGenerator, Dict, Any, Optional, Tuple
+
+from aiogram.types import InputFile
+
+EXPORT_FORMATS = ("txt", "csv", "json", "html")
+
+# Ссылок за один запрос к БД
+EXPORT_CHUNK_SIZE = 500
+# До этого размера выгрузка держится в памяти, дальше - во временном файле
+EXPORT_SPOOL_MAX_SIZE = 1024 * 1024
+
+CSV_FIELDS = ("id", "url", "title", "description", "category", "created_at")
+
+
+class SpooledInputFile(InputFile):
+    """Файл для отправки в Telegram из SpooledTemporaryFile.
+
+    Читается кусками по chunk_size в потоке (перелившаяся на диск выгрузка
+    не блокирует цикл событий) и закрывается после отправки, временный файл
+    удаляется системой. Если отправка не началась, файл закрывает close().
+    """
+
+    def __init__(self, spool: "tempfile.SpooledTemporaryFile", filename: str, **kwargs):
+        super().__init__(filename=filename, **kwargs)
+        self.spool = spool
+
+    async def read(self, bot) -> AsyncGenerator[bytes, None]:
+        try:
+            await asyncio.to_thread(self.spool.seek, 0)
+            while chunk := await asyncio.to_thread(self.spool.read, self.chunk_size):
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self.spool.close()
+
+
+class LinkExportWriter(ABC):
+    """Построчная запись выгрузки: заголовок, ссылки по одной, окончание"""
+
+    def __init__(self, out: io.TextIOBase, owner: str):
+        self.out = out
+        self.owner = owner
+
+    def header(self):
+        pass
+
+    @abstractmethod
+    def link(self, number: int, link: Dict[str, Any]):
+        """Запись одной ссылки; number - порядковый номер с 1"""
+
+    def footer(self, total: int):
+        """Окончание; total - сколько ссылок действительно записано"""
+
+
+class TxtExportWriter(LinkExportWriter):
+    def header(self):
+        self.out.write(f"Экспорт ссылок пользователя {self.owner}\n")
+        self.out.write(f"Дата экспорта: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        self.out.write("=" * 50 + "\n\n")
+
+    def link(self, number: int, link: Dict[str, Any]):
+        self.out.write(f"{number}. {link['title'] or 'Без названия'}\n")
+        self.out.write(f"   URL: {link['url']}\n")
+        if link['description']:
+            self.out.write(f"   Описание: {link['description']}\n")
+        self.out.write(f"   Категория: {link['category']}\n")
+        self.out.write(f"   Добавлена: {link['created_at']}\n\n")
+
+    def footer(self, total: int):
+        # Итог в конце: число известно только после выгрузки всех пачек
+        self.out.write("=" * 50 + "\n")
+        self.out.write(f"Всего ссылок: {total}\n")
+
+
+class CsvExportWriter(LinkExportWriter):
+    def header(self):
+        self.writer = csv.writer(self.out)
+        self.writer.writerow(CSV_FIELDS)
+
+    def link(self, number: int, link: Dict[str, Any]):
+        self.writer.writerow([link[field] for field in CSV_FIELDS])
+
+
+class JsonExportWriter(LinkExportWriter):
+    def header(self):
+        self.out.write("[")
+
+    def link(self, number: int, link: Dict[str, Any]):
+        if number > 1:
+            self.out.write(",")
+        self.out.write("\n  ")
+        self.out.write(json.dumps({field: link[field] for field in CSV_FIELDS}, ensure_ascii=False))
+
+    def footer(self, total: int):
+        self.out.write("\n]\n")
+
+
+class HtmlExportWriter(LinkExportWriter):
+    """Формат закладок Netscape - импортируется любым браузером"""
+
+    def header(self):
+        self.out.write(
+            "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+            '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+            "<TITLE>Bookmarks</TITLE>\n"
+            f"<H1>{escape(self.owner)}</H1>\n"
+            "<DL><p>\n"
+        )
+
+    def link(self, number: int, link: Dict[str, Any]):
+        try:
+            # created_at хранится в UTC (CURRENT_TIMESTAMP)
+            created_at = datetime.strptime(link['created_at'], "%Y-%m-%d %H:%M:%S")
+            add_date = int(created_at.replace(tzinfo=timezone.utc).timestamp())
+        except (TypeError, ValueError):
+            add_date = 0
+        self.out.write(
+            f'    <DT><A HREF="{escape(link["url"])}" ADD_DATE="{add_date}" '
+            f'TAGS="{escape(link["category"] or "")}">{escape(link["title"] or link["url"])}</A>\n'
+        )
+        if link['description']:
+            self.out.write(f"    <DD>{escape(link['description'])}\n")
+
+    def footer(self, total: int):
+        self.out.write("</DL><p>\n")
+
+
+WRITERS = {
+    "txt": TxtExportWriter,
+    "csv": CsvExportWriter,
+    "json": JsonExportWriter,
+    "html": HtmlExportWriter,
+}
+
+
+async def build_links_export(database, user_id: int, owner: str, fmt: str = "txt",
+                             category: Optional[str] = None) -> Tuple[Optional[SpooledInputFile], int]:
+    """Выгрузка всех ссылок пользователя: (файл для отправки, количество ссылок)"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    out = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    writer = WRITERS[fmt](out, owner)
+
+    count = 0
+    try:
+        writer.header()
+        async for chunk in database.iter_user_links(user_id, category, chunk_size=EXPORT_CHUNK_SIZE):
+            for link in chunk:
+                count += 1
+                writer.link(count, link)
+        writer.footer(count)
+        out.flush()
+    except Exception:
+        out.close()
+        raise
+
+    if count == 0:
+        out.close()
+        return None, 0
+
+    # Отвязываем обертку, чтобы ее сборка мусором не закрыла spool
+    out.detach()
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return SpooledInputFile(spool, filename=f"links_export_{timestamp}.{fmt}"), count
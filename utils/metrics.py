@@ -0,0 +1,154 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+
+# Метка серии: отсортированные пары (имя, значение)
+Labels = Tuple[Tuple[str, str], ...]
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Summary:
+    """Наблюдения одной серии: количество, сумма, максимум и последние значения для перцентилей"""
+
+    def __init__(self, reservoir_size: int):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._recent: Deque[float] = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        self._recent.append(value)
+
+    def percentiles(self, quantiles: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        """Перцентили по последним наблюдениям (метод ближайшего ранга)"""
+        values = sorted(self._recent)
+        if not values:
+            return {q: 0.0 for q in quantiles}
+        return {q: values[max(0, math.ceil(q * len(values)) - 1)] for q in quantiles}
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр метрик: сводки времени и счетчики с метками.
+
+    Наблюдения приходят и из event loop, и из потоков БД. Выдача - текст
+    в формате Prometheus (summary с квантилями) или список сводок с перцентилями.
+    """
+
+    def __init__(self, reservoir_size: int = 1024, enabled: bool = True):
+        self.reservoir_size = reservoir_size
+        self.enabled = enabled
+        self.started_at = time.time()
+
+        self._summaries: Dict[str, Dict[Labels, Summary]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._mutex = Lock()
+
+    def describe(self, name: str, help_text: str):
+        """Описание метрики для # HELP"""
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels: Any):
+        """Наблюдение сводки (обычно длительность в секундах)"""
+        if not self.enabled:
+            return
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._mutex:
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = Summary(self.reservoir_size)
+            summary.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels: Any):
+        """Увеличение счетчика"""
+        if not self.enabled:
+            return
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._mutex:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def summaries(self, name: str, quantiles: Iterable[float] = QUANTILES) -> List[Dict[str, Any]]:
+        """Сводки серий метрики, самые медленные (по p99) первыми"""
+        quantiles = tuple(quantiles)
+        with self._mutex:
+            rows = [
+                {
+                    **dict(labels),
+                    'count': summary.count,
+                    'avg': summary.sum / summary.count if summary.count else 0.0,
+                    'max': summary.max,
+                    **{f"p{round(q * 100)}": v for q, v in summary.percentiles(quantiles).items()},
+                }
+                for labels, summary in self._summaries.get(name, {}).items()
+            ]
+        return sorted(rows, key=lambda row: row.get('p99', row['max']), reverse=True)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        """Значение счетчика"""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._mutex:
+            return self._counters.get(name, {}).get(key, 0)
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = labels + (extra,) if extra else labels
+        if not pairs:
+            return ""
+        escaped = (
+            (k, v.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for k, v in pairs
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._mutex:
+            for name, series in sorted(self._summaries.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} summary")
+                for labels, summary in series.items():
+                    for q, value in summary.percentiles().items():
+                        lines.append(f"{name}{self._format_labels(labels, ('quantile', str(q)))} {value:.6f}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {summary.sum:.6f}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {summary.count}")
+
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+
+        lines.append("# TYPE process_start_time_seconds gauge")
+        lines.append(f"process_start_time_seconds {self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Сброс всех наблюдений"""
+        with self._mutex:
+            self._summaries.clear()
+            self._counters.clear()
+
+
+metrics = MetricsRegistry(reservoir_size=Config.METRICS_RESERVOIR_SIZE, enabled=Config.METRICS_ENABLED)
+
+metrics.describe("bot_update_seconds", "Время обработки апдейта по роутеру и обработчику")
+metrics.describe("bot_updates_total", "Обработанные апдейты по результату")
+metrics.describe("db_call_seconds", "Полное время вызова метода Database")
+metrics.describe("db_query_seconds", "Время выполнения запросов метода Database без ожидания блокировок")
+metrics.describe("db_lock_wait_seconds", "Ожидание соединения из пула и блокировки записи")
+metrics.describe("db_rows_total", "Строк возвращено методами Database")
+metrics.describe("requests_compacted_total", "Записей журнала запросов свернуто в дневные итоги")
+metrics.describe("requests_vacuumed_bytes_total", "Байт возвращено файловой системе после свертки журнала")
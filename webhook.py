@@ -0,0 +1,211 @@
+"""
+Запуск бота через вебхук (aiohttp) вместо long polling.
+
+Telegram присылает апдейты POST-запросами на WEBHOOK_BASE_URL + WEBHOOK_PATH
+с секретом в заголовке X-Telegram-Bot-Api-Secret-Token. Одновременно
+обрабатывается не больше WEBHOOK_MAX_CONCURRENCY апдейтов: пока нет свободного
+слота, ответ задерживается и Telegram не присылает новые. По SIGTERM сервер
+перестает принимать апдейты (503 - Telegram повторит их позже) и дорабатывает
+принятые не дольше WEBHOOK_DRAIN_TIMEOUT сек. Метрики (/metrics) отдаются
+отдельным сервером на METRICS_HOST:METRICS_PORT, закрытым от внешней сети.
+
+Запуск: python webhook.py [--host 0.0.0.0] [--port 8080]
+"""
+import asyncio
+import logging
+import secrets
+import signal
+from typing import Any, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+from config import Config
+from utils.metrics import metrics
+
+logger = logging.getLogger("webhook")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Прием апдейтов по HTTP и их обработка с ограничением параллелизма"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher, path: str = Config.WEBHOOK_PATH,
+                 secret: Optional[str] = None, max_concurrency: int = Config.WEBHOOK_MAX_CONCURRENCY):
+        self.bot = bot
+        self.dp = dp
+        self.path = path
+        self.secret = secret
+        self.max_concurrency = max_concurrency
+
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self.draining = False
+
+        # Метрики
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Прием одного апдейта: ответ после того, как для него нашелся слот"""
+        if self.secret is not None and not secrets.compare_digest(
+                request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            return web.Response(status=401)
+        if self.draining:
+            return web.Response(status=503)
+
+        try:
+            raw = await request.json()
+        except ValueError:
+            self.rejected += 1
+            return web.Response(status=400)
+
+        await self._slots.acquire()
+        if self.draining:
+            self._slots.release()
+            return web.Response(status=503)
+
+        self.received += 1
+        task = asyncio.create_task(self._process(raw))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, raw: Dict[str, Any]):
+        try:
+            await self.dp.feed_raw_update(self.bot, raw)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.exception(f"❌ Ошибка обработки апдейта {raw.get('update_id')}: {e}")
+        finally:
+            self._slots.release()
+
+    async def drain(self, timeout: float = Config.WEBHOOK_DRAIN_TIMEOUT) -> int:
+        """Перестать принимать апдейты и дождаться принятых. Возвращает число недоработанных"""
+        self.draining = True
+        if not self._tasks:
+            return 0
+
+        logger.info(f"⏳ Дорабатываются принятые апдейты: {len(self._tasks)}")
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        return len(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики вебхука"""
+        return {
+            'in_flight': len(self._tasks),
+            'max_concurrency': self.max_concurrency,
+            'received': self.received,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Метрики в формате Prometheus"""
+    return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+
+def create_metrics_app() -> web.Application:
+    """Внутренний сервер метрик: секрет вебхука его не защищает, поэтому он отдельный"""
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+async def run_webhook(host: str, port: int, metrics_host: str = Config.METRICS_HOST,
+                      metrics_port: int = Config.METRICS_PORT):
+    from database.db import database
+    from main import create_dispatcher, start_key_filter, start_online_builds, start_request_compaction
+
+    secret = Config.WEBHOOK_SECRET
+    if not secret:
+        # Случайный секрет годится для одного экземпляра: он заново ставится при каждом запуске
+        secret = secrets.token_urlsafe(32)
+        logger.warning("⚠️ WEBHOOK_SECRET не задан, используется случайный")
+
+    bot = Bot(token=Config.BOT_TOKEN)
+    dp = create_dispatcher()
+    server = WebhookServer(bot, dp, secret=secret)
+    runner = web.AppRunner(server.create_app())
+    metrics_runner = web.AppRunner(create_metrics_app())
+
+    try:
+        await database.create_tables()
+        logger.info("✅ База данных инициализирована")
+        start_key_filter()
+        start_online_builds()
+        start_request_compaction()
+
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info(f"🌐 Вебхук слушает http://{host}:{port}{server.path}")
+
+        if metrics_port:
+            await metrics_runner.setup()
+            await web.TCPSite(metrics_runner, metrics_host, metrics_port).start()
+            logger.info(f"📈 Метрики: http://{metrics_host}:{metrics_port}/metrics")
+
+        if Config.WEBHOOK_BASE_URL:
+            await bot.set_webhook(
+                Config.WEBHOOK_BASE_URL.rstrip("/") + server.path,
+                secret_token=secret,
+                allowed_updates=dp.resolve_used_update_types(),
+                max_connections=min(server.max_concurrency, 100)
+            )
+            logger.info("🤖 Вебхук зарегистрирован в Telegram")
+        else:
+            logger.warning("⚠️ WEBHOOK_BASE_URL не задан: вебхук в Telegram не зарегистрирован")
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        logger.info("🤖 Бот запущен!")
+        await stop.wait()
+
+        # Вебхук в Telegram не снимается: при перезапуске апдейты подождут на стороне Telegram
+        unfinished = await server.drain()
+        if unfinished:
+            logger.warning(f"⚠️ Не дождались обработки апдейтов: {unfinished}")
+    finally:
+        await runner.cleanup()
+        await metrics_runner.cleanup()
+        await dp.storage.close()
+        await bot.session.close()
+        await database.close()
+        logger.info(f"📊 Вебхук: {server.stats()}")
+        logger.info("🛑 Бот остановлен")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="Запуск бота через вебхук")
+    parser.add_argument("--host", default=Config.WEBHOOK_HOST, help="Адрес HTTP-сервера")
+    parser.add_argument("--port", type=int, default=Config.WEBHOOK_PORT, help="Порт HTTP-сервера")
+    parser.add_argument("--metrics-host", default=Config.METRICS_HOST, help="Адрес сервера метрик")
+    parser.add_argument("--metrics-port", type=int, default=Config.METRICS_PORT,
+                        help="Порт сервера метрик (0 - не запускать)")
+
+    args = parser.parse_args()
+    asyncio.run(run_webhook(args.host, args.port, args.metrics_host, args.metrics_port))